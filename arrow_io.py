@@ -0,0 +1,236 @@
+#arrow_io.py
+
+import pandas as pd
+import common_code_gui as common
+import instrumentation
+import os
+
+# File types Arrow reads and writes without going through pandas
+ARROW_FORMATS = ('.csv', '.parquet', '.feather', '.arrow')
+
+# Arrow IPC files; written uncompressed they are memory-mapped on read instead of copied into the heap
+IPC_FORMATS = ('.feather', '.arrow')
+
+# Column carrying a spilled frame's index, since Arrow files have none
+INDEX_COLUMN = "__excelwizard_index__"
+
+def require_pyarrow():
+    """Import pyarrow or explain how to install it."""
+    try:
+        import pyarrow
+    except ImportError:
+        raise ValueError("The Arrow data path requires pyarrow (pip install pyarrow).")
+    return pyarrow
+
+def is_arrow_file(file_path):
+    """Check whether a file is Parquet or Arrow IPC (Feather), which pandas' CSV/Excel readers do not handle."""
+    return file_path.lower().endswith(('.parquet',) + IPC_FORMATS)
+
+def native_conversion(input_file, output_file):
+    """Check whether a conversion can stay in Arrow tables end to end: both sides CSV, Parquet or IPC, with the pyarrow backend."""
+    return (common.resolve_dtype_backend() == 'pyarrow'
+            and input_file.lower().endswith(ARROW_FORMATS) and output_file.lower().endswith(ARROW_FORMATS))
+
+def read_table(file_path, columns=None):
+    """Read a CSV, Parquet or Arrow IPC file as an Arrow table.
+
+    Parquet and IPC files are memory-mapped; uncompressed IPC columns then point into the mapped file.
+    """
+    require_pyarrow()
+    file_extension = os.path.splitext(file_path)[1].lower()
+    if file_extension == '.csv':
+        from pyarrow import csv
+        # Empty text fields are missing values, as pandas reads them
+        return csv.read_csv(file_path, convert_options=csv.ConvertOptions(include_columns=columns or [], strings_can_be_null=True))
+    if file_extension == '.parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(file_path, columns=columns, memory_map=True)
+    if file_extension in IPC_FORMATS:
+        from pyarrow import feather
+        return feather.read_table(file_path, columns=columns, memory_map=True)
+    raise ValueError(f"Unsupported file format for Arrow. Please use {', '.join(ARROW_FORMATS)} extensions.")
+
+def column_names(file_path):
+    """Column names of a Parquet or Arrow IPC file, from its schema alone."""
+    pa = require_pyarrow()
+    if file_path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_schema(file_path).names
+    with pa.memory_map(file_path) as source:
+        return pa.ipc.open_file(source).schema.names
+
+def count_rows(file_path):
+    """Row count of a Parquet or Arrow IPC file, from its metadata."""
+    if file_path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(file_path).metadata.num_rows
+    return read_table(file_path).num_rows
+
+def rebatch(batches, schema, batch_rows):
+    """Regroup record batches into tables of exactly `batch_rows` rows (the last may be shorter) by slicing, without copying."""
+    pa = require_pyarrow()
+    pending, rows = [], 0
+    for batch in batches:
+        pending.append(batch)
+        rows += batch.num_rows
+        while rows >= batch_rows:
+            table = pa.Table.from_batches(pending, schema)
+            yield table.slice(0, batch_rows)
+            rest = table.slice(batch_rows)
+            pending, rows = rest.to_batches(), rest.num_rows
+    if rows:
+        yield pa.Table.from_batches(pending, schema)
+
+def iter_frames(file_path, batch_rows, dtype_backend=None):
+    """Yield a Parquet or Arrow IPC file as DataFrames of `batch_rows` rows, converting one batch at a time.
+
+    Batches line up with the chunks of the other streaming readers, whatever the file's own batching.
+    """
+    if file_path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(file_path, memory_map=True)
+        batches, schema = parquet_file.iter_batches(batch_size=batch_rows), parquet_file.schema_arrow
+    else:
+        table = read_table(file_path)
+        batches, schema = table.to_batches(), table.schema
+    for table in rebatch(batches, schema, batch_rows):
+        yield table_to_frame(table, dtype_backend)
+
+def table_to_frame(table, dtype_backend=None):
+    """Turn an Arrow table into a DataFrame.
+
+    With the pyarrow backend the columns wrap the table's buffers without copying them; otherwise
+    they are converted to NumPy dtypes. Dates become timestamps, as read_excel returns them, so
+    frames from Arrow files round-trip through Excel.
+    """
+    pa = require_pyarrow()
+    arrow_backed = common.resolve_dtype_backend(dtype_backend) == 'pyarrow'
+    for i, field in enumerate(table.schema):
+        if pa.types.is_date(field.type):
+            # In the unit read_excel gives each backend
+            table = table.set_column(i, field.name, table.column(i).cast(pa.timestamp("us" if arrow_backed else "ns")))
+    if arrow_backed:
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    return table.to_pandas()
+
+def csv_ready(frame):
+    """Arrow timestamp columns as NumPy datetimes, so to_csv writes midnight-only values as dates like it does for NumPy frames."""
+    timestamps = {col: f"datetime64[{dtype.pyarrow_dtype.unit}]" for col, dtype in frame.dtypes.items()
+                  if isinstance(dtype, pd.ArrowDtype) and dtype.kind == "M" and dtype.pyarrow_dtype.tz is None}
+    return frame.astype(timestamps) if timestamps else frame
+
+def frame_to_table(frame, preserve_index=False):
+    """Turn a DataFrame into an Arrow table; Arrow-backed columns are passed on without copying."""
+    pa = require_pyarrow()
+    return pa.Table.from_pandas(frame, preserve_index=preserve_index)
+
+def read_frame(file_path, columns=None, dtype_backend=None):
+    """Read a Parquet or Arrow IPC file into a DataFrame (see read_table and table_to_frame)."""
+    return table_to_frame(read_table(file_path, columns), dtype_backend)
+
+def write_table(table, output_file_path):
+    """Write an Arrow table to a CSV, Parquet or Arrow IPC file and return the number of rows written.
+
+    IPC files are written uncompressed, so reading them back maps the file instead of decompressing it.
+    The table is written next to the output and then moved over it: the table may still map the file
+    it replaces (updating the first file of a compare in place), which must not be truncated under it.
+    """
+    require_pyarrow()
+    file_extension = os.path.splitext(output_file_path)[1].lower()
+    if file_extension not in ARROW_FORMATS:
+        raise ValueError(f"Unsupported file format for Arrow. Please use {', '.join(ARROW_FORMATS)} extensions.")
+
+    temp_path = f"{output_file_path}.{os.getpid()}.tmp"
+    try:
+        if file_extension == '.csv':
+            from pyarrow import csv
+            csv.write_csv(table, temp_path)
+        elif file_extension == '.parquet':
+            import pyarrow.parquet as pq
+            pq.write_table(table, temp_path)
+        else:
+            from pyarrow import feather
+            feather.write_feather(table, temp_path, compression="uncompressed")
+        os.replace(temp_path, output_file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return table.num_rows
+
+def mixed_columns(frame):
+    """Object columns mixing text with numbers or dates, e.g. a number column where 'NA' was filled in."""
+    return [col for col in frame.columns
+            if frame[col].dtype == object and pd.api.types.infer_dtype(frame[col], skipna=True) in ("mixed", "mixed-integer")]
+
+def write_frame(frame, output_file_path):
+    """Write a DataFrame to a Parquet or Arrow IPC file in one go and return the number of rows written.
+
+    Arrow takes one type per column, so columns mixing text with other values are written as text.
+    """
+    mixed = mixed_columns(frame)
+    if mixed:
+        common.log_message(f"Writing mixed-type column(s) {', '.join(map(str, mixed))} as text.", level='warning')
+        frame = frame.astype({col: "string" for col in mixed})
+    with instrumentation.stage("write", rows=len(frame)) as record:
+        rows = write_table(frame_to_table(frame), output_file_path)
+        record["bytes"] = instrumentation.file_size(output_file_path)
+    return rows
+
+def verify_table(table, output_file, verify):
+    """Check a file written from an Arrow table by reading it back as Arrow, and return a verification report.
+
+    'schema' compares the column names and row count; every other level but 'none' compares all values,
+    which Arrow does column by column without building rows.
+    """
+    report = {"level": verify, "passed": True, "problems": [], "mismatched_chunks": []}
+    if verify == 'none':
+        return report
+
+    written = read_table(output_file)
+    if written.column_names != table.column_names:
+        report["problems"].append(f"columns differ: expected {table.column_names}, found {written.column_names}")
+    if written.num_rows != table.num_rows:
+        report["problems"].append(f"row count differs: expected {table.num_rows}, found {written.num_rows}")
+    if verify != 'schema' and not report["problems"]:
+        try:
+            # A CSV read back infers its types again; compare it in the types it was written from
+            same = written.cast(table.schema).equals(table)
+        except Exception:
+            same = False
+        if not same:
+            report["problems"].append("values differ from the converted data")
+    report["passed"] = not report["problems"]
+    return report
+
+def convert_table(input_file, output_file, verify):
+    """Convert between CSV, Parquet and Arrow IPC through one Arrow table, without building a DataFrame.
+
+    Returns the number of rows and the verification report.
+    """
+    with instrumentation.stage("read") as record:
+        table = read_table(input_file)
+        record["rows"], record["bytes"] = table.num_rows, table.nbytes
+    with instrumentation.stage("write", rows=table.num_rows) as record:
+        write_table(table, output_file)
+        record["bytes"] = instrumentation.file_size(output_file)
+    return table.num_rows, verify_table(table, output_file, verify)
+
+def write_spill(frame, path):
+    """Write an intermediate frame, index included, to an uncompressed Arrow IPC file.
+
+    Returns False when Arrow cannot represent the frame (e.g. mixed-type columns); the caller then
+    keeps it another way.
+    """
+    try:
+        table = frame_to_table(frame.rename_axis(INDEX_COLUMN).reset_index())
+        write_table(table, path)
+        return True
+    except Exception as e:
+        if os.path.exists(path):
+            os.remove(path)
+        common.log_message(f"Could not spill as Arrow, falling back: {e}", level='info')
+        return False
+
+def read_spill(path, dtype_backend=None):
+    """Read back a frame written by write_spill, memory-mapped."""
+    return read_frame(path, dtype_backend=dtype_backend).set_index(INDEX_COLUMN).rename_axis(None)
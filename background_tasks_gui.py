@@ -0,0 +1,252 @@
+#background_tasks_gui.py
+
+import common_code_gui as common
+import instrumentation
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import Toplevel, Frame, Button, ttk
+from queue import Queue, Empty
+import itertools
+import threading
+import time
+
+# Operations running at the same time; more wait in the queue
+DEFAULT_TASK_WORKERS = 2
+
+# Milliseconds between two looks at the event queue
+POLL_INTERVAL = 100
+
+# Task states shown in the jobs panel
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+_local = threading.local()
+
+class TaskCancelled(Exception):
+    """Raised inside a task that was cancelled, at its next stage boundary."""
+
+class Task:
+    """One operation submitted to the TaskManager and its state, as shown in the jobs panel."""
+    _ids = itertools.count(1)
+
+    def __init__(self, title, manager=None):
+        self.id = next(self._ids)
+        self.title = title
+        self.manager = manager
+        self.status = QUEUED
+        self.progress = ""
+        self.error = None
+        self.result = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+def current_task():
+    """The task the calling worker thread is running, or None."""
+    return getattr(_local, "task", None)
+
+def raise_if_cancelled():
+    """Stop the current task if it was cancelled; long loops call this between steps."""
+    task = current_task()
+    if task is not None and task.cancel_event.is_set():
+        raise TaskCancelled(f"'{task.title}' was cancelled.")
+
+def report_progress(text):
+    """Show a progress text for the current task in the jobs panel (ignored outside tasks)."""
+    task = current_task()
+    if task is not None and task.manager is not None:
+        task.progress = text
+        task.manager.events.put(("update", task))
+
+def on_stage(name):
+    """Stage hook: every instrumented stage is a cancellation point and a progress report."""
+    raise_if_cancelled()
+    report_progress(f"{name}...")
+
+instrumentation.STAGE_HOOKS.append(on_stage)
+
+class TaskManager:
+    """Run operations in worker threads and keep the Tk main loop free.
+
+    Workers never touch Tk: they put events on a queue, which the Tk thread polls with after().
+    Dialogs an operation opens while it runs (questions, success and error messages) are handed to
+    the Tk thread through common.GUI_DISPATCHER and the worker waits for the answer. CPU-heavy
+    operations can still use process pools of their own inside a task. Cancelling a task stops it
+    at its next stage boundary (read, compare, update, write...).
+    """
+
+    def __init__(self, root, workers=DEFAULT_TASK_WORKERS):
+        self.root = root
+        self.events = Queue()
+        self.tasks = []
+        self.listeners = []
+        self.closed = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="task")
+        common.GUI_DISPATCHER = self.dispatch
+        self.root.after(POLL_INTERVAL, self.poll)
+
+    def submit(self, title, function, *args, **kwargs):
+        """Queue `function(*args, **kwargs)` as a task and return the Task."""
+        task = Task(title, self)
+        self.tasks.append(task)
+        common.log_message(f"Queued task {task.id}: {title}")
+        self.executor.submit(self.run_task, task, function, args, kwargs)
+        self.notify(task)
+        return task
+
+    def run_task(self, task, function, args, kwargs):
+        """Run a task in a worker thread; failures are reported in an error dialog, cancellations only logged."""
+        _local.task = task
+        task.started = time.time()
+        try:
+            raise_if_cancelled()
+            task.status = RUNNING
+            self.events.put(("update", task))
+            task.result = function(*args, **kwargs)
+            task.status = DONE
+        except TaskCancelled:
+            task.status = CANCELLED
+            common.log_message(f"Task {task.id} cancelled: {task.title}", level='warning')
+        except Exception as e:
+            task.status = FAILED
+            task.error = str(e)
+            if self.closed.is_set():
+                common.log_message(task.error, level='error')  # No window left to show it in
+            else:
+                common.handle_exception(e)
+        finally:
+            task.finished = time.time()
+            task.progress = f"{task.status} in {task.elapsed:.1f}s"
+            _local.task = None
+            self.events.put(("update", task))
+
+    def cancel(self, task):
+        """Ask a task to stop; a queued task never starts."""
+        if task.status not in FINISHED_STATES:
+            task.cancel_event.set()
+            task.progress = "cancelling..."
+            self.notify(task)
+
+    def running(self):
+        return [task for task in self.tasks if task.status not in FINISHED_STATES]
+
+    def clear_finished(self):
+        self.tasks = self.running()
+        self.notify(None)
+
+    def dispatch(self, function, *args, **kwargs):
+        """Run a function on the Tk thread for a worker thread and return its result (or raise its error)."""
+        reply = Queue(maxsize=1)
+        self.events.put(("call", (function, args, kwargs, reply)))
+        while True:
+            try:
+                ok, value = reply.get(timeout=POLL_INTERVAL / 1000)
+                break
+            except Empty:
+                if self.closed.is_set():  # The window is gone; nobody will answer
+                    raise TaskCancelled("The application was closed.")
+        if not ok:
+            raise value
+        return value
+
+    def poll(self):
+        """Apply the workers' events; runs in the Tk thread."""
+        self.root.after(POLL_INTERVAL, self.poll)  # Scheduled first: a dialog opened below runs its own event loop
+        try:
+            while True:
+                kind, value = self.events.get_nowait()
+                if kind == "update":
+                    self.notify(value)
+                    continue
+                function, args, kwargs, reply = value
+                try:
+                    reply.put((True, function(*args, **kwargs)))
+                except Exception as e:
+                    reply.put((False, e))
+        except Empty:
+            pass
+
+    def notify(self, task):
+        for listener in list(self.listeners):
+            listener(task)
+
+    def shutdown(self):
+        """Cancel every task and stop taking new ones; running workers finish at their next stage."""
+        self.closed.set()
+        for task in self.running():
+            task.cancel_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        common.GUI_DISPATCHER = None
+
+class JobsPanel:
+    """Window listing the running and finished tasks, with their progress, and cancelling the selected ones."""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.window = Toplevel(manager.root)
+        self.window.title("Jobs")
+        self.window.geometry("640x260")
+
+        columns = ("task", "status", "progress", "elapsed")
+        self.tree = ttk.Treeview(self.window, columns=columns, show="headings", height=8)
+        for column, width in zip(columns, (260, 80, 200, 70)):
+            self.tree.heading(column, text=column.capitalize())
+            self.tree.column(column, width=width, anchor="w")
+        self.tree.pack(fill="both", expand=True, padx=10, pady=(10, 0))
+
+        buttons = Frame(self.window)
+        buttons.pack(pady=10)
+        Button(buttons, text="Cancel", bg="lightgrey", command=self.cancel_selected).pack(side="left", padx=5)
+        Button(buttons, text="Clear finished", bg="lightgrey", command=manager.clear_finished).pack(side="left", padx=5)
+        Button(buttons, text="Close", bg="lightgrey", command=self.close).pack(side="left", padx=5)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        manager.listeners.append(self.refresh)
+        self.refresh()
+        self.tick()
+
+    def refresh(self, task=None):
+        """Redraw the task list; called in the Tk thread whenever a task changes."""
+        shown = set(self.tree.get_children())
+        wanted = {str(task.id) for task in self.manager.tasks}
+        for item in shown - wanted:
+            self.tree.delete(item)
+        for task in self.manager.tasks:
+            values = (task.title, task.status, task.progress, f"{task.elapsed:.1f}s")
+            if str(task.id) in shown:
+                self.tree.item(str(task.id), values=values)
+            else:
+                self.tree.insert("", "end", iid=str(task.id), values=values)
+
+    def tick(self):
+        """Keep the elapsed times of running tasks current."""
+        if self.manager.running():
+            self.refresh()
+        self.window.after(1000, self.tick)
+
+    def cancel_selected(self):
+        tasks = {str(task.id): task for task in self.manager.tasks}
+        for item in self.tree.selection():
+            self.manager.cancel(tasks[item])
+
+    def close(self):
+        self.manager.listeners.remove(self.refresh)
+        self.window.destroy()
+
+# The open jobs panel, if any
+_jobs_panel = None
+
+def show_jobs_panel(manager):
+    """Open the jobs panel, or bring the open one to the front."""
+    global _jobs_panel
+    if _jobs_panel is not None and _jobs_panel.window.winfo_exists():
+        _jobs_panel.window.lift()
+    else:
+        _jobs_panel = JobsPanel(manager)
+    return _jobs_panel
@@ -0,0 +1,211 @@
+#batch_conversion.py
+
+import common_code_gui as common
+import streaming_io
+import integrity_check as integrity
+from file_format_conv_gui import verify_conversion
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import glob
+import json
+import os
+import re
+import time
+
+SUPPORTED_INPUTS = ('.csv', '.xls', '.xlsx')
+OUTPUT_FORMATS = ('csv', 'xlsx')
+MANIFEST_NAME = "manifest.json"
+
+# Excel limits sheet names to 31 characters
+MAX_SHEET_NAME = 31
+
+def find_input_files(source, recursive=False):
+    """List the CSV/Excel files in a directory (optionally recursive) or matching a glob pattern."""
+    if os.path.isdir(source):
+        pattern = os.path.join(source, "**", "*") if recursive else os.path.join(source, "*")
+    else:
+        pattern = source
+    return sorted(
+        path for path in glob.glob(pattern, recursive=True)
+        if os.path.isfile(path) and path.lower().endswith(SUPPORTED_INPUTS)
+    )
+
+def safe_name(name):
+    """Make a sheet or file name usable in an output filename (no spaces or path characters)."""
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(name)).strip('_') or "sheet"
+
+def planned_outputs(file_path, output_dir, output_format):
+    """Map every sheet of an input file to the output file that will hold it.
+
+    CSV output gets one file per sheet; Excel output gets one workbook per input file with every sheet.
+    A CSV file needs no CSV output, so it maps to nothing.
+    """
+    stem = safe_name(os.path.splitext(os.path.basename(file_path))[0])
+    sheets = common.sheet_names(file_path)
+    if output_format == 'csv':
+        if file_path.lower().endswith('.csv'):
+            return {}
+        return {sheet: os.path.join(output_dir, f"{stem}_{safe_name(sheet)}.csv") for sheet in sheets}
+
+    workbook_path = os.path.join(output_dir, f"{stem}.xlsx")
+    return {sheet: workbook_path for sheet in sheets}
+
+def file_output_dir(file_path, base_dir, output_dir):
+    """The directory receiving the outputs of an input file, mirroring its place below `base_dir`."""
+    return os.path.join(output_dir, os.path.relpath(os.path.dirname(os.path.abspath(file_path)), os.path.abspath(base_dir)))
+
+def describe_sheet(file_path, sheet):
+    """Name a sheet of an input file in messages; a CSV file is named alone."""
+    return f"'{file_path}'" if sheet is None else f"sheet '{sheet}' of '{file_path}'"
+
+def plan_batch(files, base_dir, output_dir, output_format):
+    """Plan the outputs of every input file before any is converted, keeping the layout below `base_dir`.
+
+    Fails when two sheets or files would be written to the same output, e.g. 'a b.xlsx' and
+    'a_b.xlsx', or 'a.csv' and 'a.xlsx' converted to xlsx. A file whose sheets cannot be listed is
+    planned as None, so its worker reports the error like any other failed conversion.
+    """
+    plans = {}
+    claimed = {}
+    for path in files:
+        try:
+            outputs = planned_outputs(path, file_output_dir(path, base_dir, output_dir), output_format)
+        except Exception:
+            plans[path] = None
+            continue
+        for sheet, output_file in outputs.items():
+            # Every sheet of a file shares its workbook in xlsx output; anything else must be alone
+            first_path, first_sheet = claimed.setdefault(os.path.normcase(os.path.abspath(output_file)), (path, sheet))
+            if first_path != path or (output_format == 'csv' and first_sheet != sheet):
+                raise ValueError(
+                    f"{describe_sheet(first_path, first_sheet)} and {describe_sheet(path, sheet)} would both be written to '{output_file}'. "
+                    "Rename one of them or convert them separately."
+                )
+        plans[path] = outputs
+    return plans
+
+def is_up_to_date(file_path, output_paths):
+    """An input is up to date when every output exists and is newer than it."""
+    input_mtime = os.path.getmtime(file_path)
+    return all(os.path.exists(path) and os.path.getmtime(path) >= input_mtime for path in output_paths)
+
+def convert_workbook(file_path, output_dir, output_format, verify=integrity.DEFAULT_VERIFY_LEVEL, force=False, outputs=None):
+    """Convert every sheet of one file and return its manifest entry with timing and integrity results.
+
+    `outputs` are the outputs planned by plan_batch; without them they are planned here.
+    """
+    common.HEADLESS = True
+    start = time.perf_counter()
+    entry = {"input": file_path, "status": "converted", "outputs": [], "sheets": []}
+    try:
+        if outputs is None:
+            outputs = planned_outputs(file_path, output_dir, output_format)
+        entry["outputs"] = sorted(set(outputs.values()))
+        if not outputs:
+            entry["status"] = "skipped"
+            entry["reason"] = "already in the target format"
+            return entry
+        if not force and is_up_to_date(file_path, entry["outputs"]):
+            entry["status"] = "skipped"
+            entry["reason"] = "up to date"
+            return entry
+
+        os.makedirs(output_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+
+        if output_format == 'csv':
+            # One sheet in memory at a time
+            for sheet, output_file in outputs.items():
+                sheet_start = time.perf_counter()
+                dataframe = common.read_data(file_path, sheet_name=sheet)
+                common.save_merged_file(dataframe, output_file)
+                report = verify_conversion(dataframe, output_file, verify)
+                entry["sheets"].append({
+                    "sheet": sheet, "output": output_file, "rows": len(dataframe),
+                    "seconds": round(time.perf_counter() - sheet_start, 6), "verification": report,
+                })
+        else:
+            workbook_path = entry["outputs"][0]
+            frames = {}
+            for sheet in outputs:
+                title = (stem if sheet is None else str(sheet))[:MAX_SHEET_NAME]
+                frames[title] = (sheet, common.read_data(file_path, sheet_name=sheet if sheet is not None else 0))
+            write_start = time.perf_counter()
+            streaming_io.write_sheets([(title, streaming_io.iter_frame_batches(df)) for title, (_, df) in frames.items()], workbook_path)
+            write_seconds = (time.perf_counter() - write_start) / len(frames)
+            for title, (sheet, dataframe) in frames.items():
+                verify_start = time.perf_counter()
+                report = verify_conversion(dataframe, workbook_path, verify, sheet_name=title)
+                entry["sheets"].append({
+                    "sheet": title, "output": workbook_path, "rows": len(dataframe),
+                    "seconds": round(write_seconds + time.perf_counter() - verify_start, 6), "verification": report,
+                })
+
+        failed = [sheet for sheet in entry["sheets"] if not sheet["verification"]["passed"]]
+        if failed:
+            entry["status"] = "failed"
+            entry["error"] = "; ".join(integrity.describe_report(sheet["verification"]) for sheet in failed)
+            for output_file in {sheet["output"] for sheet in failed}:
+                os.remove(output_file)
+
+    except Exception as e:
+        entry["status"] = "error"
+        entry["error"] = str(e)
+    finally:
+        entry["seconds"] = round(time.perf_counter() - start, 6)
+    return entry
+
+def convert_batch(source, output_dir, output_format='csv', workers=None, verify=integrity.DEFAULT_VERIFY_LEVEL, force=False, recursive=False, manifest_path=None):
+    """Convert every sheet of every file in a directory or glob across a process pool and write a manifest.
+
+    Files whose outputs are newer than the input are skipped unless `force` is set. The directory
+    layout below a source directory is kept in the output directory.
+    """
+    try:
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format '{output_format}'. Please use csv or xlsx.")
+        if verify not in integrity.VERIFY_LEVELS:
+            raise ValueError(f"Unknown verification level '{verify}'. Expected one of: {', '.join(integrity.VERIFY_LEVELS)}.")
+
+        files = find_input_files(source, recursive)
+        if not files:
+            raise ValueError(f"No CSV or Excel files found in '{source}'.")
+
+        base_dir = source if os.path.isdir(source) else os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in files])
+        # All outputs are known before the pool starts, so no two workers write the same file
+        plans = plan_batch(files, base_dir, output_dir, output_format)
+        common.log_message(f"Starting batch conversion of {len(files)} file(s) from '{source}' to {output_format}")
+
+        started = datetime.now().isoformat(timespec='seconds')
+        start = time.perf_counter()
+        entries = []
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            futures = {
+                executor.submit(
+                    convert_workbook, path, file_output_dir(path, base_dir, output_dir), output_format, verify, force, plans[path]
+                ): path
+                for path in files
+            }
+            for future in as_completed(futures):
+                entry = future.result()
+                entries.append(entry)
+                common.log_message(f"{entry['status'].capitalize()} '{entry['input']}' in {entry['seconds']}s", level='error' if entry['status'] in ('failed', 'error') else 'info')
+
+        manifest = {
+            "source": source, "output_dir": output_dir, "format": output_format, "verify": verify,
+            "started": started, "seconds": round(time.perf_counter() - start, 6),
+            "totals": {status: sum(entry["status"] == status for entry in entries) for status in ("converted", "skipped", "failed", "error")},
+            "files": sorted(entries, key=lambda entry: entry["input"]),
+        }
+
+        manifest_path = manifest_path or os.path.join(output_dir, MANIFEST_NAME)
+        os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+        with open(manifest_path, "w", encoding="utf-8") as handle:
+            json.dump(manifest, handle, indent=2, default=str)
+        common.log_message(f"Batch conversion finished: {manifest['totals']}. Manifest saved as '{manifest_path}'")
+
+        manifest["manifest"] = manifest_path
+        return manifest
+
+    except Exception as e:
+        raise e
@@ -0,0 +1,348 @@
+#benchmarks.py
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import platform
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import openpyxl
+import common_code_gui as common
+import workbook_cache
+from compare_update_gui import compare_and_update
+from file_format_conv_gui import hash_dataframe
+from sample_file_gen_gui import generate_dummy_data
+from schema_gen_gui import generate_from_schema
+
+# Fixture sizes of the operations suite
+DEFAULT_ROWS = (10000, 100000, 1000000)
+
+# File formats read, written and compared by the operations suite
+DEFAULT_FORMATS = ('.csv', '.xlsx')
+
+# Writing a million-row workbook alone takes minutes, so larger Excel fixtures are skipped by default
+MAX_EXCEL_ROWS = 100000
+
+# A measurement is a regression when it is this much worse than the baseline...
+DEFAULT_THRESHOLD = 0.25
+
+# ...and worse by more than these absolute amounts, so timer noise on fast operations is ignored
+MIN_REGRESSION_SECONDS = 0.01
+MIN_REGRESSION_MB = 1.0
+
+# Answers to the compare dialogs, so the suite runs without Tk
+COMPARE_DECISIONS = {'extra_columns': 'keep', 'new_columns': 'yes', 'new_rows': 'yes', 'missing_rows': 'keep'}
+
+# Columns of the compare fixtures; the second file changes 5% of the rows, adds 1% and deletes 1%
+FIXTURE_COLUMNS = {
+    "id": {"type": "int", "unique": True},
+    "amount": {"type": "float", "min": 0, "max": 1000, "decimals": 2},
+    "quantity": {"type": "int", "min": 1, "max": 500},
+    "status": {"type": "enum", "values": ["open", "closed", "pending", "north", "south"]},
+    "code": {"type": "string", "length": 8},
+    "updated": {"type": "date", "start": "2020-01-01", "end": "2024-12-31"},
+    "customer": {"type": "name", "null_ratio": 0.02},
+}
+
+# Columns of the generate_dummy_data benchmark: Faker pools, vectorized methods and numbers
+SAMPLE_COLUMNS = {"name": "string", "email": "string", "uuid": "string", "date": "date", "quantity": "int"}
+
+# Entry points the startup suite imports in a fresh interpreter, with their cold-start budget in seconds
+STARTUP_BUDGETS = {"main_menu_gui": 0.3}
+
+# Modules that must not be imported just to show the main menu; features load them on first use
+HEAVY_MODULES = ("pandas", "numpy", "faker", "openpyxl", "pyarrow")
+
+# Run in the fresh interpreter: time the import and list the heavy modules it pulled in
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "heavy_modules": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+def make_fixture(file_path, num_rows, num_columns=10, seed=0):
+    """Write a reproducible mixed-type table (ids, numbers, repeated strings, dates) to CSV or Excel."""
+    rng = np.random.default_rng(seed)
+    data = {"id": np.arange(num_rows)}
+    for i in range(1, num_columns):
+        kind = i % 4
+        if kind == 0:
+            data[f"col{i}"] = rng.integers(0, 1_000_000, num_rows)
+        elif kind == 1:
+            data[f"col{i}"] = rng.random(num_rows) * 1000
+        elif kind == 2:
+            data[f"col{i}"] = rng.choice(["open", "closed", "pending", "north", "south"], num_rows)
+        else:
+            data[f"col{i}"] = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 1500, num_rows), unit="D")
+    common.save_merged_file(pd.DataFrame(data), file_path)
+    return file_path
+
+def make_compare_fixtures(fixture_dir, num_rows, extension, seed=0):
+    """Write a table and a second version of it with known changes, as the two files of a compare."""
+    schema = {
+        "seed": seed,
+        "tables": {"base": {"rows": num_rows, "output": f"base_{num_rows}{extension}", "columns": FIXTURE_COLUMNS}},
+        "versions": {"changed": {"table": "base", "key": "id", "changed": 0.05, "added": 0.01, "deleted": 0.01, "output": f"changed_{num_rows}{extension}"}},
+    }
+    summary = generate_from_schema(schema, fixture_dir)
+    return summary["tables"]["base"]["output"], summary["versions"]["changed"]["output"]
+
+def time_call(function, repeat=3):
+    """Return the best wall time in seconds of `repeat` calls."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def benchmark_readers(row_counts=(10000, 100000), repeat=3, work_dir=None):
+    """Time read_data with every installed reader backend and report the speedup over the pandas default."""
+    results = []
+    cache_enabled = workbook_cache.CACHE_ENABLED
+    workbook_cache.CACHE_ENABLED = False  # Measure parsing, not cache hits
+    try:
+        with tempfile.TemporaryDirectory(dir=work_dir) as fixture_dir:
+            for num_rows in row_counts:
+                for extension in ('.csv', '.xlsx'):
+                    file_path = make_fixture(os.path.join(fixture_dir, f"fixture_{num_rows}{extension}"), num_rows)
+                    baseline = None
+                    for engine in common.READ_ENGINES[extension]:
+                        if not common.engine_available(engine):
+                            results.append({"operation": "read_data", "format": extension, "engine": engine, "rows": num_rows, "status": "not installed"})
+                            continue
+                        seconds = time_call(lambda: common.read_data(file_path, engine=engine), repeat)
+                        baseline = baseline or seconds
+                        results.append({
+                            "operation": "read_data", "format": extension, "engine": engine, "rows": num_rows,
+                            "seconds": round(seconds, 6), "speedup": round(baseline / seconds, 2),
+                        })
+    finally:
+        workbook_cache.CACHE_ENABLED = cache_enabled
+    return results
+
+def import_in_new_process(module_name, work_dir):
+    """Import a module in a new Python process and return its import time and the heavy modules it loaded.
+
+    The process runs in `work_dir`, so logs written at import time do not land in the current directory.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)), os.environ.get("PYTHONPATH")])))
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT.format(module=module_name, heavy=HEAVY_MODULES)],
+        cwd=work_dir, env=env, capture_output=True, text=True,
+    )
+    process_seconds = time.perf_counter() - start
+    if completed.returncode:
+        raise RuntimeError(f"Importing {module_name} failed:\n{completed.stderr}")
+    return dict(json.loads(completed.stdout.strip().splitlines()[-1]), process_seconds=process_seconds)
+
+def benchmark_startup(budgets=STARTUP_BUDGETS, repeat=3, work_dir=None):
+    """Time the cold import of every entry point, best of `repeat` fresh interpreters, against its budget."""
+    results = []
+    with tempfile.TemporaryDirectory(dir=work_dir) as run_dir:
+        for module_name, budget in budgets.items():
+            runs = [import_in_new_process(module_name, run_dir) for _ in range(repeat)]
+            results.append({
+                "operation": f"import {module_name}", "format": "-", "rows": 0,
+                "seconds": round(min(run["seconds"] for run in runs), 6),
+                "process_seconds": round(min(run["process_seconds"] for run in runs), 6),
+                "budget": budget, "heavy_modules": runs[0]["heavy_modules"],
+            })
+    return results
+
+def find_budget_violations(results):
+    """List the startup results slower than their budget or that imported heavy modules."""
+    violations = []
+    for result in results:
+        if "budget" not in result:
+            continue
+        if result["seconds"] > result["budget"]:
+            violations.append({"operation": result["operation"], "metric": "seconds", "budget": result["budget"], "current": result["seconds"]})
+        if result.get("heavy_modules"):
+            violations.append({"operation": result["operation"], "metric": "heavy_modules", "budget": [], "current": result["heavy_modules"]})
+    return violations
+
+def measure(function, repeat=3, memory=True):
+    """Best wall time of `repeat` calls, then the peak memory traced during one more call.
+
+    Memory is traced in a separate call because tracing slows down pure Python code such as openpyxl.
+    NumPy and pandas report their buffers to tracemalloc, so the peak includes the DataFrames.
+    """
+    measurement = {"seconds": round(time_call(function, repeat), 6)}
+    if memory:
+        tracemalloc.start()
+        try:
+            function()
+            measurement["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        finally:
+            tracemalloc.stop()
+    return measurement
+
+def benchmark_operations(row_counts=DEFAULT_ROWS, formats=DEFAULT_FORMATS, repeat=3, work_dir=None, max_excel_rows=MAX_EXCEL_ROWS, memory=True, progress=None):
+    """Time every operation on generated fixtures and record its peak memory.
+
+    read_data, save_merged_file and compare_and_update run once per file format; hash_dataframe and
+    generate_dummy_data work in memory. Everything runs headless, with the compare decisions preset
+    and the workbook cache disabled. `progress` is called with each result as it is measured.
+    """
+    results = []
+    cache_enabled, headless = workbook_cache.CACHE_ENABLED, common.HEADLESS
+    workbook_cache.CACHE_ENABLED = False  # Measure parsing, not cache hits
+    common.HEADLESS = True
+
+    def record(operation, extension, num_rows, function, engine=None, skipped=False):
+        result = {"operation": operation, "format": extension, "engine": engine, "rows": num_rows}
+        if skipped or (extension == '.xlsx' and num_rows > max_excel_rows):
+            result["status"] = "skipped"
+        else:
+            result.update(measure(function, repeat, memory), status="ok")
+        results.append(result)
+        if progress:
+            progress(result)
+
+    try:
+        with tempfile.TemporaryDirectory(dir=work_dir) as fixture_dir:
+            for num_rows in row_counts:
+                dataframe = None
+                for extension in formats:
+                    if extension == '.xlsx' and num_rows > max_excel_rows:
+                        file1 = file2 = None
+                    else:
+                        file1, file2 = make_compare_fixtures(fixture_dir, num_rows, extension)
+                        dataframe = common.read_data(file1)
+                    output = os.path.join(fixture_dir, f"output_{num_rows}{extension}")
+                    record("read_data", extension, num_rows, lambda: common.read_data(file1), engine="default")
+                    record("save_merged_file", extension, num_rows, lambda: common.save_merged_file(dataframe, output))
+                    record("compare_and_update", extension, num_rows, lambda: compare_and_update(file1, file2, "id", output, COMPARE_DECISIONS))
+
+                # Hashes the fixture read above; none is read when every format was skipped at this size
+                record("hash_dataframe", "-", num_rows, lambda: hash_dataframe(dataframe), skipped=dataframe is None)
+                record("generate_dummy_data", "-", num_rows, lambda: generate_dummy_data(num_rows, SAMPLE_COLUMNS, seed=0))
+    finally:
+        workbook_cache.CACHE_ENABLED, common.HEADLESS = cache_enabled, headless
+    return results
+
+def environment():
+    """Versions and machine details stored with the results, to explain differences between runs."""
+    return {
+        "python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__, "openpyxl": openpyxl.__version__,
+        "platform": platform.platform(), "cpu_count": os.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def result_key(result):
+    return result["operation"], result["format"], result.get("engine"), result["rows"]
+
+def load_results(results_file):
+    """Load stored results: a report written by main() or a plain list of results."""
+    with open(results_file, encoding="utf-8") as handle:
+        report = json.load(handle)
+    return report["results"] if isinstance(report, dict) else report
+
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare results with a baseline and list the measurements that got worse by more than `threshold`."""
+    baseline_results = {result_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_results.get(result_key(result))
+        if previous is None:
+            continue
+        for metric, minimum in (("seconds", MIN_REGRESSION_SECONDS), ("peak_mb", MIN_REGRESSION_MB)):
+            if metric not in result or not previous.get(metric):
+                continue
+            if result[metric] > previous[metric] * (1 + threshold) and result[metric] - previous[metric] > minimum:
+                regressions.append({
+                    "operation": result["operation"], "format": result["format"], "engine": result.get("engine"), "rows": result["rows"],
+                    "metric": metric, "baseline": previous[metric], "current": result[metric],
+                    "change": round(result[metric] / previous[metric] - 1, 3),
+                })
+    return regressions
+
+def format_result(result):
+    """One aligned line for a benchmark result."""
+    if "seconds" in result:
+        timing = f"{result['seconds']:>10.4f}s"
+        timing += f"  x{result['speedup']:<6}" if "speedup" in result else ""
+        timing += f" {result['peak_mb']:>10.1f} MB" if "peak_mb" in result else ""
+    else:
+        timing = f"{result['status']:>11}"
+    return f"{result['operation']:<20} {result['format']:<6} {result.get('engine') or '-':<10} {result['rows']:>9} rows {timing}"
+
+def print_results(results):
+    """Print benchmark results as an aligned table."""
+    for result in results:
+        print(format_result(result))
+
+def print_regressions(regressions):
+    """Print the measurements that regressed against the baseline."""
+    for regression in regressions:
+        unit = "s" if regression["metric"] == "seconds" else " MB"
+        print(
+            f"REGRESSION {regression['operation']:<20} {regression['format']:<6} {regression['rows']:>9} rows "
+            f"{regression['metric']}: {regression['baseline']}{unit} -> {regression['current']}{unit} (+{regression['change']:.0%})"
+        )
+
+def print_budget_violations(violations):
+    """Print the startup measurements over their budget."""
+    for violation in violations:
+        print(f"OVER BUDGET {violation['operation']:<28} {violation['metric']}: {violation['current']} (budget: {violation['budget']})")
+
+def main(argv=None):
+    """Run a benchmark suite, optionally store the results as JSON and compare them with a baseline.
+
+    Returns 1 when a measurement regressed against the baseline or a cold start is over its budget,
+    so the suite can gate a CI job.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the ExcelWizard operations without the GUI.")
+    parser.add_argument("-s", "--suite", choices=("operations", "readers", "startup", "all"), default="operations",
+                        help="operations: every operation on one engine; readers: read_data with every reader backend; startup: cold import of the GUI.")
+    parser.add_argument("-r", "--rows", type=int, action="append", help="Fixture size in rows; repeat for several (default: 10000, 100000 and 1000000).")
+    parser.add_argument("-f", "--format", action="append", dest="formats", choices=DEFAULT_FORMATS, help="File format of the operations suite; repeat for several (default: both).")
+    parser.add_argument("--max-excel-rows", type=int, default=MAX_EXCEL_ROWS, help=f"Skip Excel fixtures larger than this (default: {MAX_EXCEL_ROWS}).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the best one is kept.")
+    parser.add_argument("--no-memory", action="store_true", help="Do not trace peak memory (halves the run time of slow operations).")
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file.")
+    parser.add_argument("-b", "--baseline", help="Results file to compare with; regressions are printed and fail the run.")
+    parser.add_argument("--startup-budget", type=float, help=f"Cold import budget of the main menu in seconds (default: {STARTUP_BUDGETS['main_menu_gui']}).")
+    parser.add_argument("-t", "--threshold", type=float, default=DEFAULT_THRESHOLD, help=f"Slowdown or memory growth that counts as a regression (default: {DEFAULT_THRESHOLD}).")
+    args = parser.parse_args(argv)
+
+    common.HEADLESS = True
+    row_counts = args.rows or DEFAULT_ROWS
+    results = []
+    if args.suite in ("operations", "all"):
+        results += benchmark_operations(
+            row_counts, args.formats or DEFAULT_FORMATS, args.repeat, max_excel_rows=args.max_excel_rows,
+            memory=not args.no_memory, progress=lambda result: print(format_result(result), flush=True),
+        )
+    if args.suite in ("readers", "all"):
+        reader_results = benchmark_readers(args.rows or (10000, 100000), args.repeat)
+        print_results(reader_results)
+        results += reader_results
+
+    if args.suite in ("startup", "all"):
+        budgets = dict(STARTUP_BUDGETS, **({"main_menu_gui": args.startup_budget} if args.startup_budget else {}))
+        startup_results = benchmark_startup(budgets, args.repeat)
+        print_results(startup_results)
+        results += startup_results
+
+    report = {"environment": environment(), "results": results, "over_budget": find_budget_violations(results)}
+    print_budget_violations(report["over_budget"])
+    if args.baseline:
+        report["regressions"] = find_regressions(results, load_results(args.baseline), args.threshold)
+        print_regressions(report["regressions"])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    return 1 if report.get("regressions") or report["over_budget"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+#change_set.py
+
+import pandas as pd
+import numpy as np
+import instrumentation
+import streaming_io
+import os
+
+# Kinds of change, in the order they are listed
+UPDATED, INSERTED, ORPHANED = "updated", "inserted", "orphaned"
+
+# File types a change set can be written to
+CHANGE_SET_FORMATS = ('.csv', '.parquet', '.xlsx')
+
+# Updated cells of the highlighted workbook get a comment with their old value up to this many cells
+MAX_COMMENTS = 10000
+
+# Temporary column telling apart the rows of a key that is repeated in the first file
+OCCURRENCE = "__excelwizard_occurrence__"
+
+# Fills of the highlighted workbook, per kind of change
+FILL_COLORS = {UPDATED: "FFF2CC", INSERTED: "E2EFDA", ORPHANED: "FCE4D6"}
+
+def change_records(keys, change, column=None, old_values=None, new_values=None):
+    """Rows of a change set: the keys of the changed rows, the kind of change and for updated cells the old and new value."""
+    records = keys.reset_index(drop=True)
+    records["change"] = change
+    records["column"] = column
+    for name, values in (("old_value", old_values), ("new_value", new_values)):
+        records[name] = None if values is None else pd.Series(values, dtype=object).to_numpy()
+    return records
+
+def changed_cells(current, incoming):
+    """Mask of the cells the incoming values change, for Series or DataFrames with the same labels.
+
+    Same semantics as Series.update: missing values in the second file never overwrite. Arrow-backed
+    columns compare a missing current value as unknown, which counts as changed here as well.
+    """
+    return (incoming.notna() & current.ne(incoming).fillna(True)).astype(bool)
+
+def column_differences(df1, df2, positions, matched, columns):
+    """Yield (column, df1 rows, old values, new values) for the cells df2 changes, one column at a time.
+
+    Only the matched rows of one column of each file are aligned at once, so no copy of the whole
+    files is made.
+    """
+    rows1 = np.flatnonzero(matched)
+    rows2 = positions[rows1]
+    for col in columns:
+        current = df1[col].iloc[rows1].reset_index(drop=True)
+        incoming = df2[col].iloc[rows2].reset_index(drop=True)
+        changed = changed_cells(current, incoming).to_numpy()
+        yield col, rows1[changed], current[changed], incoming[changed]
+
+def build_change_set(df1, df2, key_columns, positions, matched, inserted, columns, update_rows=None):
+    """Build the change set of a compare from match_rows' result, before df1 is updated.
+
+    One row per updated cell of the shared `columns` with its old and new value, then one row per
+    key only in df2 (inserted) and per key only in df1 (orphaned). `update_rows` limits the cells
+    compared to some of the matched rows, e.g. those whose row hash changed.
+    """
+    update_rows = matched if update_rows is None else update_rows
+    with instrumentation.stage("diff", rows=int(update_rows.sum())) as record:
+        parts = []
+        for col, rows, old_values, new_values in column_differences(df1, df2, positions, update_rows, columns):
+            if len(rows):
+                parts.append(change_records(df1[key_columns].iloc[rows], UPDATED, col, old_values, new_values))
+        parts.append(change_records(df2[key_columns].iloc[np.flatnonzero(inserted)], INSERTED))
+        parts.append(change_records(df1[key_columns].iloc[np.flatnonzero(~matched)], ORPHANED))
+        change_set = pd.concat(parts, ignore_index=True)
+        record["bytes"] = instrumentation.frame_size(change_set)
+    return change_set
+
+def summarize_change_set(change_set):
+    """Count the updated cells per column and the inserted and orphaned rows of a change set."""
+    updated = change_set[change_set["change"] == UPDATED]
+    return {
+        "changes": {col: int(count) for col, count in updated["column"].value_counts(sort=False).items()},
+        "rows_inserted": int((change_set["change"] == INSERTED).sum()),
+        "rows_orphaned": int((change_set["change"] == ORPHANED).sum()),
+    }
+
+def cell_value(value):
+    """A change set value as openpyxl can write it, with an empty cell for NA."""
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+def highlighted_sheets(change_set, key_columns):
+    """Rows of the sheets of a highlighted workbook: (sheet name, header, rows of (value, change, old value))."""
+    sheets = []
+    updated = change_set[change_set["change"] == UPDATED]
+    if not updated.empty:
+        # One row per updated key, with its new values in the columns that changed
+        columns = list(dict.fromkeys(updated["column"]))
+        occurrence = updated.groupby(key_columns + ["column"], dropna=False, sort=False).cumcount().rename(OCCURRENCE)
+        # The changed cells of a key repeated in the first file are spread over one row per occurrence; 'Cells' has them exactly
+        wide = updated.join(occurrence).pivot(index=key_columns + [OCCURRENCE], columns="column", values=["new_value", "old_value"])
+        rows = []
+        for keys, values in zip(wide.index, wide.itertuples(index=False, name=None)):
+            new_values = dict(zip(wide.columns, values))
+            row = [(key, None, None) for key in keys[:-1]]
+            for col in columns:
+                if ("new_value", col) in new_values and pd.notna(new_values[("new_value", col)]):
+                    row.append((new_values[("new_value", col)], UPDATED, new_values[("old_value", col)]))
+                else:
+                    row.append((None, None, None))
+            rows.append(row)
+        sheets.append(("Updated", key_columns + columns, rows))
+
+    for change, sheet_name in ((INSERTED, "Inserted"), (ORPHANED, "Orphaned")):
+        keys = change_set.loc[change_set["change"] == change, key_columns]
+        if not keys.empty:
+            sheets.append((sheet_name, key_columns, [[(key, change, None) for key in row] for row in keys.itertuples(index=False, name=None)]))
+
+    # Every cell with its old and new value, for filtering and sorting
+    sheets.append(("Cells", list(change_set.columns), [[(value, None, None) for value in row] for row in change_set.itertuples(index=False, name=None)]))
+    return sheets
+
+def write_highlighted_workbook(change_set, key_columns, output_file_path):
+    """Write a change set as a write-only workbook with coloured cells.
+
+    The 'Updated' sheet has one row per updated key with the new values of the changed cells
+    highlighted (and their old value as a comment); 'Inserted' and 'Orphaned' list the other keys.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.comments import Comment
+    from openpyxl.styles import Font, PatternFill
+
+    fills = {change: PatternFill(start_color=color, end_color=color, fill_type="solid") for change, color in FILL_COLORS.items()}
+    comments = int((change_set["change"] == UPDATED).sum()) <= MAX_COMMENTS
+    workbook = Workbook(write_only=True)
+    for sheet_name, header, rows in highlighted_sheets(change_set, key_columns):
+        sheet = workbook.create_sheet(sheet_name)
+        header_cells = []
+        for name in header:
+            cell = WriteOnlyCell(sheet, value=name)
+            cell.font = Font(bold=True)
+            header_cells.append(cell)
+        sheet.append(header_cells)
+        for row in rows:
+            cells = []
+            for value, change, old_value in row:
+                if change is None:
+                    cells.append(cell_value(value))
+                    continue
+                cell = WriteOnlyCell(sheet, value=cell_value(value))
+                cell.fill = fills[change]
+                if change == UPDATED and comments:
+                    cell.comment = Comment(f"Old value: {cell_value(old_value)}", "ExcelWizard")
+                cells.append(cell)
+            sheet.append(cells)
+    workbook.save(output_file_path)
+
+def write_change_set(change_set, key_columns, output_file_path):
+    """Write a change set to a CSV or Parquet file, or to a highlighted Excel workbook."""
+    file_extension = os.path.splitext(output_file_path)[1].lower()
+    if file_extension not in CHANGE_SET_FORMATS:
+        raise ValueError(f"Unsupported change set format. Please use {', '.join(CHANGE_SET_FORMATS)} extensions.")
+
+    if file_extension == '.xlsx':
+        with instrumentation.stage("write", rows=len(change_set)) as record:
+            write_highlighted_workbook(change_set, key_columns, output_file_path)
+            record["bytes"] = instrumentation.file_size(output_file_path)
+        return
+
+    if file_extension == '.parquet':
+        # Old and new values mix the types of every column; Parquet needs one type per column
+        change_set = change_set.astype({"old_value": "string", "new_value": "string"})
+    streaming_io.write_batches(streaming_io.iter_frame_batches(change_set), output_file_path)
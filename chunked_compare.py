@@ -0,0 +1,172 @@
+#chunked_compare.py
+
+import pandas as pd
+import numpy as np
+import common_code_gui as common
+import compare_update_gui as compare
+import streaming_io
+import arrow_io
+import schema_probe
+import glob
+import math
+import os
+import tempfile
+
+# Default peak memory budget for the out-of-core compare (512 MB)
+DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
+
+# A bucket pair is held in memory a few times over while it is reconciled
+WORKING_SET_FACTOR = 4
+
+# Column used to carry each row's original position through the spill files
+ROW_TAG = "__excelwizard_row__"
+
+# Rows sampled from each file to size the partitions
+PLAN_SAMPLE_ROWS = 10000
+
+def plan_partitions(file1_path, file2_path, memory_budget):
+    """Work out the bucket count and chunk size that keep each step within the memory budget."""
+    estimated_memory = 0
+    row_bytes = 1
+    for file_path in (file1_path, file2_path):
+        probe = schema_probe.probe_file(file_path, PLAN_SAMPLE_ROWS)
+        estimated_memory += probe["estimated_memory"]
+        row_bytes = max(row_bytes, probe["estimated_memory"] / max(probe["estimated_rows"], 1))
+
+    num_buckets = max(1, math.ceil(estimated_memory * WORKING_SET_FACTOR / memory_budget))
+    chunk_rows = max(1000, int(memory_budget / (WORKING_SET_FACTOR * row_bytes)))
+    return num_buckets, chunk_rows
+
+def bucket_ids(chunk, key_columns, num_buckets):
+    """Assign every row to a bucket by hashing its key column(s)."""
+    keys = chunk[key_columns].copy()
+    for col in key_columns:
+        # Chunks infer dtypes independently; hash numbers as floats so 5 and 5.0 land in the same bucket
+        if pd.api.types.is_numeric_dtype(keys[col]) and not pd.api.types.is_bool_dtype(keys[col]):
+            keys[col] = keys[col].astype('float64')
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy() % num_buckets
+
+def partition_file(file_path, key_columns, num_buckets, chunk_rows, spill_dir, prefix):
+    """Split a CSV or Excel file into on-disk buckets by key hash, tagging rows with their position.
+
+    Returns the number of rows and an empty frame carrying the dtype pandas would infer for the whole file.
+    """
+    schema = None
+    row_count = 0
+    for chunk in streaming_io.iter_batches(file_path, chunk_rows):
+        if schema is None:
+            for key in key_columns:
+                if key not in chunk.columns:
+                    raise ValueError(f"Key column '{key}' not found in '{os.path.basename(file_path)}'.")
+            schema = chunk.head(0)
+        else:
+            schema = pd.concat([schema, chunk.head(0)])  # Unify dtypes the way a full read would
+
+        chunk[ROW_TAG] = np.arange(row_count, row_count + len(chunk))
+        row_count += len(chunk)
+
+        for bucket, part in chunk.groupby(bucket_ids(chunk, key_columns, num_buckets)):
+            bucket_path = os.path.join(spill_dir, f"{prefix}_{bucket}.csv")
+            part.to_csv(bucket_path, mode='a', index=False, header=not os.path.exists(bucket_path))
+
+    if schema is None:
+        raise ValueError(f"'{os.path.basename(file_path)}' is empty.")
+    return row_count, schema
+
+def read_bucket(bucket_path, schema):
+    """Read one spilled bucket back with the dtypes of the full file."""
+    if not os.path.exists(bucket_path):
+        return schema.copy()
+    dtypes = {col: (str if dtype == object else dtype) for col, dtype in schema.dtypes.items()}
+    dtypes[ROW_TAG] = 'int64'
+    bucket = pd.read_csv(bucket_path, dtype=dtypes)
+    return bucket.set_index(ROW_TAG)
+
+def spill_frame(frame, path_stem):
+    """Keep an intermediate frame on disk: as Arrow IPC, read back memory-mapped, or as pickle when Arrow cannot hold it.
+
+    Returns the path written.
+    """
+    if common.engine_available('pyarrow') and arrow_io.write_spill(frame, f"{path_stem}.arrow"):
+        return f"{path_stem}.arrow"
+    frame.to_pickle(f"{path_stem}.pkl")
+    return f"{path_stem}.pkl"
+
+def load_spill(path):
+    """Read back a frame written by spill_frame."""
+    return arrow_io.read_spill(path) if path.endswith('.arrow') else pd.read_pickle(path)
+
+def split_into_ranges(merged_path, dtypes, rows_per_range, work_dir, bucket):
+    """Spill the merged rows of a bucket per range of output positions, cast to the final dtypes.
+
+    The merged frame may map its spill file; it is released on return, before the file is removed.
+    """
+    merged_df = load_spill(merged_path).astype(dtypes)
+    for output_range, part in merged_df.groupby(merged_df.index // rows_per_range):
+        spill_frame(part, os.path.join(work_dir, f"range_{output_range}_{bucket}"))
+
+def compare_and_update_chunked(file1_path, file2_path, key_column, output_file_path, decisions, memory_budget=DEFAULT_MEMORY_BUDGET, spill_dir=None):
+    """Compare and update two CSV/Excel files larger than memory, producing the same output as compare_and_update.
+
+    Both files are partitioned by a hash of the key into spill buckets, every bucket pair is reconciled
+    on its own and the merged rows are streamed to the output in their original order. All decisions
+    must be given up front since they apply to every bucket.
+    """
+    try:
+        key_columns = compare.key_columns_list(key_column)
+        compare.validate_decisions(decisions, required=True)
+        for file_path in (file1_path, file2_path, output_file_path):
+            if not file_path.endswith(schema_probe.CHUNKED_EXTENSIONS):
+                raise ValueError("Chunked compare only supports .csv and .xlsx files.")
+        schema_probe.check_file_keys((file1_path, file2_path), key_columns)
+
+        common.log_message(f"Starting chunked update of '{file1_path}' based on '{file2_path}' using key column '{', '.join(key_columns)}'")
+
+        with tempfile.TemporaryDirectory(dir=spill_dir) as work_dir:
+            num_buckets, chunk_rows = plan_partitions(file1_path, file2_path, memory_budget)
+            common.log_message(f"Partitioning into {num_buckets} bucket(s) of {chunk_rows} rows per chunk for a {memory_budget} byte budget.")
+
+            file1_rows, file1_schema = partition_file(file1_path, key_columns, num_buckets, chunk_rows, work_dir, "file1")
+            file2_rows, file2_schema = partition_file(file2_path, key_columns, num_buckets, chunk_rows, work_dir, "file2")
+
+            # Reconcile every bucket pair and keep its result with exact dtypes
+            summary = {"changes": {}, "rows_added": 0, "rows_missing": 0}
+            output_schema = None
+            file_names = (os.path.basename(file1_path), os.path.basename(file2_path))
+            for bucket in range(num_buckets):
+                df1 = read_bucket(os.path.join(work_dir, f"file1_{bucket}.csv"), file1_schema)
+                df2 = read_bucket(os.path.join(work_dir, f"file2_{bucket}.csv"), file2_schema)
+                df2.index = df2.index + file1_rows  # New rows are appended after every row of the first file
+
+                merged_df, bucket_summary = compare.merge_dataframes(df1, df2, key_columns, decisions, file_names, keep_index=True)
+                for col, count in bucket_summary["changes"].items():
+                    summary["changes"][col] = summary["changes"].get(col, 0) + count
+                summary["rows_added"] += bucket_summary["rows_added"]
+                summary["rows_missing"] += bucket_summary["rows_missing"]
+
+                output_schema = merged_df.head(0) if output_schema is None else pd.concat([output_schema, merged_df.head(0)])
+                spill_frame(merged_df, os.path.join(work_dir, f"merged_{bucket}"))
+
+            # Redistribute the merged rows into ranges of output positions, cast to the final dtypes
+            rows_per_range = chunk_rows
+            for bucket in range(num_buckets):
+                merged_path, = glob.glob(os.path.join(work_dir, f"merged_{bucket}.*"))
+                split_into_ranges(merged_path, output_schema.dtypes.to_dict(), rows_per_range, work_dir, bucket)
+                os.remove(merged_path)
+
+            # Stream the ranges to the output file in order
+            def output_batches():
+                yield output_schema
+                for output_range in range(math.ceil((file1_rows + file2_rows) / rows_per_range)):
+                    pieces = [load_spill(path) for path in glob.glob(os.path.join(work_dir, f"range_{output_range}_*.*"))]
+                    if pieces:
+                        yield pd.concat(pieces).sort_index()
+
+            streaming_io.write_batches(output_batches(), output_file_path)
+
+        common.log_message(f"Updated values per column:\n{compare.format_changes(summary['changes'])}", level='info')
+        common.log_message(f"Updated file saved as '{output_file_path}'", level='info')
+        return summary
+
+    except Exception as e:
+        raise e
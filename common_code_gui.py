@@ -1,11 +1,56 @@
 #common_code_gui.py
 
-import pandas as pd
+import importlib.util
+import functools
 import os
+import threading
 from tkinter import filedialog, Toplevel
 import tkinter as tk
-from main_menu_gui import logging
+import logging
 import tkinter.font as tkFont
+import instrumentation
+from lazy_loader import LazyModule
+
+# Imported on first use, so opening the main menu does not wait for pandas
+pd = LazyModule("pandas")
+workbook_cache = LazyModule("workbook_cache")
+streaming_io = LazyModule("streaming_io")
+arrow_io = LazyModule("arrow_io")
+
+# Reader backends per file type; the first one is today's pandas default and the fallback
+READ_ENGINES = {
+    '.csv': ('c', 'pyarrow'),
+    '.xlsx': ('openpyxl', 'calamine'),
+    '.xls': ('xlrd', 'calamine'),
+}
+
+# Optional packages each non-default backend needs
+ENGINE_PACKAGES = {'pyarrow': 'pyarrow', 'calamine': 'python_calamine'}
+
+# Backend used when read_data is not given one: 'default', 'fast' (fastest installed) or an engine name,
+# for every file type or per type as e.g. 'csv=pyarrow,xlsx=calamine'
+READ_ENGINE = os.environ.get("EXCELWIZARD_READ_ENGINE", "default")
+
+# Column storage of the frames read_data returns: 'numpy' (pandas' default) or 'pyarrow' (Arrow-backed columns)
+DTYPE_BACKENDS = ('numpy', 'pyarrow')
+DTYPE_BACKEND = os.environ.get("EXCELWIZARD_DTYPE_BACKEND", "numpy")
+
+# Set when running without a GUI (command line, batch jobs): messages are only logged and
+# dialogs raise instead of waiting for input that can never come
+HEADLESS = False
+
+# Runs a function on the Tk thread and returns its result; set by background_tasks while the GUI is up,
+# so dialogs opened by operations running in worker threads are still created by the Tk thread
+GUI_DISPATCHER = None
+
+def on_gui_thread(function):
+    """Decorator for dialogs: calls from worker threads are handed to GUI_DISPATCHER and wait for the answer."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if GUI_DISPATCHER is not None and threading.current_thread() is not threading.main_thread():
+            return GUI_DISPATCHER(function, *args, **kwargs)
+        return function(*args, **kwargs)
+    return wrapper
 
 def log_message(message, level='info'):
     """Logs a message with the specified severity level."""
@@ -25,8 +70,13 @@ def handle_exception(e):
     display_message(error_message, status="error")
     #sys.exit(1)  # Exit with a non-zero status to indicate an error
 
+@on_gui_thread
 def display_message(message, status="info"):
     """Displays a message to the user with a standard message box appearance."""
+    if HEADLESS:
+        log_message(message, level='error' if status in ("fail", "error") else 'info')
+        return
+
     title = {
         "success": "Success",
         "fail": "Fail",
@@ -78,28 +128,128 @@ def display_message(message, status="info"):
     msg_window.focus_set()  # Set focus to the message box
     msg_window.wait_window()  # Wait for the message box to be closed
 
-def read_data(file_path):
+def engine_available(engine):
+    """Check whether the optional package behind a reader backend is installed."""
+    package = ENGINE_PACKAGES.get(engine)
+    return package is None or importlib.util.find_spec(package) is not None
+
+def parse_engine_choice(engine):
+    """Split an engine choice into {file extension: engine}; a single name applies to every file type (key None).
+
+    Raises for unknown engine names and file types, so a typo fails before any file is read.
+    """
+    known = {'default', 'fast'}.union(*READ_ENGINES.values())
+    choices = {}
+    for part in engine.split(','):
+        file_type, _, name = part.strip().rpartition('=')
+        file_extension = '.' + file_type.strip().lstrip('.').lower() if file_type else None
+        name = name.strip()
+        if file_extension is not None and file_extension not in READ_ENGINES:
+            raise ValueError(f"Unknown file type '{file_type}' in reader engine '{engine}'. Expected one of: {', '.join(ext[1:] for ext in READ_ENGINES)}.")
+        if name not in known:
+            raise ValueError(f"Unknown reader engine '{name}'. Expected one of: {', '.join(sorted(known))}.")
+        if file_extension is not None and name not in ('default', 'fast') + READ_ENGINES[file_extension]:
+            raise ValueError(f"Reader engine '{name}' does not read {file_extension} files. Expected one of: {', '.join(READ_ENGINES[file_extension])}.")
+        choices[file_extension] = name
+    return choices
+
+def resolve_engine(file_path, engine=None):
+    """Pick the reader backend for a file, falling back to the pandas default when the choice is unavailable.
+
+    An engine that does not read this file type (e.g. 'calamine' for a CSV file) also falls back to
+    its default, so one choice can be given for inputs of different types.
+    """
+    file_extension = os.path.splitext(file_path)[1].lower()
+    engines = READ_ENGINES[file_extension]
+    choices = parse_engine_choice(engine or READ_ENGINE)
+    engine = choices.get(file_extension, choices.get(None, 'default'))
+
+    if engine == 'default':
+        return engines[0]
+    if engine == 'fast':
+        return next((name for name in reversed(engines) if engine_available(name)), engines[0])
+    if engine not in engines:
+        return engines[0]
+    if not engine_available(engine):
+        log_message(f"Reader engine '{engine}' is not installed (pip install {ENGINE_PACKAGES[engine].replace('_', '-')}); using '{engines[0]}'.", level='warning')
+        return engines[0]
+    return engine
+
+def resolve_dtype_backend(dtype_backend=None):
+    """Pick the column storage for read_data, falling back to NumPy when pyarrow is not installed."""
+    dtype_backend = dtype_backend or DTYPE_BACKEND
+    if dtype_backend not in DTYPE_BACKENDS:
+        raise ValueError(f"Unknown dtype backend '{dtype_backend}'. Expected one of: {', '.join(DTYPE_BACKENDS)}.")
+    if dtype_backend == 'pyarrow' and not engine_available('pyarrow'):
+        log_message("The pyarrow dtype backend is not installed (pip install pyarrow); using 'numpy'.", level='warning')
+        return 'numpy'
+    return dtype_backend
+
+@instrumentation.instrumented("read", measure=lambda dataframe, file_path, *args, **kwargs: (len(dataframe), instrumentation.file_size(file_path)))
+def read_data(file_path, engine=None, dtype=None, usecols=None, sheet_name=0, dtype_backend=None):
+    """Read a CSV, Excel, Parquet or Arrow IPC (Feather) file with the chosen reader backend.
+
+    `dtype` and `usecols` are passed to pandas so only the needed columns are parsed, with known types.
+    `sheet_name` picks the Excel sheet to read (the first one by default). With the 'pyarrow'
+    `dtype_backend` the columns are Arrow arrays; Parquet and Feather files are then memory-mapped.
+    """
     try:
+        dtype_backend = resolve_dtype_backend(dtype_backend)
+        backend_options = {"dtype_backend": dtype_backend} if dtype_backend == 'pyarrow' else {}
         if file_path.endswith('.csv'):
-            return pd.read_csv(file_path)
+            return pd.read_csv(file_path, engine=resolve_engine(file_path, engine), dtype=dtype, usecols=usecols, **backend_options)
         elif file_path.endswith(('.xls', '.xlsx')):
-            return pd.read_excel(file_path)
+            excel_engine = resolve_engine(file_path, engine)
+            if excel_engine == 'xlrd':
+                excel_engine = None  # Let pandas pick its reader for legacy .xls files
+            return workbook_cache.cached_read(
+                file_path,
+                lambda path: pd.read_excel(path, sheet_name=sheet_name, engine=excel_engine, dtype=dtype, usecols=usecols, **backend_options),
+                variant=repr((excel_engine, dtype, usecols, sheet_name) + ((dtype_backend,) if backend_options else ())),
+            )
+        elif arrow_io.is_arrow_file(file_path):
+            dataframe = arrow_io.read_frame(file_path, usecols, dtype_backend)
+            return dataframe.astype(dtype) if dtype else dataframe
         else:
             raise ValueError("Unsupported file format. Please select a CSV or Excel file.")
     except Exception as e:
         raise e
 
+def read_columns(file_path, sheet_name=0):
+    """Read only the header row of a CSV file or an Excel sheet (or the schema of a Parquet/Feather file)."""
+    if file_path.endswith('.csv'):
+        return list(pd.read_csv(file_path, nrows=0).columns)
+    elif file_path.endswith(('.xls', '.xlsx')):
+        return list(pd.read_excel(file_path, sheet_name=sheet_name, nrows=0).columns)
+    elif arrow_io.is_arrow_file(file_path):
+        return arrow_io.column_names(file_path)
+    else:
+        raise ValueError("Unsupported file format. Please select a CSV or Excel file.")
+
+def sheet_names(file_path):
+    """List the sheets of an Excel workbook; a CSV (or Parquet/Feather) file has a single unnamed sheet (None)."""
+    if file_path.endswith('.csv') or arrow_io.is_arrow_file(file_path):
+        return [None]
+    with pd.ExcelFile(file_path) as workbook:
+        return workbook.sheet_names
+
 def save_merged_file(merged_df, output_file_path):
-    """Automatically detects whether the output file is a .csv or .xlsx and handles the file creation."""
+    """Automatically detects whether the output file is a .csv, .xlsx, .parquet or .feather/.arrow and handles the file creation."""
     try:
         file_extension = os.path.splitext(output_file_path)[1].lower()
 
         if file_extension == '.xlsx':
-            merged_df.to_excel(output_file_path, index=False)
+            # Write-only workbook, so the output is not held as openpyxl cells on top of the DataFrame
+            streaming_io.write_batches(streaming_io.iter_frame_batches(merged_df), output_file_path)
         elif file_extension == '.csv':
-            merged_df.to_csv(output_file_path, index=False)
+            with instrumentation.stage("write", rows=len(merged_df)) as record:
+                arrow_io.csv_ready(merged_df).to_csv(output_file_path, index=False)
+                record["bytes"] = instrumentation.file_size(output_file_path)
+        elif file_extension in ('.parquet', '.feather', '.arrow'):
+            # One Arrow table of the whole frame; Arrow-backed columns are handed over without copying
+            arrow_io.write_frame(merged_df, output_file_path)
         else:
-            raise ValueError("Unsupported file format. Please use .xlsx or .csv extensions.")
+            raise ValueError("Unsupported file format. Please use .xlsx, .csv, .parquet or .feather extensions.")
     except Exception as e:
         raise e
 
@@ -118,6 +268,7 @@ def validate_filename(file_path, status=""):
 
     return True, ""
 
+@on_gui_thread
 def open_file_dialog(title):
     """Open a file dialog to select a file."""
     file_path = filedialog.askopenfilename(title=title)
@@ -130,6 +281,7 @@ def open_file_dialog(title):
     
     return file_path,""
 
+@on_gui_thread
 def save_file_dialog(title):
     """Open a save file dialog to select where to save the file."""
 
@@ -154,8 +306,12 @@ def save_file_dialog(title):
     
     return file_path,""
 
+@on_gui_thread
 def simple_input_dialog(title, prompt):
     """Create a stylish Tkinter dialog to get user input."""
+    if HEADLESS:
+        raise ValueError(f"'{title}' needs an answer but no dialog can be shown in headless mode.")
+
     # Create a new top-level window for the input dialog
     dialog = Toplevel()
     dialog.title(title)
@@ -0,0 +1,106 @@
+#compact_dtypes.py
+
+import pandas as pd
+import numpy as np
+import common_code_gui as common
+import instrumentation
+import importlib.util
+import os
+
+# Compact the frames of a compare by default (the CLI's --compact)
+COMPACT_DTYPES = os.environ.get("EXCELWIZARD_COMPACT_DTYPES", "0") == "1"
+
+# A text column becomes categorical when it has at most this many distinct values per row...
+CATEGORY_MAX_RATIO = 0.5
+
+# ...otherwise it is stored as Arrow strings, when pyarrow is installed
+ARROW_STRING = "string[pyarrow]"
+
+def frame_memory(frame):
+    """Memory held by a DataFrame including its Python string objects, in bytes."""
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+def is_text(series):
+    """Check whether an object column holds only strings (and missing values)."""
+    values = series.dropna()
+    return len(values) > 0 and pd.api.types.infer_dtype(values, skipna=True) == "string"
+
+def compact_numbers(series):
+    """Downcast an integer column to the smallest integer type, and a float column to float32 when no value changes."""
+    if pd.api.types.is_integer_dtype(series) and isinstance(series.dtype, np.dtype):
+        return pd.to_numeric(series, downcast="integer")
+    if pd.api.types.is_float_dtype(series) and series.dtype == np.float64:
+        smaller = series.astype(np.float32)
+        if np.array_equal(smaller.to_numpy(dtype=np.float64), series.to_numpy(), equal_nan=True):
+            return smaller
+    return series
+
+def compact_text(series, category_max_ratio=CATEGORY_MAX_RATIO):
+    """Turn a string column into a categorical when values repeat, or into Arrow strings otherwise."""
+    if series.nunique(dropna=True) <= category_max_ratio * len(series):
+        return series.astype("category")
+    if importlib.util.find_spec("pyarrow") is not None:
+        return series.astype(ARROW_STRING)
+    return series
+
+def compact_frame(frame, label="frame", category_max_ratio=CATEGORY_MAX_RATIO):
+    """Store a DataFrame's columns in the smallest dtypes that keep every value.
+
+    Numbers are downcast, repeated strings become categoricals and other strings Arrow strings; mixed
+    object columns are left alone. Returns the frame and a report of the memory before and after.
+    """
+    with instrumentation.stage("compact", rows=len(frame)) as record:
+        bytes_before = frame_memory(frame)
+        changed = {}
+        for col in frame.columns:
+            series = frame[col]
+            if series.dtype == object:
+                compacted = compact_text(series, category_max_ratio) if is_text(series) else series
+            elif pd.api.types.is_bool_dtype(series):
+                compacted = series
+            else:
+                compacted = compact_numbers(series)
+            if compacted.dtype != series.dtype:
+                frame[col] = compacted
+                changed[col] = f"{series.dtype} -> {compacted.dtype}"
+        bytes_after = frame_memory(frame)
+        record["bytes"] = bytes_after
+
+    report = {"bytes_before": bytes_before, "bytes_after": bytes_after, "columns": changed}
+    common.log_message(f"Compacted {label}: {format_memory(report)}", level='info')
+    return frame, report
+
+def format_memory(report):
+    """Memory before and after compacting, for logs and messages."""
+    before, after = report["bytes_before"], report["bytes_after"]
+    saved = 1 - after / before if before else 0
+    return f"{before / 2**20:.1f} MB -> {after / 2**20:.1f} MB ({saved:.0%} saved)"
+
+def unify_dtypes(df1, df2, columns):
+    """Give the columns shared by two compacted frames the same dtype, so they compare and update in place.
+
+    Categoricals get the union of both files' categories and numbers the wider of both types. A
+    categorical or Arrow string column facing another type goes back to plain values.
+    """
+    for col in columns:
+        dtype1, dtype2 = df1[col].dtype, df2[col].dtype
+        if dtype1 == dtype2 and not isinstance(dtype1, pd.CategoricalDtype):
+            continue
+        if isinstance(dtype1, pd.CategoricalDtype) and isinstance(dtype2, pd.CategoricalDtype):
+            if not dtype1.categories.equals(dtype2.categories):
+                categories = pd.CategoricalDtype(dtype1.categories.union(dtype2.categories))
+                df1[col] = df1[col].astype(categories)
+                df2[col] = df2[col].astype(categories)
+        elif isinstance(dtype1, pd.CategoricalDtype):
+            df1[col] = df1[col].astype(dtype1.categories.dtype)
+        elif isinstance(dtype2, pd.CategoricalDtype):
+            df2[col] = df2[col].astype(dtype2.categories.dtype)
+        elif isinstance(dtype1, pd.StringDtype) or isinstance(dtype2, pd.StringDtype):
+            # Arrow strings only take strings; the other file's column may hold numbers to write over them
+            for frame, dtype in ((df1, dtype1), (df2, dtype2)):
+                if isinstance(dtype, pd.StringDtype):
+                    frame[col] = frame[col].astype(object)
+        elif isinstance(dtype1, np.dtype) and isinstance(dtype2, np.dtype) and dtype1.kind in "iuf" and dtype2.kind in "iuf":
+            common_dtype = np.result_type(dtype1, dtype2)
+            df1[col] = df1[col].astype(common_dtype)
+            df2[col] = df2[col].astype(common_dtype)
@@ -1,115 +1,388 @@
 #compare_update_gui.py
 
 import pandas as pd
+import numpy as np
 import common_code_gui as common
+import instrumentation
+from change_set import build_change_set, changed_cells, summarize_change_set, write_change_set, CHANGE_SET_FORMATS
+import key_snapshots
+import compact_dtypes
+import schema_probe
 import os
-def compare_and_update(file1_path, file2_path, key_column, output_file_path):
+
+def key_columns_list(key_column):
+    """Normalise a single key column name or a list of names (composite key) to a list."""
+    if isinstance(key_column, str):
+        return [key_column]
+    return list(key_column)
+
+def build_key_index(df, key_columns):
+    """Build a hash index over the key column(s) of a DataFrame."""
+    if len(key_columns) == 1:
+        return pd.Index(df[key_columns[0]])
+    return pd.MultiIndex.from_frame(df[key_columns])
+
+def match_rows(df1, df2, key_columns):
+    """Hash-join the rows of df1 against df2 on the key column(s) in a single pass.
+
+    Returns the position of every df1 row in df2 (-1 when the key is missing from df2),
+    a mask of df1 rows that were matched and a mask of df2 rows that are new to df1.
+    """
+    file2_index = build_key_index(df2, key_columns)
+    if not file2_index.is_unique:
+        raise ValueError(f"Key column '{', '.join(key_columns)}' is not unique in the second file.")
+
+    positions = file2_index.get_indexer(build_key_index(df1, key_columns))
+    matched = positions >= 0
+
+    # Every df2 row that no df1 row points at is a new row
+    inserted = np.ones(len(df2), dtype=bool)
+    inserted[positions[matched]] = False
+    return positions, matched, inserted
+
+def align_to_file1(df1, df2, positions, matched, columns):
+    """Take the df2 values of the given columns for the matched df1 rows, labelled with df1's index."""
+    aligned = df2[columns].iloc[positions[matched]]
+    aligned.index = df1.index[matched]
+    return aligned
+
+def fit_column_dtype(values, dtype):
+    """Cast the new values of a column to its dtype when no value changes, so 10.0 updating an int column stays 10."""
+    values = values.infer_objects()
+    if values.dtype == dtype:
+        return values
     try:
-        common.log_message(f"Starting update of '{file1_path}' based on '{file2_path}' using key column '{key_column}'")
-        
-        # Read the input files
-        df1 = common.read_data(file1_path)
-        df2 = common.read_data(file2_path)
-
-        # Ensure key_column exists in both dataframes
-        if key_column not in df1.columns:
-            raise ValueError(f"Key column '{key_column}' not found in the first file.")
-
-        if key_column not in df2.columns:
-            raise ValueError(f"Key column '{key_column}' not found in the second file.")
-
-        # Handle extra columns in df1
-        extra_columns_file1 = set(df1.columns) - set(df2.columns)
-        if extra_columns_file1:
-            user_choice = common.simple_input_dialog(
-                "Extra Columns in File 1",
-                f"The following extra columns are in '{os.path.basename(file1_path)}' : \n\n{', '.join(extra_columns_file1)}.\n\n"
-                "Do you want to:\n"
-                "1. Remove these columns\n"
-                "2. Keep these columns and fill with NA\n"
-                "3. Keep these columns without any change\n\n"
-                "Please type 'remove', 'fill', or 'keep':"
-            )
+        cast = values.astype(dtype)
+    except (TypeError, ValueError, OverflowError):
+        return values
+    return cast if (cast == values).all() else values
 
-            if user_choice.lower() == 'remove':
-                df1.drop(columns=extra_columns_file1, inplace=True)
-                common.log_message("Removed extra columns from the first file.", level='info')
-            elif user_choice.lower() == 'fill':
-                for col in extra_columns_file1:
-                    df1[col].fillna("NA", inplace=True)
-                common.log_message("Filled extra columns in the first file with 'NA'.", level='info')
-            elif user_choice.lower() == 'keep':
-                common.log_message("Kept extra columns in the first file without change.", level='info')
-            else:
-                raise ValueError(f"Invalid choice. Operation canceled.")
-
-
-        # Update existing rows in df1 with values from df2 based on the key column
-        for col in df2.columns:
-            if col != key_column and col in df1.columns:
-                df1[col].update(df2.set_index(key_column)[col])
-        
-        # Handle new columns in df2
-        new_columns = set(df2.columns) - set(df1.columns)
-        if new_columns:
-            user_choice = common.simple_input_dialog(
-                "New Columns from File 2",
-                f"The following new columns are in '{os.path.basename(file2_path)}' : \n\n{', '.join(new_columns)}.\n\n"
-                "Do you want to include these columns in the first file? (Type 'yes' to include or 'no' to skip):"
-            )
-            if user_choice and user_choice.lower() == 'yes':
-                for col in new_columns:
-                    df1[col] = df2.set_index(key_column)[col]  # Add new column values
-                common.log_message("Included new columns from the second file.", level='info')
-            elif user_choice.lower() == 'no':
-                common.log_message("Skipped new columns from the second file.", level='info')
-            else:
-                raise ValueError(f"Invalid choice. Operation canceled.")    
-
-        # Check for new rows in df2 that are not in df1
-        new_rows = df2[~df2[key_column].isin(df1[key_column])]
-        if not new_rows.empty:
-            user_choice = common.simple_input_dialog(
-                "New Rows from File 2",
-                f"There are new rows in '{os.path.basename(file2_path)}' not present in '{os.path.basename(file1_path)}'.\n\n"
-                f"Do you want to add these new rows to the '{os.path.basename(file1_path)}'? (Type 'yes' to include or 'no' to skip):"
-            )
-            if user_choice and user_choice.lower() == 'yes':
-                df1 = pd.concat([df1, new_rows], ignore_index=True)
-                common.log_message("Included new rows from the second file.", level='info')
-            elif user_choice.lower() == 'no':
-                common.log_message("Skipped new rows from the second file.", level='info')
+def apply_column_updates(df1, aligned, columns):
+    """Overwrite df1 with the non-null aligned df2 values, one column at a time, and count changed rows per column."""
+    if not columns or aligned.empty:
+        return {col: 0 for col in columns}
+
+    current = df1.loc[aligned.index, columns]
+    incoming = aligned[columns]
+
+    # Same semantics as Series.update: missing values in the second file never overwrite
+    changed = changed_cells(current, incoming)
+    changes = {col: int(count) for col, count in changed.sum().items()}
+
+    for col in columns:
+        if not changes[col]:
+            continue
+        rows = changed[col].to_numpy()
+        values = fit_column_dtype(incoming.loc[rows, col], df1[col].dtype)
+        # Values the column cannot hold widen it first, e.g. int to float, as Series.update did
+        if values.dtype != df1[col].dtype and isinstance(values.dtype, np.dtype) and isinstance(df1[col].dtype, np.dtype):
+            df1[col] = df1[col].astype(np.result_type(df1[col].dtype, values.dtype))
+        df1.loc[aligned.index[rows], col] = values
+    return changes
+
+def format_changes(changes):
+    """Format the per-column change counts for logs and messages."""
+    return "\n".join(f"{col}: {count} row(s)" for col, count in changes.items() if count) or "No values changed."
+
+# Answers accepted for every question compare/update can ask
+DECISION_CHOICES = {
+    'extra_columns': ('remove', 'fill', 'keep'),
+    'new_columns': ('yes', 'no'),
+    'new_rows': ('yes', 'no'),
+    'missing_rows': ('keep', 'set'),
+}
+
+# Questions for asking every decision before the files are read, as the chunked engine needs
+DECISION_PROMPTS = {
+    'extra_columns': "Columns only in the first file: remove them, fill them with NA or keep them as is?\n\nPlease type 'remove', 'fill', or 'keep':",
+    'new_columns': "Columns only in the second file: include them in the first file?\n\n(Type 'yes' to include or 'no' to skip):",
+    'new_rows': "Rows only in the second file: add them to the first file?\n\n(Type 'yes' to include or 'no' to skip):",
+    'missing_rows': "Rows only in the first file: keep them as is or set their values to NA?\n\nPlease type 'keep' or 'Set':",
+}
+
+def ask_all_decisions(decisions=None):
+    """Ask every decision not given in `decisions` up front and return them all."""
+    decisions = dict(decisions or {})
+    for name in DECISION_CHOICES:
+        answer = ask_decision(decisions, name, name.replace('_', ' ').title(), DECISION_PROMPTS[name])
+        decisions[name] = (answer or "").lower()
+    validate_decisions(decisions, required=True)
+    return decisions
+
+def ask_decision(decisions, name, title, prompt):
+    """Take a compare/update decision from `decisions` when given, otherwise ask the user.
+
+    The prompt may be a callable so expensive prompts are only built when the dialog is shown.
+    """
+    if decisions and decisions.get(name):
+        return decisions[name]
+    return common.simple_input_dialog(title, prompt() if callable(prompt) else prompt)
+
+def validate_decisions(decisions, required=False):
+    """Check that given decisions are known answers; with `required`, every decision must be given."""
+    for name, choice in (decisions or {}).items():
+        if name not in DECISION_CHOICES:
+            raise ValueError(f"Unknown decision '{name}'. Expected one of: {', '.join(DECISION_CHOICES)}.")
+        if str(choice).lower() not in DECISION_CHOICES[name]:
+            raise ValueError(f"Invalid choice '{choice}' for '{name}'. Expected one of: {', '.join(DECISION_CHOICES[name])}.")
+
+    if required:
+        missing = [name for name in DECISION_CHOICES if not (decisions or {}).get(name)]
+        if missing:
+            raise ValueError(f"Missing decisions for: {', '.join(missing)}.")
+
+def check_key_columns(df1, df2, key_columns):
+    """Ensure every key column exists in both dataframes."""
+    for key in key_columns:
+        if key not in df1.columns:
+            raise ValueError(f"Key column '{key}' not found in the first file.")
+
+        if key not in df2.columns:
+            raise ValueError(f"Key column '{key}' not found in the second file.")
+
+def merge_dataframes(df1, df2, key_columns, decisions=None, file_names=("File 1", "File 2"), keep_index=False, file2_columns=None, with_change_set=False,
+                     row_hashes=None):
+    """Update df1 with df2 on the key column(s) and return the merged DataFrame with a change summary.
+
+    Questions are answered from `decisions` (see DECISION_CHOICES) or through dialogs. With
+    `keep_index`, new rows keep their df2 index labels instead of the frame being renumbered.
+    `file2_columns` is the full header of the second file when df2 only holds some of its columns.
+    With `with_change_set`, the summary also holds the change set (see build_change_set), taken
+    while comparing and before any decision is applied. With `row_hashes`, the hashes of the shared
+    columns of every df1 and df2 row (see key_snapshots), only matched rows whose hashes differ are
+    compared and updated, and the summary marks the merged rows that may differ from df1.
+    """
+    file1_name, file2_name = file_names
+
+    # Handle extra columns in df1
+    extra_columns_file1 = [col for col in df1.columns if col not in (file2_columns or df2.columns)]
+    if extra_columns_file1:
+        user_choice = ask_decision(
+            decisions, 'extra_columns',
+            "Extra Columns in File 1",
+            f"The following extra columns are in '{file1_name}' : \n\n{', '.join(extra_columns_file1)}.\n\n"
+            "Do you want to:\n"
+            "1. Remove these columns\n"
+            "2. Keep these columns and fill with NA\n"
+            "3. Keep these columns without any change\n\n"
+            "Please type 'remove', 'fill', or 'keep':"
+        )
+
+        if user_choice.lower() == 'remove':
+            df1.drop(columns=extra_columns_file1, inplace=True)
+            common.log_message("Removed extra columns from the first file.", level='info')
+        elif user_choice.lower() == 'fill':
+            for col in extra_columns_file1:
+                if isinstance(df1[col].dtype, pd.CategoricalDtype) and "NA" not in df1[col].cat.categories:
+                    df1[col] = df1[col].cat.add_categories(["NA"])  # Compacted text columns only take known values
+                elif isinstance(df1[col].dtype, pd.ArrowDtype) and df1[col].hasnans and not pd.api.types.is_string_dtype(df1[col]):
+                    df1[col] = df1[col].astype(object)  # Arrow number and date columns do not take 'NA' text
+            df1[extra_columns_file1] = df1[extra_columns_file1].fillna("NA")
+            common.log_message("Filled extra columns in the first file with 'NA'.", level='info')
+        elif user_choice.lower() == 'keep':
+            common.log_message("Kept extra columns in the first file without change.", level='info')
+        else:
+            raise ValueError(f"Invalid choice. Operation canceled.")
+
+    # Index both files by key once and find updated, new and missing rows in one pass
+    with instrumentation.stage("compare", rows=len(df1) + len(df2)):
+        positions, matched, inserted = match_rows(df1, df2, key_columns)
+
+    # Update existing rows in df1 with values from df2 based on the key column(s)
+    shared_columns = [col for col in df2.columns if col not in key_columns and col in df1.columns]
+    update_rows = matched
+    if row_hashes is not None:
+        update_rows = key_snapshots.changed_rows(row_hashes, positions, matched)
+        common.log_message(f"{int(update_rows.sum())} of {int(matched.sum())} matched row(s) differ by row hash.", level='info')
+    change_set = build_change_set(df1, df2, key_columns, positions, matched, inserted, shared_columns, update_rows) if with_change_set else None
+    with instrumentation.stage("update", rows=int(update_rows.sum())) as record:
+        changes = apply_column_updates(df1, align_to_file1(df1, df2, positions, update_rows, shared_columns), shared_columns)
+        record["bytes"] = instrumentation.frame_size(df1)
+    common.log_message(f"Updated values per column:\n{format_changes(changes)}", level='info')
+    
+    # Handle new columns in df2
+    new_columns = [col for col in df2.columns if col not in df1.columns]
+    if new_columns:
+        user_choice = ask_decision(
+            decisions, 'new_columns',
+            "New Columns from File 2",
+            f"The following new columns are in '{file2_name}' : \n\n{', '.join(new_columns)}.\n\n"
+            "Do you want to include these columns in the first file? (Type 'yes' to include or 'no' to skip):"
+        )
+        if user_choice and user_choice.lower() == 'yes':
+            aligned = align_to_file1(df1, df2, positions, matched, new_columns)
+            for col in new_columns:
+                df1[col] = aligned[col]  # Add new column values, NA for rows missing in df2
+                changes[col] = int(aligned[col].notna().sum())
+            common.log_message("Included new columns from the second file.", level='info')
+        elif user_choice.lower() == 'no':
+            common.log_message("Skipped new columns from the second file.", level='info')
+        else:
+            raise ValueError(f"Invalid choice. Operation canceled.")    
+
+    # Check for new rows in df2 that are not in df1
+    new_rows = df2[inserted]
+    rows_added = 0
+    if not new_rows.empty:
+        user_choice = ask_decision(
+            decisions, 'new_rows',
+            "New Rows from File 2",
+            f"There are new rows in '{file2_name}' not present in '{file1_name}'.\n\n"
+            f"Do you want to add these new rows to the '{file1_name}'? (Type 'yes' to include or 'no' to skip):"
+        )
+        if user_choice and user_choice.lower() == 'yes':
+            df1 = pd.concat([df1, new_rows], ignore_index=not keep_index)
+            rows_added = len(new_rows)
+            common.log_message("Included new rows from the second file.", level='info')
+        elif user_choice.lower() == 'no':
+            common.log_message("Skipped new rows from the second file.", level='info')
+        else:
+            raise ValueError(f"Invalid choice. Operation canceled.")
+
+    # Check for missing rows in df2 that are in df1 (appended rows always come from df2)
+    missing = np.concatenate([~matched, np.zeros(len(df1) - len(matched), dtype=bool)])
+    if missing.any():
+        user_choice = ask_decision(
+            decisions, 'missing_rows',
+            "Missing Rows in File 2",
+            lambda: f"The following rows are in '{file1_name}' but not in '{file2_name}' :\n\n"
+            f"{build_key_index(df1[missing], key_columns).tolist()}.\n\n"
+            "Do you want to:\n"
+            "1. Keep these rows as is\n"
+            "2. Set the values in these rows to NA\n\n"
+            "Please type 'keep' or 'Set':"
+        )
+
+        if user_choice.lower() == 'set':
+            value_columns = [col for col in df1.columns if col not in key_columns]
+            df1[value_columns] = df1[value_columns].astype(object)  # 'NA' text does not fit numeric columns
+            df1.loc[missing, value_columns] = "NA"
+            common.log_message("Set missing rows to 'NA' in the first file.", level='info')
+        elif user_choice.lower() == 'keep':
+            common.log_message("Kept missing rows in the first file as is.", level='info')
+        else:
+            raise ValueError(f"Invalid choice. Operation canceled.")
+
+    summary = {"changes": changes, "rows_added": rows_added, "rows_missing": int(missing.sum())}
+    if with_change_set:
+        summary["change_set"] = change_set
+    if row_hashes is not None:
+        summary["rehash_rows"] = np.concatenate([update_rows | ~matched, np.ones(len(df1) - len(matched), dtype=bool)])
+    return df1, summary
+
+def diff_dataframes(df1, df2, key_columns, row_hashes=None):
+    """Compare df2 with df1 on the key column(s) and return only the change set, without updating df1.
+
+    With `row_hashes` (see merge_dataframes), only matched rows whose hashes differ are compared.
+    """
+    with instrumentation.stage("compare", rows=len(df1) + len(df2)):
+        positions, matched, inserted = match_rows(df1, df2, key_columns)
+    shared_columns = [col for col in df2.columns if col not in key_columns and col in df1.columns]
+    update_rows = key_snapshots.changed_rows(row_hashes, positions, matched) if row_hashes is not None else None
+    return build_change_set(df1, df2, key_columns, positions, matched, inserted, shared_columns, update_rows)
+
+def compare_and_update(file1_path, file2_path, key_column, output_file_path, decisions=None, read_options=None, update_columns=None,
+                       change_set_path=None, change_set_only=False, incremental=None, compact=None):
+    """Update the first file with the second on the key column(s) and save the result.
+
+    `read_options` (engine, dtype) are passed to read_data for both files. With `update_columns`, only
+    the key and those columns are parsed from the second file, so only they are updated or added.
+    `change_set_path` also saves the change set: the old and new value of every updated cell and the
+    keys of inserted and orphaned rows, as CSV, Parquet or a highlighted workbook. With
+    `change_set_only`, only the change set is saved; no question is asked and no merged file is written.
+    `incremental` (key_snapshots.INCREMENTAL by default) compares per-row hashes first, reusing the
+    snapshot of a file hashed before, so only rows whose hash changed are compared and updated; the
+    output's hashes are stored too, so it can be the first file of the next compare without rehashing.
+    `compact` (compact_dtypes.COMPACT_DTYPES by default) stores both files in compact dtypes after
+    reading them, keeps those dtypes through the update and reports the memory saved per file.
+    """
+    try:
+        key_columns = key_columns_list(key_column)
+        validate_decisions(decisions)
+        if change_set_only and not change_set_path:
+            raise ValueError("No change set file provided.")
+        if change_set_path and not change_set_path.lower().endswith(CHANGE_SET_FORMATS):
+            raise ValueError(f"Unsupported change set format. Please use {', '.join(CHANGE_SET_FORMATS)} extensions.")
+        read_options = read_options or {}
+        # A mistyped key fails on the header rows, not after both files are parsed
+        schema_probe.check_file_keys((file1_path, file2_path), key_columns)
+        common.log_message(f"Starting {'compare' if change_set_only else 'update'} of '{file1_path}' based on '{file2_path}' using key column '{', '.join(key_columns)}'")
+
+        with instrumentation.run("compare_and_update") as run:
+            first_stage = len(run["stages"])
+
+            # Read the input files
+            df1 = common.read_data(file1_path, **read_options)
+            file2_columns = None
+            if update_columns:
+                file2_columns = common.read_columns(file2_path)
+                wanted_columns = key_columns + [col for col in update_columns if col not in key_columns]
+                df2 = common.read_data(file2_path, usecols=[col for col in file2_columns if col in wanted_columns], **read_options)
             else:
-                raise ValueError(f"Invalid choice. Operation canceled.")
-
-        # Check for missing rows in df2 that are in df1
-        missing_rows = df1[~df1[key_column].isin(df2[key_column])]
-        if not missing_rows.empty:
-            user_choice = common.simple_input_dialog(
-                "Missing Rows in File 2",
-                f"The following rows are in '{os.path.basename(file1_path)}' but not in '{os.path.basename(file2_path)}' :\n\n"
-                f"{missing_rows[key_column].tolist()}.\n\n"
-                "Do you want to:\n"
-                "1. Keep these rows as is\n"
-                "2. Set the values in these rows to NA\n\n"
-                "Please type 'keep' or 'Set':"
-            )
+                df2 = common.read_data(file2_path, **read_options)
+
+            check_key_columns(df1, df2, key_columns)
 
-            if user_choice.lower() == 'set':
-                for col in df1.columns:
-                    if col != key_column:
-                        df1.loc[missing_rows.index, col] = "NA"
-                common.log_message("Set missing rows to 'NA' in the first file.", level='info')
-            elif user_choice.lower() == 'keep':
-                common.log_message("Kept missing rows in the first file as is.", level='info')
+            # Downcast numbers and store text as categoricals or Arrow strings, alike in both files
+            memory = {}
+            if compact_dtypes.COMPACT_DTYPES if compact is None else compact:
+                df1, memory[file1_path] = compact_dtypes.compact_frame(df1, os.path.basename(file1_path))
+                df2, memory[file2_path] = compact_dtypes.compact_frame(df2, os.path.basename(file2_path))
+                compact_dtypes.unify_dtypes(df1, df2, [col for col in df2.columns if col in df1.columns])
+
+            # Per-row hashes of the compared columns; the first file's usually come from its snapshot
+            row_hashes = None
+            hash_columns = [col for col in df2.columns if col not in key_columns and col in df1.columns]
+            if key_snapshots.INCREMENTAL if incremental is None else incremental:
+                row_hashes = (key_snapshots.file_hashes(file1_path, df1, key_columns, hash_columns),
+                              key_snapshots.file_hashes(file2_path, df2, key_columns, hash_columns))
+
+            if change_set_only:
+                change_set = diff_dataframes(df1, df2, key_columns, row_hashes)
+                summary = summarize_change_set(change_set)
             else:
-                raise ValueError(f"Invalid choice. Operation canceled.")
+                merged_df, summary = merge_dataframes(
+                    df1, df2, key_columns, decisions,
+                    file_names=(os.path.basename(file1_path), os.path.basename(file2_path)),
+                    file2_columns=file2_columns, with_change_set=bool(change_set_path), row_hashes=row_hashes
+                )
+                change_set = summary.pop("change_set", None)
+                rehash_rows = summary.pop("rehash_rows", None)
+
+                # Save the updated DataFrame to the output file
+                common.save_merged_file(merged_df, output_file_path)
+                if row_hashes is not None and all(col in merged_df.columns for col in key_columns + hash_columns):
+                    hashes = key_snapshots.output_hashes(merged_df, hash_columns, row_hashes[0], rehash_rows)
+                    key_snapshots.store_snapshot(output_file_path, merged_df, key_columns, hash_columns, hashes)
 
+            if change_set_path:
+                write_change_set(change_set, key_columns, change_set_path)
+                summary["change_set"] = change_set_path
+            if memory:
+                summary["memory"] = memory
+            stages = run["stages"][first_stage:]
+        saved_memory = "".join(f"\n{os.path.basename(path)}: {compact_dtypes.format_memory(report)}" for path, report in memory.items())
+        saved_memory = f"\n\nMemory after reading:{saved_memory}" if saved_memory else ""
+
+        if change_set_only:
+            common.log_message(f"Change set saved as '{change_set_path}'", level='info')
+            common.display_message(
+                f"Change set saved as '{change_set_path}'.\n\nChanged rows per column:\n{format_changes(summary['changes'])}"
+                f"\nRows only in the second file: {summary['rows_inserted']}\nRows only in the first file: {summary['rows_orphaned']}{saved_memory}"
+                f"\n\nTime per stage:\n{instrumentation.format_stages(stages)}",
+                status="success"
+            )
+            return summary
 
-        # Save the updated DataFrame to the output file
-        common.save_merged_file(df1, output_file_path)
         common.log_message(f"Updated file saved as '{output_file_path}'", level='info')
-        common.display_message(f"Updated file saved as '{output_file_path}'.", status="success")
+        saved_change_set = f"\nChange set saved as '{change_set_path}'." if change_set_path else ""
+        common.display_message(
+            f"Updated file saved as '{output_file_path}'.{saved_change_set}\n\nChanged rows per column:\n{format_changes(summary['changes'])}\nNew rows added: {summary['rows_added']}{saved_memory}"
+            f"\n\nTime per stage:\n{instrumentation.format_stages(stages)}",
+            status="success"
+        )
+
+        return summary
 
     except Exception as e:
         raise e
@@ -0,0 +1,293 @@
+#content_search_gui.py
+
+import pandas as pd
+import numpy as np
+import common_code_gui as common
+import directory_walk
+import file_index
+import instrumentation
+from file_search_gui import run_search_window
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tkinter import filedialog
+import fnmatch
+import os
+import sqlite3
+import threading
+import time
+
+SEARCHABLE_EXTENSIONS = ('.csv', '.xls', '.xlsx')
+
+# Inverted index of cell values, next to the filename index
+CONTENT_INDEX_PATH = os.environ.get(
+    "EXCELWIZARD_CONTENT_INDEX_PATH",
+    os.path.join(os.path.dirname(file_index.INDEX_PATH), "content_index.sqlite")
+)
+
+# Each distinct cell value is stored once; postings say where it occurs
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workbooks (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS postings (term_id INTEGER NOT NULL, workbook_id INTEGER NOT NULL, sheet TEXT, row INTEGER NOT NULL, col TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS postings_term ON postings(term_id);
+CREATE INDEX IF NOT EXISTS postings_workbook ON postings(workbook_id);
+"""
+
+# Version of the cell strings stored in the index; an older index is emptied and rebuilt as files are searched
+INDEX_FORMAT = 1
+
+# Rows are reported as spreadsheet row numbers: the header is row 1, the first data row is row 2
+FIRST_DATA_ROW = 2
+
+def cell_strings(column):
+    """Return the non-empty cells of a column as the strings they are searched by.
+
+    Whole floats lose their '.0', so searching for 1001 finds 1001 and 1001.0 alike. Floats beyond
+    the int64 range keep their float spelling (3e+20) instead of wrapping around.
+    """
+    column = column.dropna()
+    strings = column.astype(str).str.strip()
+    if pd.api.types.is_float_dtype(column):
+        values = column.to_numpy()
+        whole = np.isfinite(values) & (values == np.round(values)) & (np.abs(values) < 2.0**63)
+        strings[whole] = column[whole].astype('int64').astype(str)
+    return strings[strings != ""]
+
+def match_cells(strings, query, match='exact'):
+    """Boolean mask of the cell strings matching the query, with the file search match modes."""
+    if match == 'exact':
+        return strings == query
+    elif match == 'glob':
+        return strings.str.match(fnmatch.translate(query))
+    return strings.str.contains(query, case=False, regex=False)
+
+def iter_sheets(file_path, columns=None):
+    """Yield (sheet, DataFrame) for every sheet of a workbook, or (None, DataFrame) for a CSV file."""
+    for sheet in common.sheet_names(file_path):
+        dataframe = common.read_data(file_path, sheet_name=sheet if sheet is not None else 0)
+        if columns:
+            dataframe = dataframe[[col for col in dataframe.columns if str(col) in columns]]
+        yield sheet, dataframe
+
+def search_workbook(file_path, query, match='exact', columns=None):
+    """Find the cells of one file that match the query and return them as hits (file, sheet, row, column, value)."""
+    common.HEADLESS = True
+    result = {"file": file_path, "hits": [], "error": None}
+    try:
+        for sheet, dataframe in iter_sheets(file_path, columns):
+            for col in dataframe.columns:
+                strings = cell_strings(dataframe[col])
+                matched = strings[match_cells(strings, query, match)]
+                result["hits"].extend(
+                    {"file": file_path, "sheet": sheet, "row": int(position) + FIRST_DATA_ROW, "column": str(col), "value": value}
+                    for position, value in matched.items()
+                )
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+def extract_cells(file_path):
+    """Read every sheet of a file into (value, sheet, row, column) entries for the inverted index."""
+    common.HEADLESS = True
+    result = {"file": file_path, "cells": [], "error": None}
+    try:
+        for sheet, dataframe in iter_sheets(file_path):
+            for col in dataframe.columns:
+                strings = cell_strings(dataframe[col])
+                result["cells"].extend((value, sheet, int(position) + FIRST_DATA_ROW, str(col)) for position, value in strings.items())
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+def find_spreadsheets(roots, workers=None, exclude=(), max_depth=None):
+    """List the CSV/Excel files below the roots (roots may also be files) with the parallel directory walk."""
+    files = [os.path.abspath(root) for root in roots if os.path.isfile(root) and root.lower().endswith(SEARCHABLE_EXTENSIONS)]
+    directories = [root for root in roots if os.path.isdir(root)]
+    for listing in directory_walk.walk(directories, workers, exclude, max_depth):
+        files.extend(os.path.join(listing["path"], name) for name in listing["files"] if name.lower().endswith(SEARCHABLE_EXTENSIONS))
+    return sorted(files)
+
+def connect(index_path=None):
+    """Open (and create if needed) the inverted index of cell values."""
+    index_path = index_path or CONTENT_INDEX_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    connection = sqlite3.connect(index_path, timeout=60)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    if connection.execute("PRAGMA user_version").fetchone()[0] < INDEX_FORMAT:
+        # Cells indexed before whole floats beyond int64 kept their float spelling
+        with connection:
+            connection.executescript("DELETE FROM postings; DELETE FROM terms; DELETE FROM workbooks;")
+            connection.execute(f"PRAGMA user_version = {INDEX_FORMAT}")
+    return connection
+
+def forget_workbook(connection, workbook_id):
+    """Remove a file and its postings from the index."""
+    connection.execute("DELETE FROM postings WHERE workbook_id = ?", (workbook_id,))
+    connection.execute("DELETE FROM workbooks WHERE id = ?", (workbook_id,))
+
+def store_cells(connection, file_path, cells):
+    """Replace the indexed cells of a file and return its workbook id."""
+    stat = os.stat(file_path)
+    row = connection.execute("SELECT id FROM workbooks WHERE path = ?", (file_path,)).fetchone()
+    if row:
+        forget_workbook(connection, row[0])
+    workbook_id = connection.execute(
+        "INSERT INTO workbooks (path, size, mtime_ns) VALUES (?, ?, ?)", (file_path, stat.st_size, stat.st_mtime_ns)
+    ).lastrowid
+    connection.executemany("INSERT OR IGNORE INTO terms (value) VALUES (?)", ((value,) for value in {cell[0] for cell in cells}))
+    connection.executemany(
+        "INSERT INTO postings (term_id, workbook_id, sheet, row, col) VALUES ((SELECT id FROM terms WHERE value = ?), ?, ?, ?, ?)",
+        ((value, workbook_id, sheet, row_number, col) for value, sheet, row_number, col in cells)
+    )
+    connection.commit()
+    return workbook_id
+
+def stale_files(connection, files, roots):
+    """Split files into (up-to-date workbook ids, files to index) and drop indexed files that no longer exist below the roots."""
+    indexed = {}
+    for root in roots:
+        root = os.path.abspath(root)
+        low, high = file_index.subtree_bounds(root)
+        for workbook_id, path, size, mtime_ns in connection.execute(
+            "SELECT id, path, size, mtime_ns FROM workbooks WHERE path = ? OR (path >= ? AND path < ?)", (root, low, high)
+        ):
+            indexed[path] = (workbook_id, size, mtime_ns)
+
+    current, to_index = [], []
+    for file_path in files:
+        entry = indexed.pop(file_path, None)
+        stat = os.stat(file_path)
+        if entry and entry[1:] == (stat.st_size, stat.st_mtime_ns):
+            current.append(entry[0])
+        else:
+            to_index.append(file_path)
+
+    for workbook_id, _, _ in indexed.values():
+        forget_workbook(connection, workbook_id)  # Deleted, or no longer reached with these options
+    connection.commit()
+    return current, to_index
+
+def query_index(connection, query, match='exact', workbook_ids=(), columns=None):
+    """Return the indexed hits for the query within the given files."""
+    if match == 'exact':
+        condition, parameter = "t.value = ?", query
+    elif match == 'glob':
+        condition, parameter = "t.value GLOB ?", query
+    else:
+        # LIKE treats % and _ as wildcards, so it may return extra values; they are filtered out below
+        condition, parameter = "t.value LIKE ?", f"%{query}%"
+
+    hits = []
+    workbook_ids = list(workbook_ids)
+    for start in range(0, len(workbook_ids), 500):  # Stay below SQLite's parameter limit
+        batch = workbook_ids[start:start + 500]
+        rows = connection.execute(
+            "SELECT w.path, p.sheet, p.row, p.col, t.value FROM terms t JOIN postings p ON p.term_id = t.id "
+            f"JOIN workbooks w ON w.id = p.workbook_id WHERE {condition} AND p.workbook_id IN ({', '.join('?' * len(batch))})",
+            [parameter, *batch]
+        )
+        hits.extend(
+            {"file": path, "sheet": sheet, "row": row_number, "column": col, "value": value}
+            for path, sheet, row_number, col, value in rows
+            if (match != 'substring' or query.lower() in value.lower()) and (not columns or col in columns)
+        )
+    return sorted(hits, key=lambda hit: (hit["file"], str(hit["sheet"]), hit["row"], hit["column"]))
+
+def iter_content_search(query, roots, match='exact', columns=None, workers=None, exclude=(), max_depth=None,
+                        use_index=False, index_path=None, max_results=None, progress=None, cancel_event=None):
+    """Yield the cells of CSV/Excel files below the roots that match the query, file by file as they are searched.
+
+    Files are read in parallel worker processes with read_data. With `use_index`, cell values are kept in
+    a persistent inverted index: files unchanged since they were indexed are answered without being
+    opened, and only new or modified files are read. `progress` is called after every file with the
+    files done and in total, the hits so far and the elapsed seconds.
+    """
+    if match not in file_index.MATCH_MODES:
+        raise ValueError(f"Unknown match mode '{match}'. Expected one of: {', '.join(file_index.MATCH_MODES)}.")
+    query = str(query).strip()
+    cancel_event = cancel_event or threading.Event()
+    start = time.perf_counter()
+
+    files = find_spreadsheets(roots, None, exclude, max_depth)
+    common.log_message(f"Searching the contents of {len(files)} file(s) for '{query}' ({match})")
+    stats = {"files": 0, "total": len(files), "hits": 0, "seconds": 0.0, "cancelled": False}
+
+    def file_done(count=1):
+        stats["files"] += count
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        if progress:
+            progress(dict(stats))
+
+    with instrumentation.stage("search") as record:
+        connection = connect(index_path) if use_index else None
+        executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+        try:
+            to_read = files
+            if use_index:
+                current, to_read = stale_files(connection, files, roots)
+                for hit in query_index(connection, query, match, current, columns):
+                    stats["hits"] += 1
+                    yield hit
+                    if max_results and stats["hits"] >= max_results:
+                        return
+                file_done(len(current))
+
+            task = extract_cells if use_index else search_workbook
+            arguments = () if use_index else (query, match, columns)
+            futures = [executor.submit(task, file_path, *arguments) for file_path in to_read]
+            for future in as_completed(futures):
+                if cancel_event.is_set():
+                    break
+                result = future.result()
+                if result["error"]:
+                    common.log_message(f"Could not search '{result['file']}': {result['error']}", level='warning')
+                    if use_index:
+                        store_cells(connection, result["file"], [])  # Not retried until the file changes
+                    hits = []
+                elif use_index:
+                    workbook_id = store_cells(connection, result["file"], result["cells"])
+                    hits = query_index(connection, query, match, [workbook_id], columns)
+                else:
+                    hits = result["hits"]
+
+                for hit in hits:
+                    stats["hits"] += 1
+                    yield hit
+                    if max_results and stats["hits"] >= max_results:
+                        return
+                file_done()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            if connection:
+                connection.close()
+            stats["cancelled"] = cancel_event.is_set()
+            common.log_message(
+                f"{'Cancelled' if stats['cancelled'] else 'Completed'} content search: {stats['files']} of {stats['total']} file(s), "
+                f"{stats['hits']} hit(s) in {round(time.perf_counter() - start, 3)}s"
+            )
+            record["rows"], record["matches"] = stats["files"], stats["hits"]
+
+def describe_hit(hit):
+    """One line per hit for the results list."""
+    sheet = f" [{hit['sheet']}]" if hit["sheet"] is not None else ""
+    return f"{hit['file']}{sheet} row {hit['row']}, {hit['column']}: {hit['value']}"
+
+def content_search_ops():
+    """Ask for a folder and a value, then list the matching cells as they are found."""
+    folder = filedialog.askdirectory(title="Select the folder to search")
+    if not folder:
+        raise ValueError("No folder selected.")
+    query = common.simple_input_dialog("Input", "Enter the value to search for (use * or ? for a pattern):")
+    if not query:
+        raise ValueError("Search value cannot be empty.")
+
+    match = 'glob' if any(char in query for char in "*?[") else 'exact'
+    cancel_event = threading.Event()
+    run_search_window(
+        lambda progress: iter_content_search(query, [folder], match, use_index=True, progress=progress, cancel_event=cancel_event),
+        cancel_event,
+        describe=lambda stats: f"{stats['files']} of {stats['total']} files searched, {stats['hits']} hit(s)",
+        format_match=describe_hit,
+        subject="cells",
+    )
@@ -0,0 +1,149 @@
+#directory_walk.py
+
+import fnmatch
+import os
+import queue
+import threading
+
+# Listing directories waits on the disk, not the CPU, so use more threads than cores
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Pseudo filesystems that never hold user files
+DEFAULT_EXCLUDES = () if os.name == 'nt' else ('/proc', '/sys', '/dev')
+
+# Filesystem types from /proc/mounts that are served over the network
+NETWORK_FILESYSTEMS = ('nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'afs', 'ncpfs', '9p', 'ceph', 'glusterfs', 'davfs', 'fuse.sshfs', 'fuse.rclone', 'fuse.s3fs')
+
+def network_mounts():
+    """List the mount points (or Windows drives) of network filesystems, which are slow to walk."""
+    if os.name == 'nt':
+        import ctypes
+        import string
+        DRIVE_REMOTE = 4
+        return [f"{letter}:\\" for letter in string.ascii_uppercase if ctypes.windll.kernel32.GetDriveTypeW(f"{letter}:\\") == DRIVE_REMOTE]
+
+    mounts = []
+    try:
+        with open('/proc/mounts', encoding='utf-8') as handle:
+            for line in handle:
+                fields = line.split()
+                if len(fields) >= 3 and fields[2] in NETWORK_FILESYSTEMS:
+                    mounts.append(fields[1].replace('\\040', ' '))  # Spaces are escaped in /proc/mounts
+    except OSError:
+        pass  # No /proc/mounts (macOS, BSD): nothing is pruned as a network mount
+    return mounts
+
+def build_pruner(exclude=(), prune_defaults=True, prune_network=True):
+    """Return a function telling whether a directory (full path and name) should be skipped.
+
+    `exclude` holds glob patterns matched against both the directory name and its full path.
+    """
+    excluded_paths = set(DEFAULT_EXCLUDES if prune_defaults else ()) | set(network_mounts() if prune_network else ())
+    patterns = list(exclude or ())
+
+    def pruned(path, name):
+        return path in excluded_paths or any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(path, pattern) for pattern in patterns)
+    return pruned
+
+def path_allowed(file_path, root, exclude=(), max_depth=None):
+    """Whether a file below `root` would be reached by a walk with the given patterns and depth limit."""
+    relative = os.path.relpath(os.path.dirname(file_path), root)
+    parts = [] if relative == os.curdir else relative.split(os.sep)
+    if max_depth is not None and len(parts) > max_depth:
+        return False
+
+    pruned = build_pruner(exclude, prune_defaults=False, prune_network=False)
+    path = root
+    for name in parts:
+        path = os.path.join(path, name)
+        if pruned(path, name):
+            return False
+    return True
+
+def list_directory(path, depth, pruned, known=None):
+    """List one directory into a record of its files and the subdirectories to descend into."""
+    listing = {"path": path, "depth": depth, "subdirectories": [], "files": [], "mtime_ns": None, "unchanged": False, "error": None}
+    if known is not None:
+        try:
+            listing["mtime_ns"] = os.stat(path).st_mtime_ns  # Taken before listing, so later changes are seen next time
+        except OSError as e:
+            listing["error"] = e
+            return listing
+        subdirectories = known(path, listing["mtime_ns"])
+        if subdirectories is not None:
+            listing["unchanged"] = True
+            listing["subdirectories"] = list(subdirectories)
+            return listing
+
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_directory = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    is_directory = False
+                if not is_directory:
+                    listing["files"].append(entry.name)
+                elif not pruned(entry.path, entry.name):
+                    listing["subdirectories"].append(entry.name)
+    except OSError as e:
+        listing["error"] = e  # Unreadable directories are skipped, like os.walk does
+    return listing
+
+def walk(roots, workers=None, exclude=(), max_depth=None, prune_defaults=True, prune_network=True, known=None, stop_event=None):
+    """Walk directory trees with a pool of threads and yield one listing per directory as it is read.
+
+    All workers take directories from one shared queue and put the subdirectories they find back on
+    it, so a single deep tree keeps every worker busy. A directory is always yielded before its
+    subdirectories; otherwise the order is arbitrary. Pruned directories and directories deeper than
+    `max_depth` (the roots are depth 0) are not listed.
+
+    `known(path, mtime_ns)` may return the subdirectory names of a directory that has not changed
+    since it was last seen; such directories are yielded with `unchanged` set instead of being listed.
+    Closing the generator, or setting `stop_event`, stops the walk.
+    """
+    pruned = build_pruner(exclude, prune_defaults, prune_network)
+    closed = threading.Event()
+    work = queue.Queue()
+    listings = queue.Queue()
+    finished = object()
+
+    def worker():
+        while True:
+            item = work.get()
+            try:
+                if item is None:
+                    return
+                if closed.is_set() or (stop_event is not None and stop_event.is_set()):
+                    continue  # Drain the queue without listing anything
+                path, depth = item
+                listing = list_directory(path, depth, pruned, known)
+                listings.put(listing)
+                if max_depth is None or depth < max_depth:
+                    for name in listing["subdirectories"]:
+                        work.put((os.path.join(path, name), depth + 1))
+            finally:
+                work.task_done()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers or DEFAULT_WORKERS)]
+
+    def coordinator():
+        work.join()
+        for _ in threads:
+            work.put(None)
+        listings.put(finished)
+
+    for root in roots:
+        work.put((os.path.abspath(root), 0))
+    for thread in threads:
+        thread.start()
+    threading.Thread(target=coordinator, daemon=True).start()
+
+    try:
+        while True:
+            listing = listings.get()
+            if listing is finished:
+                return
+            yield listing
+    finally:
+        closed.set()
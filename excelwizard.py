@@ -0,0 +1,453 @@
+#excelwizard.py
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import common_code_gui as common
+from compare_update_gui import compare_and_update, key_columns_list, DECISION_CHOICES
+from chunked_compare import compare_and_update_chunked, DEFAULT_MEMORY_BUDGET
+from file_format_conv_gui import convert_file
+from integrity_check import VERIFY_LEVELS, DEFAULT_VERIFY_LEVEL
+from batch_conversion import convert_batch, OUTPUT_FORMATS
+from file_search_gui import iter_file_search, describe_progress
+from file_index import MATCH_MODES
+from content_search_gui import iter_content_search
+from sample_file_gen_gui import generate_to_file, DEFAULT_CHUNK_ROWS
+from schema_gen_gui import generate_from_schema
+from schema_probe import probe_files, DEFAULT_PROBE_ROWS
+from workbook_compare import compare_workbooks
+import workbook_cache
+import instrumentation
+
+# Exit status codes
+EXIT_OK = 0
+EXIT_JOB_FAILED = 1
+EXIT_USAGE = 2
+
+# Compare options only the in-memory engine supports; --auto-engine keeps such compares in memory
+IN_MEMORY_OPTIONS = ("change_set", "change_set_only", "incremental", "update_columns", "dtype", "engine")
+
+def run_compare(job):
+    """Run a compare/update job."""
+    decisions = job.get("decisions") or {}
+    if job.get("auto_engine") and not job.get("chunked"):
+        # Probe the first rows of both files and go out of core when they would not fit in memory
+        report = probe_files([job["file1"], job["file2"]], key_columns_list(job["key"]))
+        in_memory_options = [name for name in IN_MEMORY_OPTIONS if job.get(name)]
+        if report["engine"] == "chunked" and in_memory_options:
+            common.log_message(f"Files estimated at {report['estimated_memory'] / 2**20:.0f} MB in memory; staying in memory for "
+                               f"{', '.join(in_memory_options)}, which the chunked engine does not support.", level='warning')
+        elif report["engine"] == "chunked":
+            common.log_message(f"Files estimated at {report['estimated_memory'] / 2**20:.0f} MB in memory; using the chunked engine.", level='info')
+            job = dict(job, chunked=True)
+    if job.get("chunked"):
+        if job.get("change_set") or job.get("change_set_only") or job.get("incremental"):
+            raise ValueError("Change sets and incremental compares are not supported by the chunked engine.")
+        if job.get("update_columns") or job.get("dtype") or job.get("engine"):
+            raise ValueError("Update columns, type hints and reader engines are not supported by the chunked engine.")
+        return compare_and_update_chunked(
+            job["file1"], job["file2"], job["key"], job["output"], decisions,
+            memory_budget=job.get("memory_budget") or DEFAULT_MEMORY_BUDGET,
+            spill_dir=job.get("spill_dir"),
+        )
+    read_options = {"engine": job.get("engine"), "dtype": job.get("dtype")}
+    if not job.get("output") and not job.get("change_set_only"):
+        raise ValueError("No output file given; use --change-set-only to only save the change set.")
+    return compare_and_update(job["file1"], job["file2"], job["key"], job.get("output"), decisions, read_options, job.get("update_columns"),
+                              change_set_path=job.get("change_set"), change_set_only=job.get("change_set_only", False),
+                              incremental=job.get("incremental"), compact=job.get("compact"))
+
+def run_compare_workbook(job):
+    """Run a compare/update of every sheet two workbooks share, with a key per sheet."""
+    return compare_workbooks(
+        job["file1"], job["file2"], job["output"], job.get("decisions") or {}, key_column=job.get("key"),
+        sheet_keys=job.get("sheet_keys"), workers=job.get("workers"), read_options={"engine": job.get("engine")},
+        spill_dir=job.get("spill_dir"),
+    )
+
+def run_probe(job):
+    """Describe files from their header and first rows: columns, dtypes, likely keys, estimated size and engine."""
+    return probe_files(job["files"], key_columns_list(job["key"]) if job.get("key") else None, rows=job.get("rows") or DEFAULT_PROBE_ROWS)
+
+def run_convert(job):
+    """Run a file format conversion job."""
+    return convert_file(
+        job["input"], job["output"], streaming=job.get("streaming", False),
+        verify=job.get("verify") or DEFAULT_VERIFY_LEVEL, keep_invalid_output=job.get("keep_invalid_output", False),
+    )
+
+def run_convert_batch(job):
+    """Run a batch conversion job over a directory or glob."""
+    manifest = convert_batch(
+        job["source"], job["output_dir"], job.get("format", "csv"), workers=job.get("workers"),
+        verify=job.get("verify") or DEFAULT_VERIFY_LEVEL, force=job.get("force", False),
+        recursive=job.get("recursive", False), manifest_path=job.get("manifest"),
+    )
+    failures = manifest["totals"]["failed"] + manifest["totals"]["error"]
+    if failures:
+        raise ValueError(f"{failures} file(s) could not be converted; see '{manifest['manifest']}'.")
+    return {"manifest": manifest["manifest"], "totals": manifest["totals"], "seconds": manifest["seconds"]}
+
+def run_search(job):
+    """Run a file search job, optionally printing matches as they are found; Ctrl+C or `timeout` stops it early."""
+    cancel_event = threading.Event()
+    timer = threading.Timer(job["timeout"], cancel_event.set) if job.get("timeout") else None
+    found_files = []
+    progress = None
+    if job.get("stream"):
+        progress = lambda stats: common.log_message(describe_progress(stats))
+
+    if timer:
+        timer.start()
+    try:
+        for path in iter_file_search(
+            job["filename"], drives=job.get("paths"), match=job.get("match", "exact"),
+            use_index=job.get("use_index", True), fresh=job.get("fresh", False), workers=job.get("workers"),
+            exclude=job.get("exclude") or (), max_depth=job.get("max_depth"), max_results=job.get("max_results"),
+            progress=progress, cancel_event=cancel_event,
+        ):
+            found_files.append(path)
+            if job.get("stream"):
+                print(json.dumps({"job": job.get("name"), "match": path}), flush=True)
+    except KeyboardInterrupt:
+        cancel_event.set()  # Keep the partial results
+    finally:
+        if timer:
+            timer.cancel()
+    return {"found_files": sorted(found_files), "cancelled": cancel_event.is_set()}
+
+def run_search_content(job):
+    """Run a content search over the CSV/Excel files below some directories, optionally printing hits as they are found."""
+    cancel_event = threading.Event()
+    hits = []
+    try:
+        for hit in iter_content_search(
+            job["query"], job["paths"], match=job.get("match", "exact"), columns=job.get("columns"),
+            workers=job.get("workers"), exclude=job.get("exclude") or (), max_depth=job.get("max_depth"),
+            use_index=job.get("use_index", False), max_results=job.get("max_results"), cancel_event=cancel_event,
+        ):
+            hits.append(hit)
+            if job.get("stream"):
+                print(json.dumps({"job": job.get("name"), "hit": hit}, default=str), flush=True)
+    except KeyboardInterrupt:
+        cancel_event.set()  # Keep the partial results
+    return {"hits": hits, "cancelled": cancel_event.is_set()}
+
+def run_generate(job):
+    """Run a sample file generation job, streaming chunks from a process pool to the output file."""
+    return generate_to_file(
+        int(job["rows"]), job["columns"], job["output"], seed=job.get("seed"),
+        chunk_rows=job.get("chunk_rows") or DEFAULT_CHUNK_ROWS, workers=job.get("workers"),
+    )
+
+def run_generate_schema(job):
+    """Run a schema-driven generation job: related tables and versions of them for compare fixtures."""
+    return generate_from_schema(job["schema"], job.get("output_dir"), seed=job.get("seed"))
+
+OPERATIONS = {
+    "compare": run_compare,
+    "compare_workbook": run_compare_workbook,
+    "probe": run_probe,
+    "convert": run_convert,
+    "convert_batch": run_convert_batch,
+    "search": run_search,
+    "search_content": run_search_content,
+    "generate": run_generate,
+    "generate_schema": run_generate_schema,
+}
+
+def run_job(job):
+    """Run one job without any dialogs and return a JSON-serialisable record of its outcome and timing."""
+    common.HEADLESS = True
+    record = {"job": job.get("name"), "operation": job.get("operation"), "status": "ok"}
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    stages = []
+    try:
+        if job.get("operation") not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{job.get('operation')}'. Expected one of: {', '.join(OPERATIONS)}.")
+        with instrumentation.run(job["operation"], job.get("profile")) as run:
+            stages = run["stages"]
+            record["result"] = OPERATIONS[job["operation"]](job)
+        if run.get("profile"):
+            record["profile"] = run["profile"]
+    except Exception as e:
+        common.log_message(str(e), level='error')
+        record["status"] = "error"
+        record["error"] = str(e)
+    record["wall_seconds"] = round(time.perf_counter() - wall_start, 6)
+    record["cpu_seconds"] = round(time.process_time() - cpu_start, 6)
+    record["stages"] = instrumentation.summarize_stages(stages)
+    return record
+
+def load_jobs(job_file):
+    """Load a list of jobs from a JSON or YAML job file (either a list or a mapping with a 'jobs' list)."""
+    with open(job_file, encoding="utf-8") as handle:
+        if job_file.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("PyYAML is required to read YAML job files (pip install pyyaml).")
+            jobs = yaml.safe_load(handle)
+        else:
+            jobs = json.load(handle)
+
+    if isinstance(jobs, dict):
+        jobs = jobs.get("jobs", [])
+    if not isinstance(jobs, list) or not all(isinstance(job, dict) for job in jobs):
+        raise ValueError("Job file must contain a list of jobs.")
+
+    for index, job in enumerate(jobs):
+        job.setdefault("name", f"job{index + 1}")
+    return jobs
+
+def run_jobs(jobs, workers=None):
+    """Run jobs across a process pool, yielding their records in job order."""
+    if workers == 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield run_job(job)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for record in executor.map(run_job, jobs):
+            yield record
+
+def parse_column(value):
+    """Parse a 'name:type' column definition for sample file generation."""
+    name, _, column_type = value.partition(":")
+    if not name or not column_type:
+        raise argparse.ArgumentTypeError(f"Column '{value}' must be given as name:type.")
+    return name, column_type
+
+def parse_dtype(value):
+    """Parse a 'column=dtype' type hint for reading files."""
+    column, _, dtype = value.partition("=")
+    if not column or not dtype:
+        raise argparse.ArgumentTypeError(f"Type hint '{value}' must be given as column=dtype.")
+    return column, dtype
+
+def parse_engine(value):
+    """Check a reader engine choice: one engine name, or one per file type as type=engine."""
+    try:
+        common.parse_engine_choice(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+def parse_sheet_key(value):
+    """Parse a 'sheet=column' key of one sheet for workbook compares."""
+    sheet, _, column = value.partition("=")
+    if not sheet or not column:
+        raise argparse.ArgumentTypeError(f"Sheet key '{value}' must be given as sheet=column.")
+    return sheet, column
+
+def build_parser():
+    """Build the command line parser."""
+    parser = argparse.ArgumentParser(prog="excelwizard", description="Run Excel/CSV operations without the GUI.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log progress to stderr.")
+    parser.add_argument("--log-file", help="Also write the log to this file.")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the cache of parsed workbooks.")
+    parser.add_argument("--engine", type=parse_engine, help="Reader backend for CSV/Excel files: default, fast, c, pyarrow, openpyxl or calamine, "
+                        "or one per file type as e.g. csv=pyarrow,xlsx=calamine. A backend that does not read a file type leaves it on its default.")
+    parser.add_argument("--dtype-backend", choices=common.DTYPE_BACKENDS, help="Column storage of the frames read: numpy (default) or pyarrow (Arrow-backed, memory-mapped Parquet/Feather and cache entries).")
+    parser.add_argument("--profile-log", help="Append a JSON line per stage (read, compare, update, write, hash, search) to this file.")
+    parser.add_argument("--profile", choices=instrumentation.PROFILERS, help="Profile every job and dump the result to --profile-dir.")
+    parser.add_argument("--profile-dir", help=f"Directory for profiler dumps (default: {instrumentation.PROFILE_DIR}).")
+    subparsers = parser.add_subparsers(dest="operation", required=True)
+
+    compare_parser = subparsers.add_parser("compare", help="Update FILE1 with changes from FILE2.")
+    compare_parser.add_argument("file1")
+    compare_parser.add_argument("file2")
+    compare_parser.add_argument("-k", "--key", action="append", required=True, help="Key column; repeat for a composite key.")
+    compare_parser.add_argument("-o", "--output", help="Merged output file (not needed with --change-set-only).")
+    for name, choices in DECISION_CHOICES.items():
+        compare_parser.add_argument(f"--{name.replace('_', '-')}", dest=name, choices=choices, help=f"Answer for {name.replace('_', ' ')}.")
+    compare_parser.add_argument("-u", "--update-column", action="append", dest="update_columns", help="Only parse and update this column of FILE2; repeat for several.")
+    compare_parser.add_argument("--dtype", action="append", type=parse_dtype, help="Column type hint as column=dtype; repeat for several.")
+    compare_parser.add_argument("--change-set", help="Also save the changed cells (old and new value) and inserted/orphaned keys to this .csv, .parquet or highlighted .xlsx file.")
+    compare_parser.add_argument("--change-set-only", action="store_true", help="Only save --change-set; skip the decisions and the merged file.")
+    compare_parser.add_argument("--incremental", action="store_true", default=None, help="Compare row hashes first, reusing the snapshots of files hashed before, so only changed rows are compared.")
+    compare_parser.add_argument("--compact", action="store_true", default=None, help="Store both files in compact dtypes (downcast numbers, categoricals, Arrow strings) and report the memory saved.")
+    compare_parser.add_argument("--chunked", action="store_true", help="Use the out-of-core engine for files larger than memory.")
+    compare_parser.add_argument("--auto-engine", action="store_true", help="Probe both files and use the out-of-core engine when they are estimated not to fit in memory.")
+    compare_parser.add_argument("--memory-budget", type=int, help="Memory budget in MB for --chunked.")
+    compare_parser.add_argument("--spill-dir", help="Directory for temporary spill files.")
+
+    workbook_parser = subparsers.add_parser("compare-workbook", help="Update every sheet of workbook FILE1 with the sheet of the same name in FILE2.")
+    workbook_parser.add_argument("file1")
+    workbook_parser.add_argument("file2")
+    workbook_parser.add_argument("-o", "--output", required=True, help="Merged output workbook (.xlsx).")
+    workbook_parser.add_argument("-k", "--key", action="append", help="Key column of the sheets without --sheet-key; repeat for a composite key. Without it, those sheets are kept unchanged.")
+    workbook_parser.add_argument("-s", "--sheet-key", action="append", type=parse_sheet_key, dest="sheet_keys", help="Key column of one sheet as sheet=column; repeat for several sheets or a composite key.")
+    for name, choices in DECISION_CHOICES.items():
+        workbook_parser.add_argument(f"--{name.replace('_', '-')}", dest=name, choices=choices, help=f"Answer for {name.replace('_', ' ')}, for every sheet.")
+    workbook_parser.add_argument("-w", "--workers", type=int, help="Number of worker processes comparing sheets (default: CPU count).")
+    workbook_parser.add_argument("--spill-dir", help="Directory for the temporary merged sheets.")
+
+    probe_parser = subparsers.add_parser("probe", help="Show the columns, dtypes, likely keys and size of files from their first rows.")
+    probe_parser.add_argument("files", nargs="+")
+    probe_parser.add_argument("-k", "--key", action="append", help="Check this key column; repeat for a composite key.")
+    probe_parser.add_argument("-n", "--rows", type=int, help=f"Rows to sample from the top of each file (default: {DEFAULT_PROBE_ROWS}).")
+
+    convert_parser = subparsers.add_parser("convert", help="Convert between CSV, Excel, Parquet and Feather.")
+    convert_parser.add_argument("input")
+    convert_parser.add_argument("output")
+    convert_parser.add_argument("--streaming", action="store_true", help="Convert batch by batch with constant memory.")
+    convert_parser.add_argument("--verify", choices=VERIFY_LEVELS, default=DEFAULT_VERIFY_LEVEL, help="How thoroughly to check the converted file.")
+    convert_parser.add_argument("--keep-invalid-output", action="store_true", help="Keep the output when the check fails, for inspection.")
+
+    batch_parser = subparsers.add_parser("convert-batch", help="Convert every sheet of every file in a directory or glob.")
+    batch_parser.add_argument("source", help="Directory or glob pattern (quote it) of CSV/Excel files.")
+    batch_parser.add_argument("output_dir")
+    batch_parser.add_argument("--to", choices=OUTPUT_FORMATS, default="csv", dest="format", help="csv: one file per sheet; xlsx: one workbook per input file.")
+    batch_parser.add_argument("-w", "--workers", type=int, help="Number of worker processes (default: CPU count).")
+    batch_parser.add_argument("--verify", choices=VERIFY_LEVELS, default=DEFAULT_VERIFY_LEVEL, help="How thoroughly to check each converted sheet.")
+    batch_parser.add_argument("-r", "--recursive", action="store_true", help="Include subdirectories of a source directory.")
+    batch_parser.add_argument("--force", action="store_true", help="Convert files even when their outputs are up to date.")
+    batch_parser.add_argument("--manifest", help="Manifest path (default: OUTPUT_DIR/manifest.json).")
+
+    search_parser = subparsers.add_parser("search", help="Search for a file by name.")
+    search_parser.add_argument("filename")
+    search_parser.add_argument("-p", "--path", action="append", dest="paths", help="Directory to search; repeat for several (default: all drives).")
+    search_parser.add_argument("--match", choices=MATCH_MODES, default="exact", help="exact name, glob pattern or case-insensitive substring.")
+    search_parser.add_argument("--fresh", action="store_true", help="Rescan the directories completely before searching.")
+    search_parser.add_argument("--no-index", action="store_true", help="Walk the directories instead of using the filename index.")
+    search_parser.add_argument("-w", "--workers", type=int, help="Number of threads listing directories.")
+    search_parser.add_argument("-x", "--exclude", action="append", help="Skip directories matching this glob (name or full path); repeat for several.")
+    search_parser.add_argument("--max-depth", type=int, help="Do not descend more than this many levels below each path.")
+    search_parser.add_argument("-n", "--max-results", type=int, help="Stop after this many matches.")
+    search_parser.add_argument("--stream", action="store_true", help="Print each match as a JSON line as soon as it is found, and log progress.")
+    search_parser.add_argument("--timeout", type=float, help="Stop searching after this many seconds and report the matches found so far.")
+
+    content_parser = subparsers.add_parser("search-content", help="Find the cells of CSV/Excel files that hold a value.")
+    content_parser.add_argument("query")
+    content_parser.add_argument("paths", nargs="+", help="Directories (or files) to search.")
+    content_parser.add_argument("--match", choices=MATCH_MODES, default="exact", help="exact value, glob pattern or case-insensitive substring.")
+    content_parser.add_argument("-c", "--column", action="append", dest="columns", help="Only search this column; repeat for several.")
+    content_parser.add_argument("-w", "--workers", type=int, help="Number of worker processes reading files (default: CPU count).")
+    content_parser.add_argument("-x", "--exclude", action="append", help="Skip directories matching this glob; repeat for several.")
+    content_parser.add_argument("--max-depth", type=int, help="Do not descend more than this many levels below each path.")
+    content_parser.add_argument("-n", "--max-results", type=int, help="Stop after this many hits.")
+    content_parser.add_argument("--index", action="store_true", dest="use_index", help="Keep cell values in a persistent index so repeat searches skip unchanged files.")
+    content_parser.add_argument("--stream", action="store_true", help="Print each hit as a JSON line as soon as it is found.")
+
+    generate_parser = subparsers.add_parser("generate", help="Generate a sample data file.")
+    generate_parser.add_argument("-r", "--rows", type=int, required=True)
+    generate_parser.add_argument("-c", "--column", action="append", type=parse_column, required=True, dest="columns", help="Column as name:type; repeat for each column.")
+    generate_parser.add_argument("-o", "--output", required=True)
+    generate_parser.add_argument("--seed", type=int, help="Seed for reproducible data (default: random, logged).")
+    generate_parser.add_argument("-w", "--workers", type=int, help="Number of worker processes generating chunks (default: CPU count).")
+    generate_parser.add_argument("--chunk-rows", type=int, help=f"Rows per chunk (default: {DEFAULT_CHUNK_ROWS}); the same seed and chunk size give the same file.")
+
+    schema_parser = subparsers.add_parser("generate-schema", help="Generate the related tables and table versions described in a schema file.")
+    schema_parser.add_argument("schema", help="JSON or YAML schema file.")
+    schema_parser.add_argument("-o", "--output-dir", help="Directory for the generated files (default: the schema's directory).")
+    schema_parser.add_argument("--seed", type=int, help="Seed for reproducible data (default: the schema's seed, else random and logged).")
+
+    run_parser = subparsers.add_parser("run", help="Run the jobs in a JSON or YAML job file.")
+    run_parser.add_argument("job_file")
+    run_parser.add_argument("-w", "--workers", type=int, help="Number of worker processes (default: CPU count).")
+
+    return parser
+
+def job_from_args(args):
+    """Turn the arguments of a single-operation command into a job."""
+    if args.operation == "compare":
+        return {
+            "operation": "compare", "file1": args.file1, "file2": args.file2, "key": args.key, "output": args.output,
+            "decisions": {name: getattr(args, name) for name in DECISION_CHOICES if getattr(args, name)},
+            "update_columns": args.update_columns, "dtype": dict(args.dtype) if args.dtype else None,
+            "change_set": args.change_set, "change_set_only": args.change_set_only, "incremental": args.incremental,
+            "compact": args.compact,
+            "chunked": args.chunked, "auto_engine": args.auto_engine, "spill_dir": args.spill_dir,
+            "memory_budget": args.memory_budget * 1024 * 1024 if args.memory_budget else None,
+        }
+    if args.operation == "compare-workbook":
+        sheet_keys = {}
+        for sheet, column in args.sheet_keys or []:
+            sheet_keys.setdefault(sheet, []).append(column)
+        return {
+            "operation": "compare_workbook", "file1": args.file1, "file2": args.file2, "output": args.output, "key": args.key,
+            "sheet_keys": sheet_keys, "decisions": {name: getattr(args, name) for name in DECISION_CHOICES if getattr(args, name)},
+            "workers": args.workers, "spill_dir": args.spill_dir,
+        }
+    if args.operation == "probe":
+        return {"operation": "probe", "files": args.files, "key": args.key, "rows": args.rows}
+    if args.operation == "convert":
+        return {
+            "operation": "convert", "input": args.input, "output": args.output, "streaming": args.streaming,
+            "verify": args.verify, "keep_invalid_output": args.keep_invalid_output,
+        }
+    if args.operation == "convert-batch":
+        return {
+            "operation": "convert_batch", "source": args.source, "output_dir": args.output_dir, "format": args.format,
+            "workers": args.workers, "verify": args.verify, "recursive": args.recursive, "force": args.force, "manifest": args.manifest,
+        }
+    if args.operation == "search":
+        return {
+            "operation": "search", "filename": args.filename, "paths": args.paths, "match": args.match,
+            "use_index": not args.no_index, "fresh": args.fresh, "workers": args.workers,
+            "exclude": args.exclude, "max_depth": args.max_depth, "max_results": args.max_results,
+            "stream": args.stream, "timeout": args.timeout,
+        }
+    if args.operation == "search-content":
+        return {
+            "operation": "search_content", "query": args.query, "paths": args.paths, "match": args.match, "columns": args.columns,
+            "workers": args.workers, "exclude": args.exclude, "max_depth": args.max_depth, "max_results": args.max_results,
+            "use_index": args.use_index, "stream": args.stream,
+        }
+    if args.operation == "generate-schema":
+        return {"operation": "generate_schema", "schema": args.schema, "output_dir": args.output_dir, "seed": args.seed}
+    return {"operation": "generate", "rows": args.rows, "columns": dict(args.columns), "output": args.output, "seed": args.seed,
+            "workers": args.workers, "chunk_rows": args.chunk_rows}
+
+def configure_logging(verbose=False, log_file=None):
+    """Send log records to stderr (warnings only unless verbose) and optionally to a file."""
+    handlers = [logging.StreamHandler(sys.stderr)]
+    handlers[0].setLevel(logging.INFO if verbose else logging.WARNING)
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', handlers=handlers)
+
+def main(argv=None):
+    """Command line entry point; prints one JSON record per job and returns the exit status."""
+    args = build_parser().parse_args(argv)
+    configure_logging(args.verbose, args.log_file)
+    common.HEADLESS = True
+    if args.no_cache:
+        os.environ["EXCELWIZARD_CACHE"] = "0"  # Inherited by the worker processes
+        workbook_cache.CACHE_ENABLED = False
+    if args.engine:
+        os.environ["EXCELWIZARD_READ_ENGINE"] = args.engine
+        common.READ_ENGINE = args.engine
+    if args.dtype_backend:
+        os.environ["EXCELWIZARD_DTYPE_BACKEND"] = args.dtype_backend
+        common.DTYPE_BACKEND = args.dtype_backend
+    for name, variable, value in (("PROFILE_LOG", "EXCELWIZARD_PROFILE_LOG", args.profile_log), ("PROFILER", "EXCELWIZARD_PROFILE", args.profile),
+                                  ("PROFILE_DIR", "EXCELWIZARD_PROFILE_DIR", args.profile_dir)):
+        if value:
+            os.environ[variable] = value  # Inherited by the worker processes
+            setattr(instrumentation, name, value)
+
+    try:
+        if args.operation == "run":
+            jobs = load_jobs(args.job_file)
+        else:
+            jobs = [dict(job_from_args(args), name=args.operation)]
+    except (OSError, ValueError) as e:
+        print(json.dumps({"status": "error", "error": str(e)}))
+        return EXIT_USAGE
+
+    status = EXIT_OK
+    for record in run_jobs(jobs, getattr(args, "workers", None)):
+        print(json.dumps(record, default=str), flush=True)
+        if record["status"] != "ok":
+            status = EXIT_JOB_FAILED
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,48 +2,94 @@
 
 import pandas as pd
 import common_code_gui as common
+import streaming_io
+import arrow_io
+import integrity_check as integrity
+import instrumentation
 import hashlib
 import os
 
+@instrumentation.instrumented("hash", measure=lambda digest, dataframe: (len(dataframe), instrumentation.frame_size(dataframe)))
 def hash_dataframe(dataframe):
     """Create a hash for the DataFrame to check for data integrity."""
     # Convert the DataFrame to a string, then encode and hash it
     return hashlib.md5(pd.util.hash_pandas_object(dataframe).values).hexdigest()
 
-def file_format_conversion_ops():
-    try:
-        # Open a file dialog to select an Excel or CSV file
-        input_file, error_message = common.open_file_dialog("Select Excel or CSV File to Convert")
-        if not input_file:
-            raise ValueError(error_message)
-    
-        # Read the input file using the common read_data function
-        original_dataframe = common.read_data(input_file)
+def verify_conversion(original_dataframe, output_file, verify, chunk_rows=integrity.DEFAULT_CHUNK_ROWS, sheet_name=None):
+    """Check a written file (or one sheet of it) against the in-memory DataFrame it was written from."""
+    if verify == 'full':
+        # Read back the whole converted file and compare hashes of both DataFrames
+        converted_dataframe = common.read_data(output_file, sheet_name=sheet_name or 0)
+        report = {"level": verify, "passed": hash_dataframe(original_dataframe) == hash_dataframe(converted_dataframe), "problems": [], "mismatched_chunks": []}
+        if not report["passed"]:
+            report["mismatched_chunks"] = integrity.compare_dataframes(original_dataframe, converted_dataframe, chunk_rows)
+        return report
 
-        # Hash the original DataFrame
-        original_hash = hash_dataframe(original_dataframe)
+    record = integrity.record_dataframe(original_dataframe, verify, chunk_rows)
+    return integrity.verify_output(output_file, record, chunk_rows, sheet_name)
 
-        # Prepare the output file path using a save file dialog
-        output_file, error_message = common.save_file_dialog("Save Converted File As")
-        if not output_file:
-            raise ValueError(error_message)
+def convert_file(input_file, output_file, streaming=False, verify=integrity.DEFAULT_VERIFY_LEVEL, keep_invalid_output=False, chunk_rows=integrity.DEFAULT_CHUNK_ROWS):
+    """Convert a CSV or Excel file to the format given by the output extension and verify its integrity.
+
+    `verify` is one of integrity_check.VERIFY_LEVELS. With `streaming` the file is converted batch by
+    batch with flat memory. With the pyarrow dtype backend, conversions between CSV, Parquet and
+    Feather go through a single Arrow table and never build a DataFrame. A failed check names the
+    differing row ranges and removes the output unless `keep_invalid_output` is set.
+    """
+    if verify not in integrity.VERIFY_LEVELS:
+        raise ValueError(f"Unknown verification level '{verify}'. Expected one of: {', '.join(integrity.VERIFY_LEVELS)}.")
+
+    if not streaming and arrow_io.native_conversion(input_file, output_file):
+        rows, report = arrow_io.convert_table(input_file, output_file, verify)
+    elif streaming:
+        # Record chunk hashes while writing, then compare them while reading back
+        record = integrity.new_write_record(verify)
+        rows = streaming_io.write_batches(integrity.record_batches(streaming_io.iter_batches(input_file, chunk_rows), record), output_file)
+        report = integrity.verify_output(output_file, record, chunk_rows)
+    else:
+        # Read the input file using the common read_data function
+        original_dataframe = common.read_data(input_file)
+        rows = len(original_dataframe)
 
         # Save the DataFrame to the selected format
         common.save_merged_file(original_dataframe, output_file)
 
-        # Read back the converted file for post-validation
-        converted_dataframe = common.read_data(output_file)
+        report = verify_conversion(original_dataframe, output_file, verify, chunk_rows)
 
-        # Hash the converted DataFrame
-        converted_hash = hash_dataframe(converted_dataframe)
-
-        # Compare hashes to check for data integrity
-        if original_hash != converted_hash:
+    if not report["passed"]:
+        common.log_message(f"Integrity report for '{output_file}': {report}", level='error')
+        if not keep_invalid_output:
             os.remove(output_file)
-            raise ValueError("Data integrity check failed: The data has changed during conversion.")
+        raise ValueError(integrity.describe_report(report))
+
+    common.log_message(f"Updated file saved as '{os.path.splitext(output_file)[1][1:]}' (verification: {verify})", level='info')
+    return {"rows": rows, "verification": report}
+
+def ask_conversion_files():
+    """Ask for the file to convert and where to save it."""
+    # Open a file dialog to select an Excel or CSV file
+    input_file, error_message = common.open_file_dialog("Select Excel or CSV File to Convert")
+    if not input_file:
+        raise ValueError(error_message)
+
+    # Prepare the output file path using a save file dialog
+    output_file, error_message = common.save_file_dialog("Save Converted File As")
+    if not output_file:
+        raise ValueError(error_message)
+    return input_file, output_file
 
-        common.log_message(f"Updated file saved as '{os.path.splitext(output_file)[1][1:]}'", level='info')
-        common.display_message(f"File successfully converted to {os.path.splitext(output_file)[1][1:]}.", status="success")
+def convert_and_report(input_file, output_file):
+    """Convert a file and show the result with the time spent per stage."""
+    with instrumentation.run("convert") as run:
+        convert_file(input_file, output_file)
+    common.display_message(
+        f"File successfully converted to {os.path.splitext(output_file)[1][1:]}.\n\nTime per stage:\n{instrumentation.format_stages(run['stages'])}",
+        status="success"
+    )
+
+def file_format_conversion_ops():
+    try:
+        convert_and_report(*ask_conversion_files())
 
     except Exception as e:
         raise e
@@ -0,0 +1,290 @@
+#file_index.py
+
+import common_code_gui as common
+import directory_walk
+import fnmatch
+import os
+import sqlite3
+import time
+
+# Index location and how old an indexed tree may get before a search refreshes it (seconds)
+INDEX_PATH = os.environ.get(
+    "EXCELWIZARD_INDEX_PATH",
+    os.path.join(os.environ.get("EXCELWIZARD_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "excelwizard")), "file_index.sqlite")
+)
+INDEX_MAX_AGE = float(os.environ.get("EXCELWIZARD_INDEX_MAX_AGE", "3600"))
+
+MATCH_MODES = ('exact', 'glob', 'substring')
+
+# Directories written per transaction while scanning
+COMMIT_EVERY = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY, scanned_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS directories (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, parent_id INTEGER, mtime_ns INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS directories_parent ON directories(parent_id);
+CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, dir_id INTEGER NOT NULL, name TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS files_name ON files(name);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir_id);
+"""
+
+# Trigram full-text index over the file names, so substring searches do not scan every name
+TRIGRAM_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS file_names USING fts5(name, content='files', content_rowid='id', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS files_insert AFTER INSERT ON files BEGIN
+    INSERT INTO file_names(rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS files_delete AFTER DELETE ON files BEGIN
+    INSERT INTO file_names(file_names, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+"""
+
+def connect(index_path=None):
+    """Open (and create if needed) the filename index."""
+    index_path = index_path or INDEX_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    connection = sqlite3.connect(index_path, timeout=60)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    try:
+        connection.executescript(TRIGRAM_SCHEMA)
+    except sqlite3.OperationalError:
+        pass  # SQLite without FTS5 trigrams; substring searches scan the names instead
+    return connection
+
+def has_trigrams(connection):
+    """Whether the trigram name index exists in this database."""
+    return connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'file_names'").fetchone() is not None
+
+def subtree_bounds(path):
+    """Return the (low, high) path range covering everything below a directory.
+
+    Paths below `path` start with `path + sep`, and sort before `path` followed by the next character.
+    """
+    prefix = path.rstrip(os.sep)
+    return prefix + os.sep, prefix + chr(ord(os.sep) + 1)
+
+def is_below(path, root):
+    """Whether `path` is `root` or lies inside it."""
+    low, high = subtree_bounds(root)
+    return path == root or low <= path < high
+
+def forget(connection, path):
+    """Remove a directory and everything below it from the index."""
+    low, high = subtree_bounds(path)
+    directory_ids = "SELECT id FROM directories WHERE path = ? OR (path >= ? AND path < ?)"
+    connection.execute(f"DELETE FROM files WHERE dir_id IN ({directory_ids})", (path, low, high))
+    connection.execute("DELETE FROM directories WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high))
+
+def scan_listings(connection, root, fresh=False, workers=None, stop_event=None):
+    """Bring the index of a directory tree up to date, yielding every directory listing once it is stored.
+
+    A directory's mtime changes whenever entries are added, removed or renamed in it, so only
+    directories whose mtime differs from the indexed one are listed again. Unchanged directories
+    cost one stat call; their subdirectories are taken from the index. `fresh` drops the indexed
+    tree first and walks it completely. Directories are read in parallel and written here.
+
+    A scan stopped through `stop_event` keeps what it stored but leaves the tree marked as out of date.
+    """
+    root = os.path.abspath(root)
+    listed = 0
+    parent = connection.execute("SELECT parent_id FROM directories WHERE path = ?", (root,)).fetchone()
+    if fresh:
+        forget(connection, root)
+
+    indexed = {
+        path: (directory_id, mtime_ns) for path, directory_id, mtime_ns in connection.execute(
+            "SELECT path, id, mtime_ns FROM directories WHERE path = ? OR (path >= ? AND path < ?)", (root, *subtree_bounds(root))
+        )
+    }
+    children = {}
+    for path in indexed:
+        if path != root:
+            children.setdefault(os.path.dirname(path), []).append(os.path.basename(path))
+    directory_ids = {path: directory_id for path, (directory_id, _) in indexed.items()}
+
+    def known(path, mtime_ns):
+        if path in indexed and indexed[path][1] == mtime_ns:
+            return children.get(path, [])
+        return None
+
+    walk = directory_walk.walk([root], workers, known=known, stop_event=stop_event)
+    try:
+        for listing in walk:
+            store_listing(connection, listing, children, directory_ids, parent[0] if parent else None)
+            yield listing
+            if not listing["unchanged"] and listing["error"] is None:
+                listed += 1
+                if listed % COMMIT_EVERY == 0:
+                    connection.commit()
+    finally:
+        walk.close()
+        connection.commit()
+
+    if stop_event is None or not stop_event.is_set():
+        connection.execute("INSERT OR REPLACE INTO roots (path, scanned_at) VALUES (?, ?)", (root, time.time()))
+        connection.commit()
+
+def store_listing(connection, listing, children, directory_ids, root_parent_id):
+    """Write one directory listing of a scan to the index."""
+    path = listing["path"]
+    if listing["unchanged"]:
+        return
+    if listing["mtime_ns"] is None:
+        forget(connection, path)  # The directory is gone
+        return
+    if listing["error"] is not None:
+        return
+
+    if path in directory_ids:
+        directory_id = directory_ids[path]
+        connection.execute("UPDATE directories SET mtime_ns = ? WHERE id = ?", (listing["mtime_ns"], directory_id))
+        connection.execute("DELETE FROM files WHERE dir_id = ?", (directory_id,))
+        for name in set(children.get(path, [])) - set(listing["subdirectories"]):
+            forget(connection, os.path.join(path, name))
+    else:
+        directory_id = connection.execute(
+            "INSERT INTO directories (path, parent_id, mtime_ns) VALUES (?, ?, ?)", (path, root_parent_id, listing["mtime_ns"])
+        ).lastrowid
+        directory_ids[path] = directory_id
+
+    connection.executemany("INSERT INTO files (dir_id, name) VALUES (?, ?)", ((directory_id, name) for name in listing["files"]))
+
+    # New subdirectories are recorded right away with an unknown mtime, so a scan that is stopped
+    # early leaves them to be listed next time instead of hiding them below an up-to-date parent
+    for name in listing["subdirectories"]:
+        subdirectory = os.path.join(path, name)
+        if subdirectory not in directory_ids:
+            directory_ids[subdirectory] = connection.execute(
+                "INSERT INTO directories (path, parent_id, mtime_ns) VALUES (?, ?, -1)", (subdirectory, directory_id)
+            ).lastrowid
+
+def scan(connection, root, fresh=False, workers=None):
+    """Bring the index of a directory tree up to date and return scan statistics."""
+    stats = {"directories": 0, "listed": 0, "files": 0}
+    for listing in scan_listings(connection, root, fresh, workers):
+        stats["directories"] += 1
+        if not listing["unchanged"] and listing["error"] is None:
+            stats["listed"] += 1
+            stats["files"] += len(listing["files"])
+    return stats
+
+def index_age(connection, root):
+    """Seconds since the tree holding `root` was last scanned, or None when it has never been indexed."""
+    scanned = [scanned_at for path, scanned_at in connection.execute("SELECT path, scanned_at FROM roots") if is_below(root, path)]
+    return time.time() - max(scanned) if scanned else None
+
+def update_index(roots, fresh=False, max_age=INDEX_MAX_AGE, index_path=None, workers=None):
+    """Scan the roots that were never indexed or are older than `max_age` seconds (all of them when `fresh`)."""
+    connection = connect(index_path)
+    try:
+        for root in roots:
+            root = os.path.abspath(root)
+            if needs_scan(connection, root, fresh, max_age):
+                start = time.perf_counter()
+                stats = scan(connection, root, fresh, workers)
+                common.log_message(
+                    f"Indexed '{root}': {stats['directories']} directories checked, {stats['listed']} listed, "
+                    f"{stats['files']} file names stored in {time.perf_counter() - start:.2f}s"
+                )
+    finally:
+        connection.close()
+
+def name_matches(name, pattern, match='exact'):
+    """Match a file name the way indexed queries do: exact and glob are case-sensitive, substring is not."""
+    if match == 'exact':
+        return name == pattern
+    elif match == 'glob':
+        return fnmatch.fnmatchcase(name, pattern)
+    return pattern.lower() in name.lower()
+
+def query(connection, pattern, match='exact', roots=None):
+    """Return the indexed paths whose file name matches `pattern`, optionally limited to some directory trees."""
+    if match == 'exact':
+        sql = "SELECT d.path, f.name FROM files f JOIN directories d ON d.id = f.dir_id WHERE f.name = ?"
+        parameters = [pattern]
+    elif match == 'glob':
+        sql = "SELECT d.path, f.name FROM files f JOIN directories d ON d.id = f.dir_id WHERE f.name GLOB ?"
+        parameters = [pattern]
+    elif match == 'substring':
+        # LIKE treats % and _ as wildcards, so it may return extra names; they are filtered out below
+        if has_trigrams(connection) and len(pattern) >= 3:
+            sql = ("SELECT d.path, f.name FROM file_names n JOIN files f ON f.id = n.rowid "
+                   "JOIN directories d ON d.id = f.dir_id WHERE n.name LIKE ?")
+        else:
+            sql = "SELECT d.path, f.name FROM files f JOIN directories d ON d.id = f.dir_id WHERE f.name LIKE ?"
+        parameters = [f"%{pattern}%"]
+    else:
+        raise ValueError(f"Unknown match mode '{match}'. Expected one of: {', '.join(MATCH_MODES)}.")
+
+    if roots:
+        conditions = []
+        for root in roots:
+            root = os.path.abspath(root)
+            conditions.append("(d.path = ? OR (d.path >= ? AND d.path < ?))")
+            parameters.extend((root, *subtree_bounds(root)))
+        sql += " AND (" + " OR ".join(conditions) + ")"
+
+    return sorted(
+        os.path.join(path, name) for path, name in connection.execute(sql, parameters)
+        if name_matches(name, pattern, match)
+    )
+
+def needs_scan(connection, root, fresh=False, max_age=INDEX_MAX_AGE):
+    """Whether a tree must be scanned before the index can answer queries about it."""
+    age = index_age(connection, root)
+    return fresh or age is None or age > max_age
+
+def iter_search(pattern, roots, match='exact', fresh=False, max_age=INDEX_MAX_AGE, index_path=None, workers=None,
+                exclude=(), max_depth=None, on_listing=None, stop_event=None):
+    """Yield the paths of matching files as they are found, scanning out-of-date roots first.
+
+    Matches in directories listed while the index is brought up to date are yielded straight away;
+    the remaining ones come from the index afterwards. Trees indexed within `max_age` seconds are
+    answered from the index alone and `fresh` forces a complete walk. Exclude patterns and the depth
+    limit are applied to the indexed paths, so one index serves every search. `on_listing` is
+    called with every directory listing read during the scan.
+    """
+    if match not in MATCH_MODES:
+        raise ValueError(f"Unknown match mode '{match}'. Expected one of: {', '.join(MATCH_MODES)}.")
+    roots = [os.path.abspath(root) for root in roots]
+
+    def allowed(path):
+        if not exclude and max_depth is None:
+            return True
+        return any(is_below(path, root) and directory_walk.path_allowed(path, root, exclude, max_depth) for root in roots)
+
+    found = set()
+    connection = connect(index_path)
+    try:
+        for root in roots:
+            if not needs_scan(connection, root, fresh, max_age):
+                continue
+            start = time.perf_counter()
+            for listing in scan_listings(connection, root, fresh, workers, stop_event):
+                if on_listing:
+                    on_listing(listing)
+                for name in listing["files"]:
+                    path = os.path.join(listing["path"], name)
+                    if name_matches(name, pattern, match) and path not in found and allowed(path):
+                        found.add(path)
+                        yield path
+            common.log_message(f"Indexed '{root}' in {time.perf_counter() - start:.2f}s")
+
+        if stop_event is not None and stop_event.is_set():
+            return
+
+        start = time.perf_counter()
+        matches = query(connection, pattern, match, roots)
+        common.log_message(f"Index query for '{pattern}' ({match}) returned {len(matches)} file(s) in {(time.perf_counter() - start) * 1000:.1f}ms")
+        for path in matches:
+            if path not in found and allowed(path):
+                found.add(path)
+                yield path
+    finally:
+        connection.close()
+
+def search(pattern, roots, match='exact', fresh=False, max_age=INDEX_MAX_AGE, index_path=None, workers=None, exclude=(), max_depth=None, max_results=None):
+    """Find files by name through the index and return their sorted paths."""
+    return sorted(iter_search(pattern, roots, match, fresh, max_age, index_path, workers, exclude, max_depth))[:max_results]
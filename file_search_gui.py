@@ -2,22 +2,25 @@
 
 import os
 import common_code_gui as common
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from tkinter import Toplevel, Label
+import file_index
+import directory_walk
+import instrumentation
+from tkinter import Toplevel, Label, Listbox, Button, END
 import time
 import threading
-from queue import Queue
+from queue import Queue, Empty
 
-def search_file_in_directory(filename, search_path):
-    """Search for a file in a given directory."""
-    found_files = []
-    try:
-        for root, dirs, files in os.walk(search_path):
-            if filename in files:
-                found_files.append(os.path.join(root, filename))
-    except Exception as e:
-        raise ValueError(f"Error searching in {search_path}: {str(e)}")
-    return found_files
+# Seconds between progress reports
+PROGRESS_INTERVAL = 0.25
+
+def search_file_in_directories(filename, search_paths, match='exact', workers=None, exclude=(), max_depth=None, on_listing=None, stop_event=None):
+    """Walk the given directories with a shared pool of threads and yield matching paths as they are found."""
+    for listing in directory_walk.walk(search_paths, workers, exclude, max_depth, stop_event=stop_event):
+        if on_listing:
+            on_listing(listing)
+        for name in listing["files"]:
+            if file_index.name_matches(name, filename, match):
+                yield os.path.join(listing["path"], name)
 
 def get_accessible_drives():
     """Get a list of accessible drives based on the OS."""
@@ -31,114 +34,195 @@ def get_accessible_drives():
     else:  # Unix-like systems 
         return ["/"] + [os.path.join("/mnt", d) for d in os.listdir("/mnt") if os.path.isdir(os.path.join("/mnt", d))]
 
-def file_search_in_drives(filename,label):
-    """Search for the file in all accessible drives using multiple threads."""
-    found_files = []
-    drives = get_accessible_drives()
-
+def local_drives():
+    """Accessible drives without the network mounts, which are too slow to search by default."""
+    network_mounts = set(directory_walk.network_mounts())
+    return [drive for drive in get_accessible_drives() if drive not in network_mounts]
+
+def iter_file_search(filename, drives=None, match='exact', use_index=True, fresh=False, workers=None, exclude=(),
+                     max_depth=None, max_results=None, progress=None, cancel_event=None):
+    """Yield the paths of matching files while the search is still running.
+
+    By default the persistent filename index answers the query and is only rescanned when it is
+    out of date; `fresh` forces a complete walk. Without the index the directories are walked directly.
+    `progress` is called every PROGRESS_INTERVAL seconds, and once at the end, with the drive being
+    searched, the directories and files scanned so far, the scan rate and the number of matches.
+    Setting `cancel_event` stops the search; the matches found until then have already been yielded.
+    """
+    drives = drives or local_drives()
+    cancel_event = cancel_event or threading.Event()
     common.log_message(f"Detected drives: {drives}")
 
-    with ThreadPoolExecutor(max_workers=len(drives)) as executor:
-        futures = {executor.submit(search_file_in_directory, filename, drive): drive for drive in drives}
-
-        for future in as_completed(futures):
-            drive = futures[future]
-            try:
-                results = future.result()  # Get results from the completed thread
-                found_files.extend(results)  # Collect found files
-            except Exception as e:
-                raise ValueError(f"Error searching in drive: {futures[future]} - {str(e)}")
-            finally:
-                # Update the label with completion message for the specific drive
-                common.log_message(f"Completed search in: {drive}")
-                #label.config(text=f"Completed search in: {drive}")  # Update user feedback                
-
-    return found_files
-
-def loading_animation(label, stop_event):
-    """Animate the loading label with a text-based hourglass."""
-    hourglass_frames = ["⧖", "⧗", "⧕", "⧔"]  # Hourglass symbols
-    while not stop_event.is_set():
-        for frame in hourglass_frames:
-            if stop_event.is_set():
-                break  # Exit if stop_event is set
-            label.config(text=f"Searching for files {frame}")
-            label.update()
-            time.sleep(0.5)  # Adjust the speed of the spinner
-
+    stats = {"drive": None, "path": None, "directories": 0, "files": 0, "matches": 0, "seconds": 0.0, "rate": 0.0, "cancelled": False}
+    start = time.perf_counter()
+    last_report = start
+
+    def report(force=False):
+        nonlocal last_report
+        now = time.perf_counter()
+        stats["seconds"] = round(now - start, 3)
+        stats["rate"] = round(stats["directories"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+        if progress and (force or now - last_report >= PROGRESS_INTERVAL):
+            last_report = now
+            progress(dict(stats))
+
+    def on_listing(listing):
+        stats["directories"] += 1
+        stats["files"] += len(listing["files"])
+        stats["path"] = listing["path"]
+        stats["drive"] = max((drive for drive in drives if file_index.is_below(listing["path"], os.path.abspath(drive))), key=len, default=None)
+        report()
+
+    if use_index:
+        results = file_index.iter_search(filename, drives, match, fresh, workers=workers, exclude=exclude, max_depth=max_depth, on_listing=on_listing, stop_event=cancel_event)
+    else:
+        results = search_file_in_directories(filename, drives, match, workers, exclude, max_depth, on_listing, cancel_event)
+
+    with instrumentation.stage("search") as record:
+        try:
+            for path in results:
+                if cancel_event.is_set():
+                    break
+                stats["matches"] += 1
+                yield path
+                if max_results and stats["matches"] >= max_results:
+                    break
+        finally:
+            results.close()  # Stops the workers
+            stats["cancelled"] = cancel_event.is_set()
+            report(force=True)
+            common.log_message(
+                f"{'Cancelled' if stats['cancelled'] else 'Completed'} search in: {', '.join(drives)} - {stats['directories']} directories, "
+                f"{stats['files']} files scanned ({stats['rate']} directories/s), {stats['matches']} match(es) in {stats['seconds']}s"
+            )
+            record["rows"], record["matches"] = stats["files"], stats["matches"]
+
+def file_search_in_drives(filename, drives=None, match='exact', use_index=True, fresh=False, workers=None, exclude=(),
+                          max_depth=None, max_results=None, progress=None, cancel_event=None):
+    """Search for the file in the given directories (all accessible local drives by default) and return the sorted matches."""
+    return sorted(iter_file_search(filename, drives, match, use_index, fresh, workers, exclude, max_depth, max_results, progress, cancel_event))
+
+def describe_progress(stats):
+    """One-line progress text for the loading window and the log."""
+    return f"{stats['drive'] or ''} {stats['directories']} folders, {stats['files']} files ({stats['rate']:.0f}/s), {stats['matches']} found".strip()
 
 def show_loading_screen():
-    """Display a loading screen while the search is in progress."""
+    """Display a loading screen that lists the matches while the search is in progress."""
     loading_window = Toplevel()
     loading_window.title("Searching...")
-    loading_window.geometry("300x100")
+    loading_window.geometry("560x320")
     loading_window.resizable(False, False)
 
     # Center the loading window
     screen_width = loading_window.winfo_screenwidth()
     screen_height = loading_window.winfo_screenheight()
-    x = (screen_width // 2) - (300 // 2)
-    y = (screen_height // 2) - (100 // 2)
-    loading_window.geometry(f"300x100+{x}+{y}")
+    x = (screen_width // 2) - (560 // 2)
+    y = (screen_height // 2) - (320 // 2)
+    loading_window.geometry(f"560x320+{x}+{y}")
 
     # Set a background color
     loading_window.configure(bg="#f0f0f0")
 
-    # Create a label for the loading spinner
-    label = Label(loading_window, text="Searching for files", bg="#f0f0f0", font=("Helvetica", 14))
-    label.pack(pady=20)
+    # Create a label for the loading spinner and the progress
+    label = Label(loading_window, text="Searching for files", bg="#f0f0f0", font=("Helvetica", 12), wraplength=520)
+    label.pack(pady=10)
 
-    return loading_window, label
+    # Matches appear here as soon as they are found
+    results_list = Listbox(loading_window, width=80, height=10)
+    results_list.pack(padx=10, fill="both", expand=True)
 
-def search_file(filename):
-    """Main function to initiate the search and display results."""
+    cancel_button = Button(loading_window, text="Cancel", bg="lightgrey")
+    cancel_button.pack(pady=10)
+
+    return loading_window, label, results_list, cancel_button
+
+def run_search_window(start_search, cancel_event, describe=describe_progress, format_match=str, subject="files"):
+    """Run a search in a background thread and list its matches in the loading window as they arrive.
+
+    `start_search(progress)` returns the generator of matches. The search thread only posts events to
+    a queue; the Tk thread polls it, so the window is never touched from another thread.
+    """
     loading_window = None
-    stop_event = threading.Event()
-    exception_queue = Queue()
+    events = Queue()
+    found = []
+    hourglass_frames = ["⧖", "⧗", "⧕", "⧔"]  # Hourglass symbols
+    progress_text = [""]
 
-    def complete_search(found_files):
+    def complete_search():
         """Handle the completion of the search."""
-        stop_event.set()  # Stop the loading animation
         loading_window.destroy()  # Close loading screen
 
-        # Log and display the found files
+        # Log and display what was found
         try:
-            if found_files:
-                common.log_message(f"Found files:\n" + "\n".join(found_files))
-                common.display_message("Found files:\n" + "\n".join(found_files), status="info")
+            if found:
+                heading = f"Search cancelled. {subject.capitalize()} found so far:" if cancel_event.is_set() else f"Found {subject}:"
+                lines = "\n".join(format_match(match) for match in found)
+                common.log_message(f"{heading}\n{lines}")
+                common.display_message(f"{heading}\n{lines}", status="info")
+            elif cancel_event.is_set():
+                raise ValueError(f"Search cancelled: No {subject} found.")
             else:
-                raise ValueError("Search failed: No files found.")
+                raise ValueError(f"Search failed: No {subject} found.")
         except Exception as e:
             common.handle_exception(e)
-        
-    try:
-        common.log_message(f"Starting search for file: {filename}")
-
-        loading_window, label = show_loading_screen()
-        loading_window.update()  # Update the loading screen immediately
-
-        # Start the loading animation in a separate thread
-        animation_thread = threading.Thread(target=loading_animation, args=(label, stop_event),)
-        animation_thread.start()
 
-        # Perform the file search in a separate thread
-        def run_file_search(exception_queue):
-            try:
-                found_files = file_search_in_drives(filename, label)  # Pass label for user feedback
-                complete_search(found_files)
-            except Exception as e:
-                exception_queue.put(e)  # Put the exception in the queue to be handled in the main thread
+    def poll(tick=0):
+        """Apply the search events to the window; runs in the Tk thread."""
+        try:
+            while True:
+                kind, value = events.get_nowait()
+                if kind == "progress":
+                    progress_text[0] = describe(value)
+                elif kind == "match":
+                    found.append(value)
+                    results_list.insert(END, format_match(value))
+                elif kind == "error":
+                    loading_window.destroy()
+                    common.handle_exception(value)
+                    return
+                else:
+                    complete_search()
+                    return
+        except Empty:
+            pass
+
+        state = "Cancelling" if cancel_event.is_set() else f"Searching for {subject}"
+        label.config(text=f"{state} {hourglass_frames[tick // 5 % len(hourglass_frames)]}\n{progress_text[0]}")
+        loading_window.after(100, poll, tick + 1)
+
+    def cancel():
+        cancel_event.set()
+        cancel_button.config(state="disabled")
+
+    def run_search():
+        try:
+            for match in start_search(lambda stats: events.put(("progress", stats))):
+                events.put(("match", match))
+            events.put(("done", None))
+        except Exception as e:
+            events.put(("error", e))  # Raised in the Tk thread by poll()
 
+    try:
+        loading_window, label, results_list, cancel_button = show_loading_screen()
+        cancel_button.config(command=cancel)
+        loading_window.protocol("WM_DELETE_WINDOW", cancel)
 
-        search_thread = threading.Thread(target=run_file_search, args=(exception_queue,))  # Correct argument packing
+        search_thread = threading.Thread(target=run_search, daemon=True)
         search_thread.start()
-
-
-        if not exception_queue.empty():  # If an exception occurred during the search
-            exception = exception_queue.get()
-            raise exception
+        poll()
 
     except Exception as e:
+        cancel_event.set()
         if loading_window:  # Close loading screen if it exists
             loading_window.destroy()
-        raise e
\ No newline at end of file
+        raise e
+
+def search_file(filename):
+    """Main function to initiate the search and display results."""
+    common.log_message(f"Starting search for file: {filename}")
+    cancel_event = threading.Event()
+    match = 'glob' if any(char in filename for char in "*?[") else 'exact'
+    run_search_window(
+        lambda progress: iter_file_search(filename, match=match, progress=progress, cancel_event=cancel_event),
+        cancel_event,
+    )
@@ -0,0 +1,194 @@
+#instrumentation.py
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# JSON-lines file receiving one record per stage and per run; unset keeps the records in memory only
+PROFILE_LOG = os.environ.get("EXCELWIZARD_PROFILE_LOG") or None
+
+# Profiler run around every operation: 'cprofile', 'pyinstrument' or unset for none
+PROFILER = os.environ.get("EXCELWIZARD_PROFILE") or None
+PROFILERS = ('cprofile', 'pyinstrument')
+
+# Directory receiving the profiler dumps
+PROFILE_DIR = os.environ.get("EXCELWIZARD_PROFILE_DIR", "log")
+
+# Functions called with the name of every stage as it starts, e.g. to report progress or stop a cancelled task
+STAGE_HOOKS = []
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+def peak_rss_mb():
+    """Highest resident memory of this process so far, in MB (None where it cannot be read)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / 2**20, 1)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)  # Bytes on macOS, KB on Linux
+
+def file_size(file_path):
+    """Size of a file in bytes, or None if it cannot be read."""
+    try:
+        return os.path.getsize(file_path)
+    except (OSError, TypeError):
+        return None
+
+def frame_size(dataframe):
+    """Memory held by a DataFrame's columns in bytes, without inspecting every Python object."""
+    try:
+        return int(dataframe.memory_usage(index=False, deep=False).sum())
+    except AttributeError:
+        return None
+
+def write_record(record):
+    """Append a record to the JSON-lines log, if one is configured."""
+    if not PROFILE_LOG:
+        return
+    line = json.dumps(record, default=str) + "\n"
+    with _write_lock:
+        os.makedirs(os.path.dirname(os.path.abspath(PROFILE_LOG)), exist_ok=True)
+        with open(PROFILE_LOG, "a", encoding="utf-8") as handle:
+            handle.write(line)
+
+def current_run():
+    """The run the calling thread is recording, or None."""
+    runs = getattr(_local, "runs", None)
+    return runs[-1] if runs else None
+
+@contextmanager
+def stage(name, rows=None, bytes=None, **details):
+    """Measure one stage (read, compare, update, write, hash, search...) of an operation.
+
+    The yielded record can be completed inside the block, e.g. `record["rows"] = len(frame)`. On exit it
+    gets the wall time, CPU time and peak RSS, is written to the JSON-lines log and is added to the
+    stages of the current run. A stage that raises is recorded with its error.
+    """
+    for hook in STAGE_HOOKS:
+        hook(name)
+    run = current_run()
+    record = {"run": run["run"] if run else None, "stage": name, "rows": rows, "bytes": bytes, **details}
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = str(e) or type(e).__name__
+        raise
+    finally:
+        record["wall_seconds"] = round(time.perf_counter() - wall_start, 6)
+        record["cpu_seconds"] = round(time.process_time() - cpu_start, 6)
+        record["peak_rss_mb"] = peak_rss_mb()
+        record["pid"] = os.getpid()
+        record["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        if run is not None:
+            run["stages"].append(record)
+        write_record(record)
+
+def instrumented(name, measure=None):
+    """Decorator running a function as a stage.
+
+    `measure(result, *args, **kwargs)` returns the rows and bytes of a call, e.g. the length of the
+    DataFrame it returns and the size of the file it read.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name) as record:
+                result = function(*args, **kwargs)
+                if measure:
+                    record["rows"], record["bytes"] = measure(result, *args, **kwargs)
+                return result
+        return wrapper
+    return decorator
+
+def start_profiler(profiler):
+    """Start a cProfile or pyinstrument profiler."""
+    if profiler == 'cprofile':
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ValueError("pyinstrument is required for --profile pyinstrument (pip install pyinstrument).")
+        profile = Profiler()
+        profile.start()
+        return profile
+    raise ValueError(f"Unknown profiler '{profiler}'. Expected one of: {', '.join(PROFILERS)}.")
+
+def stop_profiler(profiler, profile, operation, run_id):
+    """Stop a profiler and dump its results next to the logs: .prof for cProfile, .html for pyinstrument."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base_name = os.path.join(PROFILE_DIR, f"{operation}_{time.strftime('%Y%m%d_%H%M%S')}_{run_id}")
+    if profiler == 'cprofile':
+        profile.disable()
+        profile.dump_stats(f"{base_name}.prof")
+        return f"{base_name}.prof"
+    profile.stop()
+    with open(f"{base_name}.html", "w", encoding="utf-8") as handle:
+        handle.write(profile.output_html())
+    return f"{base_name}.html"
+
+@contextmanager
+def run(operation, profiler=None):
+    """Group the stages of one operation and record its totals.
+
+    Runs nest: an operation started inside another one (a compare inside a CLI job) adds its stages
+    to the outer run. The outermost run optionally profiles everything with `profiler` (PROFILER by
+    default) and records where the dump was written.
+    """
+    outer = current_run()
+    if outer is not None:
+        yield outer
+        return
+
+    record = {"run": uuid.uuid4().hex[:12], "operation": operation, "stages": []}
+    profiler = profiler or PROFILER
+    profile = start_profiler(profiler) if profiler else None
+    _local.runs = [record]
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = str(e) or type(e).__name__
+        raise
+    finally:
+        _local.runs = []
+        if profile is not None:
+            record["profile"] = stop_profiler(profiler, profile, operation, record["run"])
+        record["wall_seconds"] = round(time.perf_counter() - wall_start, 6)
+        record["cpu_seconds"] = round(time.process_time() - cpu_start, 6)
+        record["peak_rss_mb"] = peak_rss_mb()
+        write_record(dict({key: value for key, value in record.items() if key != "stages"}, stage="total", pid=os.getpid(),
+                          timestamp=time.strftime("%Y-%m-%dT%H:%M:%S")))
+
+def summarize_stages(stages):
+    """Compact stage records for JSON output: stage, rows, bytes, times and peak RSS."""
+    keys = ("stage", "rows", "bytes", "wall_seconds", "cpu_seconds", "peak_rss_mb")
+    return [{key: record.get(key) for key in keys if record.get(key) is not None} for record in stages]
+
+def format_stages(stages):
+    """Stage breakdown as aligned text lines for the success dialogs."""
+    lines = []
+    for record in stages:
+        line = f"{record['stage']:<8} {record['wall_seconds']:>8.3f}s (CPU {record['cpu_seconds']:.3f}s)"
+        if record.get("rows") is not None:
+            line += f", {record['rows']} rows"
+        if record.get("bytes") is not None:
+            line += f", {record['bytes'] / 2**20:.1f} MB"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,160 @@
+#integrity_check.py
+
+import pandas as pd
+import common_code_gui as common
+import streaming_io
+import hashlib
+
+# Verification levels, from cheapest to most thorough
+VERIFY_LEVELS = ('none', 'schema', 'sample', 'chunks', 'full')
+DEFAULT_VERIFY_LEVEL = 'full'
+
+# Rows per verified chunk and default number of sampled rows
+DEFAULT_CHUNK_ROWS = streaming_io.DEFAULT_BATCH_ROWS
+DEFAULT_SAMPLE_ROWS = 1000
+
+# Sampling stride when the row count is not known in advance (streaming)
+DEFAULT_SAMPLE_STRIDE = 1000
+
+def align_dtypes(frame, dtypes):
+    """Cast read-back columns to the dtypes they had when written, where the values allow it."""
+    frame = frame.copy()
+    for col, dtype in dtypes.items():
+        if col in frame.columns and frame[col].dtype != dtype:
+            try:
+                frame[col] = frame[col].astype(dtype)
+            except (TypeError, ValueError):
+                pass  # Values that cannot take the original type will show up as a mismatch
+    return frame
+
+def row_hashes(frame, dtypes=None):
+    """Hash every row of a frame, independent of its index."""
+    if dtypes is not None:
+        frame = align_dtypes(frame, dtypes)
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+def chunk_digest(frame, dtypes=None):
+    """Digest of all rows of a chunk."""
+    return hashlib.md5(row_hashes(frame, dtypes)).hexdigest()
+
+def new_write_record(level, sample_stride=DEFAULT_SAMPLE_STRIDE):
+    """Start recording what is written, for verifying the output afterwards."""
+    return {"level": level, "rows": 0, "columns": None, "chunks": [], "dtypes": [], "samples": {}, "sample_stride": sample_stride}
+
+def record_batches(batches, record):
+    """Pass batches through to a writer while recording the hashes the verification level needs."""
+    for batch in batches:
+        if record["columns"] is None:
+            record["columns"] = list(batch.columns)
+        record["dtypes"].append(batch.dtypes.to_dict())
+
+        if record["level"] in ('chunks', 'full'):
+            record["chunks"].append(chunk_digest(batch))
+        elif record["level"] == 'sample':
+            stride = record["sample_stride"]
+            first_sample = -record["rows"] % stride
+            sampled = batch.iloc[first_sample::stride]
+            positions = range(record["rows"] + first_sample, record["rows"] + len(batch), stride)
+            record["samples"].update(zip(positions, row_hashes(sampled)))
+
+        record["rows"] += len(batch)
+        yield batch
+
+def record_dataframe(dataframe, level, chunk_rows=DEFAULT_CHUNK_ROWS, sample_rows=DEFAULT_SAMPLE_ROWS):
+    """Record an in-memory DataFrame chunk by chunk, sampling about `sample_rows` rows."""
+    record = new_write_record(level, max(1, len(dataframe) // sample_rows))
+    for _ in record_batches(streaming_io.iter_frame_batches(dataframe, chunk_rows), record):
+        pass
+    return record
+
+def chunk_range(chunk, chunk_rows, total_rows):
+    """Describe the data rows (0-based, excluding the header) covered by a chunk."""
+    first_row = chunk * chunk_rows
+    return {"chunk": chunk, "first_row": first_row, "last_row": max(first_row, min(total_rows, first_row + chunk_rows) - 1)}
+
+def verify_schema(output_file, record, count_rows=True, sheet_name=None):
+    """Check the header and, unless the chunks are verified anyway, the row count of the written file."""
+    columns = common.read_columns(output_file, sheet_name or 0)
+    problems = []
+    if [str(col) for col in columns] != [str(col) for col in record["columns"]]:
+        problems.append(f"columns differ: expected {record['columns']}, found {columns}")
+    if count_rows:
+        rows = streaming_io.count_rows(output_file, sheet_name)
+        if rows != record["rows"]:
+            problems.append(f"row count differs: expected {record['rows']}, found {rows}")
+    return problems
+
+def verify_chunks(output_file, record, chunk_rows, sheet_name=None):
+    """Re-read the written file chunk by chunk and return the chunks whose digest differs."""
+    mismatched = []
+    read_chunks = 0
+    for chunk, batch in enumerate(streaming_io.iter_batches(output_file, chunk_rows, sheet_name)):
+        read_chunks += 1
+        if chunk >= len(record["chunks"]) or chunk_digest(batch, record["dtypes"][chunk]) != record["chunks"][chunk]:
+            mismatched.append(chunk)
+    mismatched.extend(range(read_chunks, len(record["chunks"])))  # Chunks missing from the output
+    return mismatched
+
+def verify_samples(output_file, record, chunk_rows, sheet_name=None):
+    """Re-read only the sampled rows of the written file and return the chunks holding rows that differ."""
+    stride = record["sample_stride"]
+    positions = sorted(record["samples"])
+    if output_file.endswith('.csv'):
+        # Skip the rows between samples while parsing, so only the sampled rows are converted
+        sampled = pd.read_csv(output_file, skiprows=lambda line: line > 0 and (line - 1) % stride != 0)
+    else:
+        pieces = []
+        offset = 0
+        for batch in streaming_io.iter_batches(output_file, chunk_rows, sheet_name):
+            pieces.append(batch.iloc[-offset % stride::stride])
+            offset += len(batch)
+        sampled = pd.concat(pieces) if pieces else pd.DataFrame()
+
+    mismatched = set()
+    for i, position in enumerate(positions):
+        chunk = position // chunk_rows
+        if i >= len(sampled) or row_hashes(sampled.iloc[[i]], record["dtypes"][chunk])[0] != record["samples"][position]:
+            mismatched.add(chunk)
+    return sorted(mismatched)
+
+def verify_output(output_file, record, chunk_rows=DEFAULT_CHUNK_ROWS, sheet_name=None):
+    """Verify a written file (or one sheet of it) against its write record at the record's level and return a report.
+
+    The report lists which chunks differ, so a failed conversion can be inspected instead of only rejected.
+    """
+    level = record["level"]
+    report = {"level": level, "passed": True, "problems": [], "mismatched_chunks": []}
+    if level == 'none':
+        return report
+
+    report["problems"] = verify_schema(output_file, record, count_rows=level in ('schema', 'sample'), sheet_name=sheet_name)
+    mismatched = []
+    if level == 'sample':
+        mismatched = verify_samples(output_file, record, chunk_rows, sheet_name)
+    elif level in ('chunks', 'full'):
+        mismatched = verify_chunks(output_file, record, chunk_rows, sheet_name)
+
+    report["mismatched_chunks"] = [chunk_range(chunk, chunk_rows, record["rows"]) for chunk in mismatched]
+    report["passed"] = not report["problems"] and not mismatched
+    return report
+
+def compare_dataframes(original, converted, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """List the chunks in which two in-memory DataFrames differ."""
+    mismatched = []
+    total_chunks = max(len(original), len(converted)) // chunk_rows + 1
+    for chunk in range(total_chunks):
+        start = chunk * chunk_rows
+        original_chunk = original.iloc[start:start + chunk_rows]
+        converted_chunk = converted.iloc[start:start + chunk_rows]
+        if original_chunk.empty and converted_chunk.empty:
+            continue
+        if len(original_chunk) != len(converted_chunk) or chunk_digest(original_chunk) != chunk_digest(converted_chunk, original_chunk.dtypes.to_dict()):
+            mismatched.append(chunk_range(chunk, chunk_rows, max(len(original), len(converted))))
+    return mismatched
+
+def describe_report(report):
+    """Summarise a failed verification for error messages."""
+    details = list(report["problems"])
+    if report["mismatched_chunks"]:
+        details.append("rows differ in " + ", ".join(f"{chunk['first_row']}-{chunk['last_row']}" for chunk in report["mismatched_chunks"]))
+    return f"Data integrity check failed ({report['level']}): " + "; ".join(details or ["the data has changed during conversion"]) + "."
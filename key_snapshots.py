@@ -0,0 +1,93 @@
+#key_snapshots.py
+
+import pandas as pd
+import numpy as np
+import common_code_gui as common
+import instrumentation
+import workbook_cache
+import os
+
+# Compare incrementally by default (the CLI's --incremental); snapshots live in the workbook cache
+INCREMENTAL = os.environ.get("EXCELWIZARD_INCREMENTAL", "0") == "1"
+
+# Column of a snapshot holding the row hashes, next to the key column(s)
+HASH_COLUMN = "__excelwizard_row_hash__"
+
+# Integers up to this size are hashed as floats, so 5 and 5.0 hash alike without two integers colliding
+MAX_EXACT_FLOAT_INT = 2**53
+
+def hashable_values(frame, columns):
+    """The given columns with numbers in one dtype, so files that infer int or float for a column hash alike."""
+    values = {}
+    for col in columns:
+        series = frame[col]
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            if not pd.api.types.is_integer_dtype(series) or series.abs().max() <= MAX_EXACT_FLOAT_INT:
+                series = series.astype('float64')
+        values[col] = series.reset_index(drop=True)
+    return pd.DataFrame(values, columns=columns)
+
+def row_hashes(frame, columns):
+    """Hash the given columns of every row of a frame, independent of its index.
+
+    Equal hashes mean equal values; different hashes only mean the row has to be compared.
+    """
+    with instrumentation.stage("hash", rows=len(frame)) as record:
+        hashes = pd.util.hash_pandas_object(hashable_values(frame, columns), index=False).to_numpy()
+        record["bytes"] = hashes.nbytes
+    return hashes
+
+def snapshot_variant(key_columns, columns):
+    """Cache variant of a snapshot: the same file hashed over other columns is another snapshot."""
+    return f"row-hashes|{'|'.join(map(str, key_columns))}||{'|'.join(map(str, columns))}"
+
+def snapshot_frame(frame, key_columns, hashes):
+    """A snapshot: the key column(s) of every row and the hash of its values."""
+    snapshot = frame[key_columns].reset_index(drop=True)
+    snapshot[HASH_COLUMN] = hashes
+    return snapshot
+
+def file_hashes(file_path, frame, key_columns, columns):
+    """Row hashes of a file read into `frame`, from its snapshot when the file is unchanged since it was hashed.
+
+    Otherwise the rows are hashed and the snapshot is stored for the next compare.
+    """
+    hashed = []
+
+    def hash_file(_):
+        hashed.append(True)
+        return snapshot_frame(frame, key_columns, row_hashes(frame, columns))
+
+    snapshot = workbook_cache.cached_read(file_path, hash_file, snapshot_variant(key_columns, columns), extensions=None)
+    if len(snapshot) != len(frame):  # Snapshot of another parse of the file
+        snapshot = hash_file(file_path)
+    if not hashed:
+        common.log_message(f"Reused the row hashes of '{file_path}' from its snapshot.", level='info')
+    return snapshot[HASH_COLUMN].to_numpy()
+
+def store_snapshot(file_path, frame, key_columns, columns, hashes):
+    """Store the row hashes of a file just written from `frame`, so the next compare does not hash it."""
+    if not workbook_cache.CACHE_ENABLED:
+        return
+    key = workbook_cache.file_fingerprint(file_path, snapshot_variant(key_columns, columns))
+    workbook_cache.store(key, snapshot_frame(frame, key_columns, hashes))
+
+def changed_rows(row_hashes_pair, positions, matched):
+    """Mask of the matched df1 rows whose hash differs from their df2 row's; only these can have changed values."""
+    hashes1, hashes2 = row_hashes_pair
+    candidates = np.zeros(len(matched), dtype=bool)
+    candidates[matched] = hashes1[matched] != hashes2[positions[matched]]
+    return candidates
+
+def output_hashes(merged_df, columns, hashes1, rehash_rows):
+    """Row hashes of a merged frame, reusing the first file's hashes for the rows the merge did not touch.
+
+    `rehash_rows` marks the merged rows whose values may differ from the first file: updated and
+    orphaned rows, and every appended row. Only these are hashed, so the cost follows the change.
+    """
+    hashes = np.empty(len(merged_df), dtype=np.uint64)
+    hashes[:len(hashes1)] = hashes1
+    rows = np.flatnonzero(rehash_rows)
+    if len(rows):
+        hashes[rows] = row_hashes(merged_df.iloc[rows], columns)
+    return hashes
@@ -0,0 +1,44 @@
+#lazy_loader.py
+
+import importlib
+import threading
+import logging
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access, e.g. `pd = LazyModule("pandas")`."""
+
+    def __init__(self, module_name):
+        self._module_name = module_name
+
+    def __getattr__(self, attribute):
+        return getattr(importlib.import_module(self._module_name), attribute)
+
+    def __repr__(self):
+        return f"<lazy module '{self._module_name}'>"
+
+def lazy_function(module_name, function_name):
+    """Stand-in for module_name.function_name that imports the module when it is first called.
+
+    Called in a worker thread, the import happens there too and does not hold up the window.
+    """
+    def call(*args, **kwargs):
+        return getattr(importlib.import_module(module_name), function_name)(*args, **kwargs)
+    call.__name__ = call.__qualname__ = function_name
+    call.__doc__ = f"Calls {module_name}.{function_name}, importing {module_name} on first use."
+    return call
+
+def preload(module_names):
+    """Import modules in a background thread, so the first use of a feature does not wait for them.
+
+    Failures are only logged: the import is retried, and reported, when the feature is used.
+    """
+    def import_all():
+        for module_name in module_names:
+            try:
+                importlib.import_module(module_name)
+            except Exception as e:
+                logging.warning(f"Could not preload '{module_name}': {e}")
+
+    thread = threading.Thread(target=import_all, name="preload", daemon=True)
+    thread.start()
+    return thread
@@ -3,31 +3,85 @@
 import tkinter as tk
 from tkinter import messagebox
 import common_code_gui as common
-from compare_update_gui import compare_and_update
-from file_format_conv_gui import file_format_conversion_ops
-from file_search_gui import search_file
-from sample_file_gen_gui import generate_dummy_data,save_to_file
+import instrumentation
+from lazy_loader import lazy_function, preload
+from background_tasks_gui import TaskManager, show_jobs_panel
 import logging
 from datetime import datetime
 import os
 
-# Create a directory for logs if it doesn't exist
-log_dir = 'log'
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
+# Feature functions; their modules, and pandas, openpyxl and Faker behind them, are imported on first use
+compare_and_update = lazy_function("compare_update_gui", "compare_and_update")
+compare_and_update_chunked = lazy_function("chunked_compare", "compare_and_update_chunked")
+compare_workbooks = lazy_function("workbook_compare", "compare_workbooks")
+match_sheets = lazy_function("workbook_compare", "match_sheets")
+ask_all_decisions = lazy_function("compare_update_gui", "ask_all_decisions")
+format_changes = lazy_function("compare_update_gui", "format_changes")
+probe_files = lazy_function("schema_probe", "probe_files")
+describe_columns = lazy_function("schema_probe", "describe_columns")
+describe_size = lazy_function("schema_probe", "describe_size")
+ask_conversion_files = lazy_function("file_format_conv_gui", "ask_conversion_files")
+convert_and_report = lazy_function("file_format_conv_gui", "convert_and_report")
+search_file = lazy_function("file_search_gui", "search_file")
+content_search_ops = lazy_function("content_search_gui", "content_search_ops")
+generate_dummy_data = lazy_function("sample_file_gen_gui", "generate_dummy_data")
+save_to_file = lazy_function("sample_file_gen_gui", "save_to_file")
+ask_schema_files = lazy_function("schema_gen_gui", "ask_schema_files")
+generate_and_report = lazy_function("schema_gen_gui", "generate_and_report")
 
-# Generate a timestamped log file name
-log_file_name = f"application_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-log_file_path = os.path.join(log_dir, log_file_name)
+# Modules imported in a background thread once the menu is shown, so the first click does not wait for them
+PRELOAD_MODULES = ("pandas", "compare_update_gui", "file_format_conv_gui", "content_search_gui", "schema_gen_gui")
+PRELOAD = os.environ.get("EXCELWIZARD_PRELOAD", "1") != "0"
 
-# Configure logging
-logging.basicConfig(
-    filename=log_file_path,
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-)
+# Milliseconds after the menu appears before preloading starts
+PRELOAD_DELAY = 500
+
+# Buttons of the main menu in order, as (label, handler); operations add themselves with @menu_operation
+MENU_OPERATIONS = []
+
+def menu_operation(label):
+    """Register a function as a main menu operation, without importing anything it uses."""
+    def register(function):
+        MENU_OPERATIONS.append((label, function))
+        return function
+    return register
+
+# Directory receiving the application log and stage timings of a GUI session
+LOG_DIR = 'log'
+
+def configure_logging(log_dir=LOG_DIR):
+    """Log to a timestamped file in `log_dir`; called when the menu starts, so importing this module writes nothing."""
+    # Create a directory for logs if it doesn't exist
+    os.makedirs(log_dir, exist_ok=True)
+
+    # Generate a timestamped log file name
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    log_file_path = os.path.join(log_dir, f"application_{timestamp}.log")
+
+    # Stage timings go to a JSON-lines file next to the log
+    instrumentation.PROFILE_LOG = instrumentation.PROFILE_LOG or os.path.join(log_dir, f"profile_{timestamp}.jsonl")
+
+    # Configure logging
+    logging.basicConfig(
+        filename=log_file_path,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+    )
+
+# Questions and warnings of the compare job, shown by the window's thread like the other dialogs
+ask_yes_no = common.on_gui_thread(messagebox.askyesno)
+show_warning = common.on_gui_thread(messagebox.showwarning)
+
+# Runs the heavy part of every operation in worker threads, so the window never freezes; created by main_menu()
+task_manager = None
+
+def run_in_background(title, function, *args, **kwargs):
+    """Hand an operation to the task manager and show it in the jobs panel."""
+    task_manager.submit(title, function, *args, **kwargs)
+    show_jobs_panel(task_manager)
 
 # Function for "File Compare and Update"
+@menu_operation("File Compare and Update")
 def file_compare_update():
     try:
         file1, message1 = common.open_file_dialog("Select First Excel or CSV File")
@@ -38,26 +92,113 @@ def file_compare_update():
         if not file2:
             raise ValueError(message2)
         
-        key_column = common.simple_input_dialog("Input", "Enter the key column name: ( Please enter exact name )")
-        if not key_column:
-            raise ValueError("No key column provided")
-
         if file1 == file2:
             raise ValueError("Cannot select Same file again")
-        
-        # Ask user for confirmation to update the first file
-        if messagebox.askyesno("Confirmation", f"Do you want to update '{os.path.basename(file1)}' with changes from '{os.path.basename(file2)}'?"):
-            output_file, message3 = common.save_file_dialog("Save Updated File As")
-            if not output_file:
-                raise ValueError(message3)
-            
-            # Call the compare_and_update function
-            compare_and_update(file1, file2, key_column, output_file)
+
+        # Listing sheets and probing open both files, so they run in the job too; the job's questions still come up as dialogs
+        run_in_background(f"Update {os.path.basename(file1)} from {os.path.basename(file2)}", compare_files, file1, file2)
 
     except Exception as e:
         common.handle_exception(e)
 
+def compare_files(file1, file2):
+    """Probe both files, ask for the key and what to save, then compare them; runs as a background job."""
+    # Workbooks sharing several sheets can be updated sheet by sheet, each on its own key
+    if file1.lower().endswith(('.xls', '.xlsx')) and file2.lower().endswith(('.xls', '.xlsx')):
+        shared_sheets, _ = match_sheets(file1, file2)
+        if len(shared_sheets) > 1 and ask_yes_no(
+            "Workbooks",
+            f"Both workbooks have the sheets {', '.join(shared_sheets)}.\n\nUpdate every one of them, each on its own key column?\n\n"
+            "Choose 'No' to compare the first sheets only."
+        ):
+            update_workbooks(file1, file2, shared_sheets)
+            return
+
+    # Look at the header and first rows only, so the key can be picked from the real columns
+    report = probe_files([file1, file2])
+    candidates = ", ".join(report["key_candidates"]) or "none found"
+    key_column = common.simple_input_dialog(
+        "Input",
+        f"Columns in both files (types from their first rows):\n\n{describe_columns(report['files'])}\n\n"
+        f"Possible keys (unique in the first rows): {candidates}\n\nEnter the key column name: ( Please enter exact name )"
+    )
+    if not key_column:
+        raise ValueError("No key column provided")
+
+    # A wrong key fails here, with a suggestion, instead of after both files are read
+    warnings = probe_files([file1, file2], [key_column])["key_warnings"]
+    if warnings:
+        show_warning("Key Column", "\n\n".join(warnings))
+
+    title = f"{os.path.basename(file1)} and {os.path.basename(file2)}"
+    sizes = "\n".join(describe_size(probe) for probe in report["files"])
+    if report["engine"] == "chunked" and ask_yes_no(
+        "Large Files",
+        f"{sizes}\n\nThese files may not fit in memory together. Update '{os.path.basename(file1)}' with the out-of-core engine?\n\n"
+        "All questions are asked first; no change set can be saved."
+    ):
+        decisions = ask_all_decisions()
+        output_file, message3 = common.save_file_dialog("Save Updated File As")
+        if not output_file:
+            raise ValueError(message3)
+        update_out_of_core(file1, file2, key_column, output_file, decisions)
+        return
+
+    # Ask user for confirmation to update the first file
+    if ask_yes_no("Confirmation", f"Do you want to update '{os.path.basename(file1)}' with changes from '{os.path.basename(file2)}'?"):
+        output_file, message3 = common.save_file_dialog("Save Updated File As")
+        if not output_file:
+            raise ValueError(message3)
+
+        change_set_file = None
+        if ask_yes_no("Change Set", "Also save the changed cells and the inserted and orphaned rows in a separate file?"):
+            change_set_file, message4 = common.save_file_dialog("Save Change Set As")
+            if not change_set_file:
+                raise ValueError(message4)
+
+        compare_and_update(file1, file2, key_column, output_file, change_set_path=change_set_file)
+
+    # Without an update, the changes alone can still be saved; no merged file is written
+    elif ask_yes_no("Change Set", f"Save only the changes between {title} (changed cells, inserted and orphaned rows)?"):
+        change_set_file, message4 = common.save_file_dialog("Save Change Set As")
+        if not change_set_file:
+            raise ValueError(message4)
+
+        compare_and_update(file1, file2, key_column, None, change_set_path=change_set_file, change_set_only=True)
+
+def update_workbooks(file1, file2, shared_sheets):
+    """Ask for a key per shared sheet, every decision and the output, then update all sheets; runs as a background job."""
+    sheet_keys = {}
+    for sheet in shared_sheets:
+        report = probe_files([file1, file2], sheet_name=sheet)
+        candidates = ", ".join(report["key_candidates"]) or "none found"
+        key_column = common.simple_input_dialog(
+            "Input",
+            f"Columns of sheet '{sheet}' in both workbooks:\n\n{describe_columns(report['files'])}\n\n"
+            f"Possible keys (unique in the first rows): {candidates}\n\nEnter the key column name, or leave it empty to keep this sheet unchanged:"
+        )
+        if key_column:
+            sheet_keys[sheet] = key_column
+    if not sheet_keys:
+        raise ValueError("No key column provided")
+
+    # The sheets are compared in parallel processes, so every question is asked first
+    decisions = ask_all_decisions()
+    output_file, message = common.save_file_dialog("Save Updated Workbook As")
+    if not output_file:
+        raise ValueError(message)
+    compare_workbooks(file1, file2, output_file, decisions, sheet_keys=sheet_keys)
+
+def update_out_of_core(file1, file2, key_column, output_file, decisions):
+    """Compare and update with the chunked engine, then report the changes like the in-memory compare."""
+    summary = compare_and_update_chunked(file1, file2, key_column, output_file, decisions)
+    common.display_message(
+        f"Updated file saved as '{output_file}'.\n\nChanged rows per column:\n{format_changes(summary['changes'])}\nNew rows added: {summary['rows_added']}",
+        status="success"
+    )
+
 # Function for "File Search"
+@menu_operation("File Search")
 def file_search():
     try:
         filename = common.simple_input_dialog("Input", "Enter the filename to search for (with extension):")
@@ -69,17 +210,34 @@ def file_search():
     except Exception as e:
         common.handle_exception(e)
 
+# Function for "Content Search"
+@menu_operation("Content Search")
+def content_search():
+    try:
+        content_search_ops()
+
+    except Exception as e:
+        common.handle_exception(e)
+
 # Function for "File Format Conversion"
+@menu_operation("File Format Conversion")
 def file_format_conversion():
     try:
-        file_format_conversion_ops()
+        input_file, output_file = ask_conversion_files()
+        run_in_background(f"Convert {os.path.basename(input_file)} to {os.path.splitext(output_file)[1][1:]}", convert_and_report, input_file, output_file)
     except Exception as e:
         common.handle_exception(e)
 
 # Function for "Sample File Generation"
+@menu_operation("Sample File Generation")
 def sample_file_generation():
     """Main function to execute the dummy data generation process."""
     try:
+        if messagebox.askyesno("Sample File Generation", "Generate the files described in a schema file (JSON or YAML)?"):
+            schema_file, output_dir = ask_schema_files()
+            run_in_background(f"Generate {os.path.basename(schema_file)}", generate_and_report, schema_file, output_dir)
+            return
+
         num_columns = int(common.simple_input_dialog("Input", "Enter the number of columns:"))
         num_rows = int(common.simple_input_dialog("Input", "Enter the number of rows:"))
         column_info = {}
@@ -89,24 +247,27 @@ def sample_file_generation():
             data_type = common.simple_input_dialog(f"Input", f"Enter the data type for '{column_name}' (Int, Varchar, Numeric, string or Other):")
             column_info[column_name] = data_type
 
-        # Generate dummy data
-        dummy_data_df = generate_dummy_data(num_rows, column_info)
-
-        # Save the generated data to a file
-        save_to_file(dummy_data_df)
+        # Generate dummy data and save it to a file
+        run_in_background(f"Generate {num_rows} rows", generate_sample_file, num_rows, column_info)
 
     except Exception as e:
         common.handle_exception(e)
 
+def generate_sample_file(num_rows, column_info):
+    """Generate dummy data, then ask where to save it."""
+    save_to_file(generate_dummy_data(num_rows, column_info))
+
 # Main Menu GUI
 def main_menu():
+    global task_manager
+    configure_logging()
     root = tk.Tk()
     root.title("Main Menu")
     root.geometry("400x300")
     
     # Center the window
     window_width = 500
-    window_height = 400
+    window_height = 530
     screen_width = root.winfo_screenwidth()
     screen_height = root.winfo_screenheight()
     x = (screen_width // 2) - (window_width // 2)
@@ -125,16 +286,18 @@ def main_menu():
     frame = tk.Frame(root)
     frame.pack(expand=True)
 
+    task_manager = TaskManager(root)
+
     def quit_app():
-        if messagebox.askokcancel("Quit", "Do you want to quit?"):
+        running = len(task_manager.running())
+        question = f"{running} job(s) are still running and will be cancelled. Do you want to quit?" if running else "Do you want to quit?"
+        if messagebox.askokcancel("Quit", question):
+            task_manager.shutdown()
             root.quit()
 
     # Add buttons for each operation with styling
-    buttons = [
-        ("File Compare and Update", file_compare_update),
-        ("File Search", file_search),
-        ("File Format Conversion", file_format_conversion),
-        ("Sample File Generation", sample_file_generation),
+    buttons = MENU_OPERATIONS + [
+        ("Jobs", lambda: show_jobs_panel(task_manager)),
         ("Quit", quit_app),
     ]
 
@@ -146,6 +309,9 @@ def main_menu():
     for button in frame.winfo_children():
         button.config(bg="lightblue", fg="black", font=("Arial", 12))
 
+    if PRELOAD:
+        root.after(PRELOAD_DELAY, preload, PRELOAD_MODULES)
+
     root.mainloop()
 
 if __name__ == "__main__":
@@ -1,13 +1,31 @@
 #sample_file_gen_gui.py
 
 import pandas as pd
-import random
-from faker import Faker
+import numpy as np
 import common_code_gui as common
 import re  # Import regular expression module
+import zlib
+import functools
+import streaming_io
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import os
+import time
+import instrumentation
 
-# Initialize Faker for generating dummy data
-fake = Faker()
+# Faker locale of columns that do not name one, e.g. 'de_DE'; unset uses Faker's default (en_US)
+FAKER_LOCALE = os.environ.get("EXCELWIZARD_FAKER_LOCALE") or None
+
+@functools.lru_cache(maxsize=None)
+def get_faker(locale=None):
+    """Faker instance of a locale, created on first use: importing Faker and loading a locale's providers is slow."""
+    from faker import Faker
+
+    locale = locale or FAKER_LOCALE
+    try:
+        return Faker(locale)
+    except AttributeError:
+        raise ValueError(f"Unknown Faker locale '{locale}'.")
 
 # Mapping of human-readable column names to Faker method names
 column_to_method_map = {
@@ -35,53 +53,256 @@ column_to_method_map = {
     # Add more mappings as necessary
 }
 
-def is_numeric_type(column_type):
-    """Check if the column type is numeric (integer, float, etc.)."""
-    try:
-        # Normalize the column_type to lowercase
-        column_type = column_type.lower()
+# Faker values generated per text column; longer columns are sampled from this pool
+POOL_SIZE = 10000
 
-        # Define common numeric types
-        numeric_types = ['int', 'integer', 'float', 'double', 'decimal', 'numeric']
+# Rows per generated chunk when writing straight to disk
+DEFAULT_CHUNK_ROWS = 100000
 
-        # Check if the column_type is one of the common numeric types
-        if column_type in numeric_types:
-            return True
+# Output formats generate_to_file can stream to
+STREAMING_FORMATS = ('.csv', '.xlsx', '.parquet')
 
-    except Exception:
-        return False
+# Lowercase hex digits, for formatting UUIDs
+HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
 
-def generate_dummy_data(num_rows, column_info):
-    """Generates dummy data for the specified number of rows and given column info."""
-    data = {}
+def generate_uuids(rng, num_rows):
+    """Random version 4 UUID strings."""
+    raw = rng.integers(0, 256, size=(num_rows, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # Version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+
+    digits = np.empty((num_rows, 32), dtype=np.uint8)
+    digits[:, 0::2] = HEX_DIGITS[raw >> 4]
+    digits[:, 1::2] = HEX_DIGITS[raw & 0x0F]
+    text = np.insert(digits, [8, 12, 16, 20], ord('-'), axis=1)
+    return text.view('S36').ravel().astype(str).astype(object)
+
+def generate_dates(rng, num_rows, start, end):
+    """Random dates between two numpy datetime64 days, both included."""
+    days = rng.integers(0, (end - start).astype(int) + 1, num_rows)
+    return start + days.astype('timedelta64[D]')
+
+# Every 'HH:MM:SS' of a day, indexed by the second
+TIMES_OF_DAY = np.array([f"{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}" for second in range(86400)], dtype=object)
+
+def generate_times(rng, num_rows):
+    """Random 'HH:MM:SS' strings, like Faker's time()."""
+    return TIMES_OF_DAY[rng.integers(0, 86400, num_rows)]
+
+def today():
+    return np.datetime64('today', 'D')
 
-    # Loop through the column names and dynamically call the appropriate Faker method
+# Faker methods that NumPy generates directly, with the same value ranges as Faker's defaults
+vectorized_methods = {
+    'uuid4': generate_uuids,
+    'boolean': lambda rng, num_rows: rng.random(num_rows) < 0.5,
+    'date_this_century': lambda rng, num_rows: generate_dates(rng, num_rows, np.datetime64('2000-01-01'), today()),
+    'date_of_birth': lambda rng, num_rows: generate_dates(rng, num_rows, today() - np.timedelta64(115 * 365 + 28, 'D'), today()),
+    'time': generate_times,
+}
+
+def column_seed(seed, column_name):
+    """Seed of one column, derived from the run seed and the column name so it does not depend on column order."""
+    return int(np.random.SeedSequence([seed, zlib.crc32(column_name.encode())]).generate_state(1)[0])
+
+def faker_pool(method_name, size, seed, locale=None):
+    """Call a Faker method `size` times from a seeded state."""
+    fake = get_faker(locale)
+    fake.seed_instance(seed)
+    method = getattr(fake, method_name)
+    return [method() for _ in range(size)]
+
+# Column type names, including common SQL and pandas spellings
+INTEGER_TYPES = ('int', 'integer', 'bigint', 'smallint', 'tinyint', 'mediumint', 'serial', 'bigserial', 'long',
+                 'int8', 'int16', 'int32', 'int64', 'uint8', 'uint16', 'uint32', 'uint64')
+FLOAT_TYPES = ('float', 'double', 'double_precision', 'decimal', 'numeric', 'number', 'real', 'money',
+               'float16', 'float32', 'float64')
+
+def base_type(column_type):
+    """Split a type name such as 'decimal(10,2)' or 'double precision' into ('decimal', [10, 2]) or ('double_precision', [])."""
+    match = re.match(r'^\s*([a-zA-Z0-9_ ]+?)\s*(?:\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\))?\s*$', str(column_type))
+    if not match:
+        return None, []
+    return re.sub(r'\s+', '_', match.group(1).lower()), [int(value) for value in match.groups()[1:] if value is not None]
+
+def is_numeric_type(column_type):
+    """Check if the column type is numeric (integer, float, etc.)."""
+    name, _ = base_type(column_type)
+    return name in INTEGER_TYPES or name in FLOAT_TYPES
+
+def plan_columns(column_info):
+    """Decide once how every column is generated, as {column: (kind, Faker method)}.
+
+    Columns with an invalid type name are logged and left out.
+    """
+    plan = {}
     for column_name, column_type in column_info.items():
         try:
-            # Check if the column type name contains only valid characters (alphanumeric or underscores)
-            if not re.match(r'^[a-zA-Z0-9_]+$', column_type):
+            # Check if the column type name contains only valid characters (alphanumeric, underscores and an optional size)
+            if base_type(column_type)[0] is None:
                 raise ValueError(f"Invalid characters found in column type name '{column_type}' for column '{column_name}'.")
 
             # Normalize column name to check in our column_to_method_map
             method_name = column_to_method_map.get(column_name.lower(), None)
 
-            if method_name:
-                method = getattr(fake, method_name)  # Get the corresponding Faker method
-                # Generate the corresponding values using the method
-                data[column_name] = [method() for _ in range(num_rows)]
+            if method_name in vectorized_methods:
+                plan[column_name] = ('vectorized', method_name)
+            elif method_name:
+                plan[column_name] = ('faker', method_name)
             elif is_numeric_type(column_type):  # Handle numeric types dynamically
-                print(f"Warning: No specific rule for column '{column_name}'. Using random numbers.")
-                data[column_name] = [random.randint(1, 1000) for _ in range(num_rows)]  # Random integers as default
+                common.log_message(f"No specific rule for column '{column_name}'. Using random numbers.", level='warning')
+                plan[column_name] = ('integers', None)  # Random integers as default
             else:
-                print(f"Warning: No specific rule for column '{column_name}'. Using random words as default.")
-                data[column_name] = [fake.word() for _ in range(num_rows)]  # Random words as fallback
+                common.log_message(f"No specific rule for column '{column_name}'. Using random words as default.", level='warning')
+                plan[column_name] = ('faker', 'word')  # Random words as fallback
 
         except ValueError as e:
-            print(f"Error: {e}")  # Log the invalid column type error
+            common.log_message(str(e), level='error')  # Log the invalid column type error
             continue  # Skip the invalid column and continue with the next
 
+    return plan
+
+def resolve_seed(seed, num_rows):
+    """Pick and log a seed when none is given, so every run can be reproduced."""
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+    common.log_message(f"Generating {num_rows} rows with seed {seed}")
+    return seed
+
+def build_pools(plan, num_rows, seed, seeds=None, pool_size=POOL_SIZE, workers=1):
+    """Generate the Faker values of every Faker column: one per row up to `pool_size` rows, otherwise a pool to sample from.
+
+    With several workers the columns are filled in parallel processes.
+    """
+    seeds = seeds or {}
+    columns = [column_name for column_name, (kind, _) in plan.items() if kind == 'faker']
+    arguments = (
+        [plan[column_name][1] for column_name in columns],
+        [min(num_rows, pool_size)] * len(columns),
+        [seeds.get(column_name, column_seed(seed, column_name)) for column_name in columns],
+    )
+    if workers > 1 and len(columns) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(columns))) as executor:
+            return dict(zip(columns, executor.map(faker_pool, *arguments)))
+    return dict(zip(columns, map(faker_pool, *arguments)))
+
+def generate_columns(plan, num_rows, seed, seeds=None, pools=None, chunk=None):
+    """Generate the columns of a plan in vectorized steps.
+
+    A `chunk` number gives each chunk of a larger table its own random stream, derived from the
+    column seed, so chunks can be generated independently and in any order.
+    """
+    seeds = seeds or {}
+    data = {}
+    for column_name, (kind, method_name) in plan.items():
+        column_rng_seed = seeds.get(column_name, column_seed(seed, column_name))
+        rng = np.random.default_rng(column_rng_seed if chunk is None else [column_rng_seed, chunk])
+
+        if kind == 'vectorized':
+            data[column_name] = vectorized_methods[method_name](rng, num_rows)
+        elif kind == 'integers':
+            data[column_name] = rng.integers(1, 1001, num_rows)
+        else:
+            pool = pools[column_name]
+            if chunk is None and len(pool) == num_rows:
+                data[column_name] = pool  # One Faker value per row
+            else:
+                distinct = pd.unique(np.array(pool, dtype=object))
+                data[column_name] = distinct[rng.integers(0, len(distinct), num_rows)]
     return pd.DataFrame(data)
 
+@instrumentation.instrumented("generate", measure=lambda dataframe, *args, **kwargs: (len(dataframe), instrumentation.frame_size(dataframe)))
+def generate_dummy_data(num_rows, column_info, seed=None, seeds=None, pool_size=POOL_SIZE):
+    """Generates dummy data for the specified number of rows and given column info.
+
+    Every column has its own seed, derived from `seed` and the column name unless given in `seeds`,
+    so the same seed always produces the same data. Without a seed one is picked and logged.
+    """
+    seed = resolve_seed(seed, num_rows)
+    plan = plan_columns(column_info)
+    return generate_columns(plan, num_rows, seed, seeds, build_pools(plan, num_rows, seed, seeds, pool_size))
+
+# Generation settings of a worker process, set once by init_generator_worker
+_worker_settings = {}
+
+def init_generator_worker(plan, seed, seeds, pools):
+    """Give a worker process the column plan and Faker pools, so chunks only carry their number and size."""
+    common.HEADLESS = True
+    _worker_settings.update(plan=plan, seed=seed, seeds=seeds, pools=pools)
+
+def generate_chunk(chunk, num_rows, as_csv=False):
+    """Generate one chunk in a worker process; CSV chunks are also formatted there, so the writer only copies text."""
+    frame = generate_columns(_worker_settings["plan"], num_rows, _worker_settings["seed"], _worker_settings["seeds"], _worker_settings["pools"], chunk)
+    if as_csv:
+        return num_rows, frame.to_csv(index=False, header=chunk in (0, None))
+    return num_rows, frame
+
+def iter_chunks(plan, num_rows, seed, seeds, pools, chunk_rows, workers, as_csv=False):
+    """Generate chunks across a process pool and yield them in order, keeping only a few in flight.
+
+    A table that fits in one chunk is generated exactly like generate_dummy_data would.
+    """
+    chunks = [(chunk, min(chunk_rows, num_rows - start)) for chunk, start in enumerate(range(0, num_rows, chunk_rows))]
+    if len(chunks) == 1:
+        chunks = [(None, num_rows)]
+    if workers == 1:
+        init_generator_worker(plan, seed, seeds, pools)
+        for chunk, rows in chunks:
+            yield generate_chunk(chunk, rows, as_csv)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_generator_worker, initargs=(plan, seed, seeds, pools)) as executor:
+        pending = deque()
+        for chunk, rows in chunks:
+            pending.append(executor.submit(generate_chunk, chunk, rows, as_csv))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def generate_to_file(num_rows, column_info, output_file, seed=None, seeds=None, chunk_rows=DEFAULT_CHUNK_ROWS, workers=None, pool_size=POOL_SIZE, progress=None):
+    """Generate a table chunk by chunk across a process pool and write it to CSV, XLSX or Parquet as it is produced.
+
+    Memory holds a few chunks, not the table. Each chunk has its own random streams derived from the
+    seed and its position, so the same seed and chunk size give the same file whatever the number of
+    workers. `progress` is called after every chunk with the rows written and the rows per second.
+    """
+    extension = os.path.splitext(output_file)[1].lower()
+    if extension not in STREAMING_FORMATS:
+        raise ValueError(f"Unsupported file format '{extension}'. Please use {', '.join(STREAMING_FORMATS)}.")
+    if num_rows < 1:
+        raise ValueError("The number of rows must be at least 1.")
+
+    seed = resolve_seed(seed, num_rows)
+    plan = plan_columns(column_info)
+    if not plan:
+        raise ValueError("No valid columns to generate.")
+    workers = workers or os.cpu_count()
+    start = time.perf_counter()
+    stats = {"rows": 0, "rows_per_second": 0.0, "seconds": 0.0}
+    pools = build_pools(plan, num_rows, seed, seeds, pool_size, workers)
+
+    def counted(chunks):
+        for rows, chunk in chunks:
+            yield chunk
+            stats["rows"] += rows
+            stats["seconds"] = round(time.perf_counter() - start, 3)
+            stats["rows_per_second"] = round(stats["rows"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+            common.log_message(f"Generated {stats['rows']} of {num_rows} rows ({stats['rows_per_second']:.0f} rows/s)")
+            if progress:
+                progress(dict(stats))
+
+    chunks = counted(iter_chunks(plan, num_rows, seed, seeds, pools, chunk_rows, workers, as_csv=extension == '.csv'))
+    if extension == '.csv':
+        with open(output_file, 'w', newline='', encoding='utf-8') as handle:
+            for text in chunks:
+                handle.write(text)
+    else:
+        streaming_io.write_batches(chunks, output_file)
+
+    common.log_message(f"Generated {stats['rows']} records and saved to {output_file} in {stats['seconds']}s ({stats['rows_per_second']:.0f} rows/s).", level='info')
+    return dict(stats, seed=seed, output=output_file)
+
 def save_to_file(df):
     """Prompts the user to save the DataFrame to a specified file format using common functions."""
     filename, filetype = common.save_file_dialog("Save Dummy Data")  # Prompt for filename and type
@@ -0,0 +1,493 @@
+#schema_gen_gui.py
+
+import pandas as pd
+import numpy as np
+import common_code_gui as common
+import streaming_io
+from sample_file_gen_gui import (
+    get_faker, column_to_method_map, vectorized_methods, column_seed, faker_pool, resolve_seed, base_type,
+    generate_uuids, generate_dates, INTEGER_TYPES, FLOAT_TYPES, POOL_SIZE,
+)
+from tkinter import filedialog
+import json
+import os
+import time
+
+# Type names of the schema file besides the numeric ones, mapped to the kind of generator
+TYPE_KINDS = {
+    'bool': 'boolean', 'boolean': 'boolean',
+    'date': 'date', 'datetime': 'datetime', 'timestamp': 'datetime',
+    'uuid': 'uuid', 'guid': 'uuid',
+    'string': 'string', 'str': 'string', 'varchar': 'string', 'char': 'string',
+    'choice': 'choice', 'category': 'choice', 'enum': 'choice',
+    'foreign_key': 'foreign_key', 'reference': 'foreign_key',
+    'faker': 'faker',
+}
+
+DISTRIBUTIONS = ('uniform', 'normal', 'lognormal', 'exponential', 'poisson', 'zipf')
+
+# Characters of random 'string' columns
+STRING_ALPHABET = np.frombuffer(b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789', dtype=np.uint8)
+
+# Times duplicates are redrawn for a unique column before giving up
+UNIQUE_ATTEMPTS = 10
+
+def load_schema(schema_file):
+    """Load and check a JSON or YAML schema file: a mapping with 'tables' and optionally 'seed' and 'versions'."""
+    with open(schema_file, encoding="utf-8") as handle:
+        if schema_file.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("PyYAML is required to read YAML schema files (pip install pyyaml).")
+            schema = yaml.safe_load(handle)
+        else:
+            schema = json.load(handle)
+    return check_schema(schema)
+
+def check_schema(schema):
+    """Validate a schema and normalize shorthand column types ('name: int') into column specs."""
+    if not isinstance(schema, dict) or not isinstance(schema.get("tables"), dict) or not schema["tables"]:
+        raise ValueError("Schema must contain a 'tables' mapping.")
+
+    for table_name, table in schema["tables"].items():
+        if not isinstance(table, dict) or not isinstance(table.get("columns"), dict) or not table["columns"]:
+            raise ValueError(f"Table '{table_name}' must have a 'columns' mapping.")
+        if not isinstance(table.get("rows"), int) or table["rows"] < 0:
+            raise ValueError(f"Table '{table_name}' must have a non-negative number of 'rows'.")
+        for column_name, spec in list(table["columns"].items()):
+            if isinstance(spec, str):
+                spec = table["columns"][column_name] = {"type": spec}
+            if not isinstance(spec, dict):
+                raise ValueError(f"Column '{table_name}.{column_name}' must be a type name or a mapping.")
+            if schema.get("locale"):
+                spec.setdefault("locale", schema["locale"])  # Faker columns use the schema's locale unless they name their own
+            column_kind(table_name, column_name, spec)  # Raises on unknown types
+            if spec.get("distribution", "uniform") not in DISTRIBUTIONS:
+                raise ValueError(f"Unknown distribution '{spec['distribution']}' for '{table_name}.{column_name}'. Expected one of: {', '.join(DISTRIBUTIONS)}.")
+            if not 0 <= spec.get("null_ratio", 0) <= 1:
+                raise ValueError(f"null_ratio of '{table_name}.{column_name}' must be between 0 and 1.")
+            if "references" in spec:
+                parent_table, parent_column = parse_reference(spec["references"])
+                if parent_column not in schema["tables"].get(parent_table, {}).get("columns", {}):
+                    raise ValueError(f"Column '{table_name}.{column_name}' references unknown column '{spec['references']}'.")
+
+    versions = schema.get("versions") or {}
+    if not isinstance(versions, dict):
+        raise ValueError("'versions' must be a mapping of version names to their settings.")
+    for version_name, version in versions.items():
+        table = schema["tables"].get(version.get("table"))
+        if table is None:
+            raise ValueError(f"Version '{version_name}' must name one of the tables in 'table'.")
+        for key in key_list(version.get("key")):
+            if key not in table["columns"]:
+                raise ValueError(f"Key column '{key}' of version '{version_name}' is not a column of '{version['table']}'.")
+        if not key_list(version.get("key")):
+            raise ValueError(f"Version '{version_name}' must give its 'key' column(s).")
+    generation_order(schema["tables"])  # Raises on circular references
+    return schema
+
+def key_list(key):
+    """A key given as one column name or a list of names, as a list."""
+    if key is None:
+        return []
+    return [key] if isinstance(key, str) else list(key)
+
+def parse_reference(reference):
+    """Split a 'table.column' reference."""
+    table_name, _, column_name = str(reference).rpartition('.')
+    if not table_name or not column_name:
+        raise ValueError(f"Reference '{reference}' must be given as table.column.")
+    return table_name, column_name
+
+def parse_fraction(value, name):
+    """A share of rows given as a fraction (0.05) or a percentage string ('5%')."""
+    if isinstance(value, str) and value.strip().endswith('%'):
+        value = float(value.strip()[:-1]) / 100
+    value = float(value or 0)
+    if not 0 <= value <= 1:
+        raise ValueError(f"'{name}' must be between 0 and 1 (or 0% and 100%).")
+    return value
+
+def column_kind(table_name, column_name, spec):
+    """Decide how a column is generated: ('integer'|'float'|..., Faker method or None)."""
+    if "references" in spec:
+        return 'foreign_key', None
+
+    type_name, _ = base_type(spec.get("type", column_name))
+    if type_name in INTEGER_TYPES:
+        return 'integer', None
+    if type_name in FLOAT_TYPES:
+        return 'float', None
+    kind = TYPE_KINDS.get(type_name)
+    if kind == 'faker':
+        type_name = spec.get("method")
+    elif kind == 'foreign_key':
+        raise ValueError(f"Column '{table_name}.{column_name}' must give the 'references' it points to.")
+    elif kind == 'choice' and not spec.get("values"):
+        raise ValueError(f"Column '{table_name}.{column_name}' must list its 'values'.")
+    elif kind:
+        return kind, None
+
+    # Anything else is a Faker method, by name or through the sample data column names
+    method_name = column_to_method_map.get(type_name, type_name)
+    if method_name in vectorized_methods:
+        return 'vectorized', method_name
+    if method_name and not method_name.startswith('_') and callable(getattr(get_faker(spec.get("locale")), method_name, None)):
+        return 'faker', method_name
+    raise ValueError(f"Unknown type '{spec.get('type')}' for column '{table_name}.{column_name}'.")
+
+def generation_order(tables):
+    """Order the tables so that every table comes after the tables its foreign keys reference."""
+    order, visiting = [], set()
+
+    def visit(table_name):
+        if table_name in order:
+            return
+        if table_name in visiting:
+            raise ValueError(f"Foreign keys form a cycle through table '{table_name}'.")
+        visiting.add(table_name)
+        for spec in tables[table_name]["columns"].values():
+            if "references" in spec:
+                visit(parse_reference(spec["references"])[0])
+        visiting.discard(table_name)
+        order.append(table_name)
+
+    for table_name in tables:
+        visit(table_name)
+    return order
+
+def generate_numbers(spec, num_rows, rng, integer):
+    """Numbers between 'min' and 'max' following the column's distribution.
+
+    Unique integers without a 'max' are a sequence starting at 'min', like an identity column.
+    """
+    _, size = base_type(spec.get("type", ""))
+    low = spec.get("min", 1 if integer else 0.0)
+    high = spec.get("max")
+    if integer and spec.get("unique"):
+        if high is None:
+            return np.arange(low, low + num_rows, dtype=np.int64)
+        if high - low + 1 < num_rows:
+            raise ValueError(f"Cannot draw {num_rows} unique integers between {low} and {high}.")
+        return low + rng.choice(high - low + 1, num_rows, replace=False)
+
+    high = 1000 if high is None else high
+    distribution = spec.get("distribution", "uniform")
+    if distribution == 'uniform':
+        values = rng.integers(low, high + 1, num_rows) if integer else rng.uniform(low, high, num_rows)
+    elif distribution == 'normal':
+        values = rng.normal(spec.get("mean", (low + high) / 2), spec.get("std", (high - low) / 6), num_rows)
+    elif distribution == 'lognormal':
+        values = low + rng.lognormal(spec.get("mean", 0.0), spec.get("sigma", 1.0), num_rows) * spec.get("scale", 1.0)
+    elif distribution == 'exponential':
+        values = low + rng.exponential(spec.get("scale", (high - low) / 10), num_rows)
+    elif distribution == 'poisson':
+        values = low + rng.poisson(spec.get("lam", (high - low) / 10), num_rows)
+    else:
+        values = low - 1 + rng.zipf(spec.get("a", 2.0), num_rows)
+
+    values = np.clip(values, low, high)
+    if integer:
+        return np.rint(values).astype(np.int64)
+    decimals = spec.get("decimals", size[1] if len(size) == 2 else None)
+    return values if decimals is None else np.round(values, decimals)
+
+def generate_strings(spec, num_rows, rng):
+    """Random alphanumeric strings of a fixed 'length' (at most the size of a varchar(n)), with an optional 'prefix'."""
+    _, size = base_type(spec.get("type", ""))
+    length = spec.get("length", min(size[0], 8) if size else 8)
+    codes = rng.integers(0, len(STRING_ALPHABET), size=(num_rows, length))
+    values = STRING_ALPHABET[codes].view(f'S{length}').ravel().astype(str)
+    if spec.get("prefix"):
+        values = np.char.add(str(spec["prefix"]), values)
+    return values.astype(object)
+
+def parse_day(value, default):
+    """A numpy day from an ISO date string (or a date parsed by YAML)."""
+    return np.datetime64(str(value)[:10], 'D') if value is not None else default
+
+def distinct_positions(rng, population, num_rows, name, probabilities=None):
+    """Positions of `num_rows` different items out of `population`."""
+    if num_rows > population:
+        raise ValueError(f"Column '{name}' has only {population} possible values for {num_rows} unique rows.")
+    return rng.choice(population, num_rows, replace=False, p=probabilities)
+
+def value_drawer(table_name, column_name, spec, seed, tables, salt=''):
+    """Return draw(num_rows) for one column, without nulls.
+
+    Every column has its own random stream derived from the seed and its qualified name, so tables
+    and columns can be added or reordered without changing the others. `salt` gives independent
+    streams for the rows added or changed in a version of a table.
+    """
+    kind, method_name = column_kind(table_name, column_name, spec)
+    stream_seed = column_seed(seed, f"{table_name}.{column_name}{salt}")
+    rng = np.random.default_rng(stream_seed)
+
+    if kind in ('integer', 'float'):
+        return lambda num_rows: generate_numbers(spec, num_rows, rng, kind == 'integer')
+    if kind == 'boolean':
+        return lambda num_rows: rng.random(num_rows) < spec.get("probability", 0.5)
+    if kind == 'date':
+        start, end = parse_day(spec.get("start"), np.datetime64('2000-01-01')), parse_day(spec.get("end"), np.datetime64('today', 'D'))
+        return lambda num_rows: generate_dates(rng, num_rows, start, end)
+    if kind == 'datetime':
+        start = parse_day(spec.get("start"), np.datetime64('2000-01-01')).astype('datetime64[s]')
+        end = parse_day(spec.get("end"), np.datetime64('today', 'D')).astype('datetime64[s]') + np.timedelta64(86399, 's')
+        return lambda num_rows: start + rng.integers(0, (end - start).astype(int) + 1, num_rows).astype('timedelta64[s]')
+    if kind == 'uuid':
+        return lambda num_rows: generate_uuids(rng, num_rows)
+    if kind == 'string':
+        return lambda num_rows: generate_strings(spec, num_rows, rng)
+    if kind == 'choice':
+        values = np.array(spec["values"], dtype=object)
+        weights = np.asarray(spec["weights"], dtype=float) if spec.get("weights") else None
+        probabilities = None if weights is None else weights / weights.sum()
+        if spec.get("unique"):
+            return lambda num_rows: values[distinct_positions(rng, len(values), num_rows, f"{table_name}.{column_name}", probabilities)]
+        return lambda num_rows: rng.choice(values, num_rows, p=probabilities)
+    if kind == 'foreign_key':
+        parent_table, parent_column = parse_reference(spec["references"])
+        parents = pd.unique(tables[parent_table][parent_column].dropna())
+        if not len(parents):
+            raise ValueError(f"Column '{table_name}.{column_name}' references '{spec['references']}', which has no values.")
+        if spec.get("unique"):
+            return lambda num_rows: parents[distinct_positions(rng, len(parents), num_rows, f"{table_name}.{column_name}")]
+        if spec.get("skew"):  # A few parents get most of the rows, like customers and their orders
+            return lambda num_rows: parents[(rng.zipf(spec["skew"], num_rows) - 1) % len(parents)]
+        return lambda num_rows: parents[rng.integers(0, len(parents), num_rows)]
+    if kind == 'vectorized':
+        return lambda num_rows: vectorized_methods[method_name](rng, num_rows)
+
+    if spec.get("unique"):  # Distinct values need one Faker call per row
+        fake = get_faker(spec.get("locale"))
+        fake.seed_instance(stream_seed)
+        method = getattr(fake, method_name)
+        return lambda num_rows: np.array([method() for _ in range(num_rows)], dtype=object)
+    pool = []
+
+    def draw_faker(num_rows):
+        if not pool:
+            pool.append(pd.unique(np.array(faker_pool(method_name, min(num_rows, POOL_SIZE), stream_seed, spec.get("locale")), dtype=object)))
+        return pool[0][rng.integers(0, len(pool[0]), num_rows)]
+    return draw_faker
+
+def draw_unique(draw, num_rows, name):
+    """Draw values and redraw the duplicates until all are distinct."""
+    values = pd.Series(draw(num_rows))
+    for _ in range(UNIQUE_ATTEMPTS):
+        duplicated = values.duplicated().to_numpy()
+        if not duplicated.any():
+            return values
+        values[duplicated] = draw(int(duplicated.sum()))
+    raise ValueError(f"Could not generate {num_rows} distinct values for unique column '{name}'; widen its range or drop 'unique'.")
+
+def add_nulls(values, null_ratio, rng):
+    """Blank out about `null_ratio` of the values, keeping integer and boolean columns in nullable dtypes."""
+    values = pd.Series(values)
+    if not null_ratio:
+        return values
+    if pd.api.types.is_bool_dtype(values):
+        values = values.astype('boolean')
+    elif pd.api.types.is_integer_dtype(values):
+        values = values.astype('Int64')
+    return values.mask(rng.random(len(values)) < null_ratio)
+
+def generate_column(table_name, column_name, spec, num_rows, seed, tables, salt=''):
+    """Generate one column: draw its values, make them unique if required, then add nulls."""
+    draw = value_drawer(table_name, column_name, spec, seed, tables, salt)
+    if spec.get("unique"):
+        values = draw_unique(draw, num_rows, f"{table_name}.{column_name}")
+    else:
+        values = pd.Series(draw(num_rows))
+    null_rng = np.random.default_rng([column_seed(seed, f"{table_name}.{column_name}{salt}"), 1])
+    return add_nulls(values, spec.get("null_ratio", 0), null_rng)
+
+def generate_table(table_name, table, num_rows, seed, tables, salt=''):
+    """Generate the rows of one table; `tables` holds the tables its foreign keys reference."""
+    return pd.DataFrame({
+        column_name: generate_column(table_name, column_name, spec, num_rows, seed, tables, salt)
+        for column_name, spec in table["columns"].items()
+    })
+
+def shifted_values(values, column):
+    """Values guaranteed to differ from `values`; unique columns stay unique by moving past the column's range."""
+    if pd.api.types.is_bool_dtype(column):
+        return ~values.astype(bool)
+    if pd.api.types.is_numeric_dtype(column):
+        return values + (column.max() - column.min() + 1)
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return values + (column.max() - column.min() + pd.Timedelta(days=1))
+    return values.astype(str) + "_v2"
+
+def changed_values(table_name, column_name, spec, old, column, seed, tables):
+    """New values for changed cells: redrawn from the column's spec, and never equal to the old ones."""
+    old = old.reset_index(drop=True)
+    kind, _ = column_kind(table_name, column_name, spec)
+    if spec.get("unique") and kind != 'foreign_key':
+        return shifted_values(old, column)
+
+    draw = value_drawer(table_name, column_name, spec, seed, tables, salt='#changed')
+    new = pd.Series(draw(len(old)), dtype=column.dtype if column.dtype != object else None)
+    for _ in range(UNIQUE_ATTEMPTS):  # Redraw the values that came out the same, e.g. a boolean's
+        same = (new == old).fillna(False).to_numpy(dtype=bool)
+        if not same.any():
+            return new
+        new[same] = draw(int(same.sum()))
+    same = (new == old).fillna(False).to_numpy(dtype=bool)
+    new[same] = shifted_values(old[same], column).to_numpy()
+    return new
+
+def change_records(frame, keys, rows, change, column=None, old=None, new=None):
+    """Rows of the change list: the key values, the kind of change and, for updates, the cell before and after."""
+    records = frame.iloc[rows][keys].reset_index(drop=True)
+    records["change"] = change
+    records["column"] = column
+    records["old_value"] = None if old is None else pd.Series(old, dtype=object).to_numpy()
+    records["new_value"] = None if new is None else pd.Series(new, dtype=object).to_numpy()
+    return records
+
+def make_version(frame, table_name, table, keys, seed, tables, changed=0.0, added=0.0, deleted=0.0, columns=None):
+    """Derive a second version of a table with a controlled share of changed, added and deleted rows.
+
+    Changed rows get one new value in one of `columns` (all non-key columns by default). Added rows
+    are generated from the table's spec with keys that do not exist yet; integer keys continue after
+    the highest one. Returns the new version and the list of changes, one row per change.
+    """
+    rng = np.random.default_rng(column_seed(seed, f"{table_name}#version"))
+    num_rows = len(frame)
+    changed_count, deleted_count, added_count = round(num_rows * changed), round(num_rows * deleted), round(num_rows * added)
+    if changed_count + deleted_count > num_rows:
+        raise ValueError(f"Cannot change and delete more rows than '{table_name}' has.")
+    columns = list(columns or [column_name for column_name in frame.columns if column_name not in keys])
+    for column_name in columns:
+        if column_name not in frame.columns or column_name in keys:
+            raise ValueError(f"Cannot change column '{column_name}' of '{table_name}'; it is a key or does not exist.")
+    if changed_count and not columns:
+        raise ValueError(f"Table '{table_name}' has no columns to change besides its key.")
+
+    shuffled = rng.permutation(num_rows)
+    deleted_rows = np.sort(shuffled[:deleted_count])
+    changed_rows = np.sort(shuffled[deleted_count:deleted_count + changed_count])
+    changed_columns = rng.integers(0, max(len(columns), 1), changed_count)
+
+    version = frame.copy()
+    changes = [change_records(frame, keys, deleted_rows, 'deleted')]
+    for position, column_name in enumerate(columns):
+        rows = changed_rows[changed_columns == position]
+        if not len(rows):
+            continue
+        old = frame[column_name].iloc[rows]
+        new = changed_values(table_name, column_name, table["columns"][column_name], old, frame[column_name], seed, tables)
+        if version[column_name].dtype == bool:
+            version[column_name] = version[column_name].astype(object)
+        version.iloc[rows, version.columns.get_loc(column_name)] = new.to_numpy()
+        changes.append(change_records(frame, keys, rows, 'changed', column_name, old, new))
+    version = version.drop(index=frame.index[deleted_rows])
+
+    if added_count:
+        extra = generate_table(table_name, table, added_count, seed, tables, salt='#added')
+        if len(keys) == 1 and pd.api.types.is_integer_dtype(frame[keys[0]]):
+            extra[keys[0]] = np.arange(1, added_count + 1) + (int(frame[keys[0]].max()) if num_rows else 0)
+        else:  # Drop the rare generated keys that already exist
+            existing = pd.MultiIndex.from_frame(frame[keys])
+            new_keys = pd.MultiIndex.from_frame(extra[keys])
+            extra = extra[~(new_keys.isin(existing) | new_keys.duplicated())]
+            if len(extra) < added_count:
+                common.log_message(f"Added {len(extra)} instead of {added_count} rows to '{table_name}'; the other generated keys already existed.", level='warning')
+        changes.append(change_records(extra, keys, np.arange(len(extra)), 'added'))
+        version = pd.concat([version, extra.astype(version.dtypes.to_dict(), errors='ignore')], ignore_index=True)
+
+    return version.reset_index(drop=True), pd.concat(changes, ignore_index=True)
+
+def write_table(frame, output_file):
+    """Write a generated table to CSV, XLSX or Parquet."""
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    if output_file.lower().endswith('.csv'):
+        frame.to_csv(output_file, index=False)
+    else:
+        streaming_io.write_batches(streaming_io.iter_frame_batches(frame), output_file)
+
+def generate_from_schema(schema, output_dir=None, seed=None):
+    """Generate every table of a schema (a schema file or a loaded schema) and the versions it describes.
+
+    Tables are generated in foreign-key order, so foreign keys only hold values of the referenced
+    column. Outputs are written next to the schema file unless `output_dir` is given; a table whose
+    'output' is null is only generated for the tables that reference it. The run seed comes from
+    `seed`, then the schema's 'seed', and is otherwise picked and logged.
+    """
+    if isinstance(schema, str):
+        output_dir = output_dir or os.path.dirname(os.path.abspath(schema))
+        schema = load_schema(schema)
+    else:
+        schema = check_schema(schema)
+    output_dir = output_dir or os.getcwd()
+    versions = schema.get("versions") or {}
+    seed = resolve_seed(seed if seed is not None else schema.get("seed"), sum(table["rows"] for table in schema["tables"].values()))
+
+    referenced = {}  # Columns other tables reference, kept after a table is written
+    for table in schema["tables"].values():
+        for spec in table["columns"].values():
+            if "references" in spec:
+                parent_table, parent_column = parse_reference(spec["references"])
+                referenced.setdefault(parent_table, set()).add(parent_column)
+    versioned = {version["table"] for version in versions.values()}
+
+    start = time.perf_counter()
+    tables, summary = {}, {"seed": seed, "tables": {}, "versions": {}}
+    for table_name in generation_order(schema["tables"]):
+        table = schema["tables"][table_name]
+        table_start = time.perf_counter()
+        frame = generate_table(table_name, table, table["rows"], seed, tables)
+        output_file = table.get("output", f"{table_name}.csv")
+        if output_file:
+            output_file = os.path.join(output_dir, output_file)
+            write_table(frame, output_file)
+        tables[table_name] = frame if table_name in versioned else frame[sorted(referenced.get(table_name, ()))]
+        summary["tables"][table_name] = {"rows": len(frame), "output": output_file, "seconds": round(time.perf_counter() - table_start, 3)}
+        common.log_message(f"Generated {len(frame)} rows of '{table_name}' in {summary['tables'][table_name]['seconds']}s")
+
+    for version_name, version in versions.items():
+        table_name, keys = version["table"], key_list(version["key"])
+        frame, changes = make_version(
+            tables[table_name], table_name, schema["tables"][table_name], keys, seed, tables,
+            changed=parse_fraction(version.get("changed"), "changed"), added=parse_fraction(version.get("added"), "added"),
+            deleted=parse_fraction(version.get("deleted"), "deleted"), columns=version.get("columns"),
+        )
+        output_file = os.path.join(output_dir, version.get("output", f"{version_name}.csv"))
+        write_table(frame, output_file)
+        changes_output = version.get("changes_output")
+        if changes_output:
+            changes_output = os.path.join(output_dir, changes_output)
+            write_table(changes, changes_output)
+        counts = changes["change"].value_counts()
+        summary["versions"][version_name] = {
+            "table": table_name, "rows": len(frame), "output": output_file, "changes_output": changes_output,
+            **{change: int(counts.get(change, 0)) for change in ('changed', 'added', 'deleted')},
+        }
+        common.log_message(f"Generated version '{version_name}' of '{table_name}': {summary['versions'][version_name]}")
+
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    return summary
+
+def ask_schema_files():
+    """Ask for a schema file and the folder receiving the generated files."""
+    schema_file = filedialog.askopenfilename(title="Select Schema File", filetypes=[("Schema files", "*.json *.yaml *.yml")])
+    if not schema_file:
+        raise ValueError("No schema file selected.")
+    output_dir = filedialog.askdirectory(title="Select the folder for the generated files")
+    if not output_dir:
+        raise ValueError("No output folder selected.")
+    return schema_file, output_dir
+
+def generate_and_report(schema_file, output_dir):
+    """Generate the tables of a schema file and show what was written."""
+    summary = generate_from_schema(schema_file, output_dir)
+    lines = [f"{name}: {details['rows']} rows" for name, details in summary["tables"].items()]
+    lines += [f"{name}: {details['rows']} rows ({details['changed']} changed, {details['added']} added, {details['deleted']} deleted)"
+              for name, details in summary["versions"].items()]
+    common.display_message(f"Generated with seed {summary['seed']} into {output_dir}:\n" + "\n".join(lines), status="success")
+
+def schema_generation_ops():
+    """Ask for a schema file and an output folder, then generate the tables it describes."""
+    generate_and_report(*ask_schema_files())
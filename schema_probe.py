@@ -0,0 +1,191 @@
+#schema_probe.py
+
+import pandas as pd
+import common_code_gui as common
+import instrumentation
+import streaming_io
+import arrow_io
+import difflib
+import zipfile
+import os
+
+# Rows read from the top of a file to infer its dtypes and size
+DEFAULT_PROBE_ROWS = 1000
+
+# Estimated memory of both files above which the out-of-core engine is recommended; overridable through the environment
+IN_MEMORY_LIMIT = int(os.environ.get("EXCELWIZARD_IN_MEMORY_LIMIT_MB", "2048")) * 1024 * 1024
+
+# An in-memory compare holds both files, the aligned values and the merged result at once
+IN_MEMORY_FACTOR = 3
+
+# Bytes of worksheet XML inflated at a time when sizing a sheet that does not declare its dimensions
+XML_BLOCK_BYTES = 64 * 1024
+
+# File types the out-of-core engine reads
+CHUNKED_EXTENSIONS = ('.csv', '.xlsx')
+
+# Columns listed in dialogs before the rest is summarised
+MAX_LISTED_COLUMNS = 30
+
+def sample_frame(file_path, rows=DEFAULT_PROBE_ROWS, sheet_name=None):
+    """Read the header and the first `rows` data rows of a file, without parsing the rest."""
+    if file_path.endswith('.xls'):
+        return pd.read_excel(file_path, sheet_name=sheet_name or 0, nrows=rows)
+    batches = streaming_io.iter_batches(file_path, rows, sheet_name)
+    try:
+        return next(batches, None)
+    finally:
+        if hasattr(batches, "close"):
+            batches.close()
+
+def estimate_sheet_rows(file_path, sheet_name=None, sample_rows=DEFAULT_PROBE_ROWS):
+    """Estimate the data rows of an Excel sheet that does not declare its dimensions; returns (rows, exact).
+
+    Only the start of the sheet's XML is inflated to measure its bytes per row; the zip directory
+    gives the size of the whole sheet.
+    """
+    workbook = streaming_io.load_read_only(file_path)
+    try:
+        sheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+        sheet_path = sheet._worksheet_path
+    finally:
+        workbook.close()
+
+    with zipfile.ZipFile(file_path) as archive:
+        xml_bytes = archive.getinfo(sheet_path).file_size
+        inflated = rows = 0
+        with archive.open(sheet_path) as xml:
+            while rows <= sample_rows:
+                block = xml.read(XML_BLOCK_BYTES)
+                if not block:
+                    return max(rows - 1, 0), True  # The whole sheet was read; the header is not data
+                inflated += len(block)
+                rows += block.count(b"</row>")
+    return max(int(xml_bytes / inflated * rows) - 1, sample_rows), False
+
+def estimate_rows(file_path, sample, sample_limit, sheet_name=None):
+    """Estimate the data rows of a file from a sample of its first rows; returns (rows, exact)."""
+    if arrow_io.is_arrow_file(file_path):
+        return arrow_io.count_rows(file_path), True
+    if len(sample) < sample_limit:
+        return len(sample), True  # The sample is the whole file
+    if file_path.endswith('.xlsx'):
+        declared_rows, _ = streaming_io.sheet_dimensions(file_path, sheet_name)
+        if declared_rows > 1:
+            return max(declared_rows - 1, len(sample)), False
+        return estimate_sheet_rows(file_path, sheet_name, sample_limit)
+    disk_bytes = len(sample.to_csv(index=False).encode()) / len(sample)
+    return max(int(os.path.getsize(file_path) / disk_bytes), len(sample)), False
+
+def sample_and_probe(file_path, rows=DEFAULT_PROBE_ROWS, sheet_name=None):
+    """Read the first rows of a file and describe it; returns the sample and the probe (see probe_file)."""
+    with instrumentation.stage("probe") as record:
+        sample = sample_frame(file_path, rows, sheet_name)
+        if sample is None:
+            sample = pd.DataFrame(columns=common.read_columns(file_path, sheet_name or 0))
+        estimated_rows, exact = estimate_rows(file_path, sample, rows, sheet_name)
+        row_bytes = sample.memory_usage(index=False, deep=True).sum() / len(sample) if len(sample) else 0
+        columns = [
+            {"name": col, "dtype": str(sample[col].dtype), "nulls": int(sample[col].isna().sum()),
+             "unique": bool(len(sample) and sample[col].notna().all() and sample[col].is_unique)}
+            for col in sample.columns
+        ]
+        record["rows"], record["bytes"] = len(sample), instrumentation.file_size(file_path)
+
+    return sample, {
+        "file": file_path, "sheet": sheet_name, "sample_rows": len(sample), "estimated_rows": estimated_rows,
+        "exact_rows": exact, "estimated_memory": int(row_bytes * estimated_rows), "columns": columns,
+    }
+
+def probe_file(file_path, rows=DEFAULT_PROBE_ROWS, sheet_name=None):
+    """Describe a file from its header and first rows: columns with their dtypes, estimated rows and memory.
+
+    Dtypes are those of the sample; a later row can still widen a column when the file is read.
+    """
+    return sample_and_probe(file_path, rows, sheet_name)[1]
+
+def column_names(probe):
+    """Names of the columns of a probed file."""
+    return [column["name"] for column in probe["columns"]]
+
+def shared_columns(probes):
+    """Columns found in every probed file, in the order of the first."""
+    names = [set(column_names(probe)) for probe in probes[1:]]
+    return [name for name in column_names(probes[0]) if all(name in others for others in names)]
+
+def key_candidates(probes):
+    """Shared columns whose sampled values are filled in and unique in every file; likely keys."""
+    unique = [{column["name"] for column in probe["columns"] if column["unique"]} for probe in probes]
+    return [name for name in shared_columns(probes) if all(name in columns for columns in unique)]
+
+def check_keys(headers, key_columns):
+    """Fail fast when a key column is missing from a file, suggesting the closest column names.
+
+    `headers` is a list of (description, column names), e.g. [("the first file", [...])].
+    """
+    for description, columns in headers:
+        columns = [str(col) for col in columns]
+        for key in key_columns:
+            if key not in columns:
+                # Differences in case first, then near misses
+                suggestions = [col for col in columns if col.lower() == str(key).lower()]
+                suggestions = suggestions or difflib.get_close_matches(str(key), columns, n=3)
+                hint = f" Did you mean {' or '.join(repr(name) for name in suggestions)}?" if suggestions else ""
+                raise ValueError(f"Key column '{key}' not found in {description}.{hint}")
+
+def check_file_keys(file_paths, key_columns, sheet_name=0):
+    """Check the key column(s) against the header rows of the files, before anything else is read."""
+    descriptions = ("the first file", "the second file")
+    sheet = f"sheet '{sheet_name}' of " if isinstance(sheet_name, str) else ""
+    check_keys([(sheet + (descriptions[i] if i < len(descriptions) else f"'{path}'"), common.read_columns(path, sheet_name))
+                for i, path in enumerate(file_paths)], key_columns)
+
+def key_warnings(samples, key_columns):
+    """Problems with the key seen in the sampled rows of each file, given as (file path, sample): missing values, and repeats the compare would reject."""
+    warnings = []
+    for position, (file_path, sample) in enumerate(samples):
+        if sample.empty:
+            continue
+        keys = sample[key_columns]
+        name = os.path.basename(file_path)
+        if keys.isna().any(axis=None):
+            warnings.append(f"'{name}' has rows without a key in its first {len(sample)} rows.")
+        if position == 1 and keys.duplicated().any():
+            warnings.append(f"'{name}' repeats keys in its first {len(sample)} rows; the compare needs unique keys in the second file.")
+    return warnings
+
+def recommend_engine(probes, limit=None):
+    """'chunked' when both files are estimated to outgrow the in-memory limit and the out-of-core engine reads them, else 'in-memory'."""
+    limit = IN_MEMORY_LIMIT if limit is None else limit
+    needed = sum(probe["estimated_memory"] for probe in probes) * IN_MEMORY_FACTOR
+    readable = all(probe["file"].endswith(CHUNKED_EXTENSIONS) for probe in probes)
+    return "chunked" if readable and needed > limit else "in-memory"
+
+def describe_columns(probes):
+    """List the shared columns with their sampled dtypes, for dialogs."""
+    dtypes = {column["name"]: column["dtype"] for column in probes[0]["columns"]}
+    names = shared_columns(probes)
+    lines = [f"{name} ({dtypes[name]})" for name in names[:MAX_LISTED_COLUMNS]]
+    if len(names) > MAX_LISTED_COLUMNS:
+        lines.append(f"... and {len(names) - MAX_LISTED_COLUMNS} more")
+    return "\n".join(lines)
+
+def describe_size(probe):
+    """Estimated rows and memory of a probed file, for dialogs."""
+    rows = f"{probe['estimated_rows']} rows" if probe["exact_rows"] else f"about {probe['estimated_rows']} rows"
+    return f"{os.path.basename(probe['file'])}: {rows}, about {probe['estimated_memory'] / 2**20:.0f} MB in memory"
+
+def probe_files(file_paths, key_columns=None, rows=DEFAULT_PROBE_ROWS, sheet_name=None):
+    """Probe the files of a compare: columns, likely keys, a check of the given key and the engine to use.
+
+    `sheet_name` probes that sheet of every workbook instead of the first one.
+    """
+    samples, probes = zip(*(sample_and_probe(path, rows, sheet_name) for path in file_paths))
+    report = {
+        "files": list(probes), "shared_columns": shared_columns(probes), "key_candidates": key_candidates(probes),
+        "engine": recommend_engine(probes), "estimated_memory": sum(probe["estimated_memory"] for probe in probes),
+    }
+    if key_columns:
+        check_keys([(f"'{probe['file']}'", column_names(probe)) for probe in probes], key_columns)
+        report["key_warnings"] = key_warnings(zip(file_paths, samples), key_columns)
+    return report
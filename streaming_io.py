@@ -0,0 +1,298 @@
+#streaming_io.py
+
+import pandas as pd
+import numpy as np
+from pandas.io.parsers import TextParser
+import os
+import threading
+from contextlib import contextmanager
+import instrumentation
+import arrow_io
+
+# Rows per batch when streaming files
+DEFAULT_BATCH_ROWS = 50000
+
+# Held while openpyxl's dimension parser is replaced (see declared_dimensions_only)
+_dimensions_lock = threading.Lock()
+
+def convert_cell(cell):
+    """Convert an openpyxl cell the same way pandas' Excel reader does."""
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    if cell.value is None:
+        return ""
+    elif cell.data_type == TYPE_ERROR:
+        return np.nan
+    elif cell.data_type == TYPE_NUMERIC:
+        value = int(cell.value)
+        if value == cell.value:
+            return value
+        return float(cell.value)
+    return cell.value
+
+def parse_rows(rows, columns=None):
+    """Turn a batch of converted rows into a DataFrame with pandas' usual type inference and NA handling.
+
+    Without `columns` the first row is the header.
+    """
+    if columns is None:
+        parser = TextParser(rows, header=0, skip_blank_lines=False)
+    else:
+        parser = TextParser(rows, names=columns, header=None, skip_blank_lines=False)
+    return parser.read()
+
+def parse_declared_dimensions(parser):
+    """Read the <dimension> a worksheet declares, stopping where its cell data starts.
+
+    Stands in for openpyxl's WorkSheetParser.parse_dimensions, which only stops at the end of the
+    cell data: opening a workbook read-only would otherwise parse every sheet without a <dimension>
+    (such as the write-only workbooks written here) completely.
+    """
+    from xml.etree.ElementTree import iterparse
+    from openpyxl.worksheet._reader import DATA_TAG, DIMENSION_TAG
+    from openpyxl.worksheet.dimensions import SheetDimension
+
+    for _event, element in iterparse(parser.source, events=("start",)):
+        if element.tag == DIMENSION_TAG:
+            return SheetDimension.from_tree(element).boundaries
+        if element.tag == DATA_TAG:
+            return None
+
+@contextmanager
+def declared_dimensions_only():
+    """Let openpyxl use parse_declared_dimensions inside the block and restore its own parser afterwards.
+
+    Read-only sheets read their size when the workbook is opened, so the block only needs to cover
+    load_workbook. The lock keeps concurrent loads from restoring each other's replacement.
+    """
+    from openpyxl.worksheet._reader import WorkSheetParser
+
+    with _dimensions_lock:
+        original = WorkSheetParser.parse_dimensions
+        WorkSheetParser.parse_dimensions = parse_declared_dimensions
+        try:
+            yield
+        finally:
+            WorkSheetParser.parse_dimensions = original
+
+def load_read_only(file_path, **kwargs):
+    """Open a workbook read-only with openpyxl, without scanning the sheets for their size."""
+    from openpyxl import load_workbook
+
+    with declared_dimensions_only():
+        return load_workbook(file_path, read_only=True, keep_links=False, **kwargs)
+
+def iter_excel_batches(file_path, batch_rows=DEFAULT_BATCH_ROWS, sheet_name=None):
+    """Yield the rows of an Excel sheet as DataFrames of at most `batch_rows` rows.
+
+    The workbook is opened read-only, so only the current batch is held in memory. Dtypes are
+    inferred per batch.
+    """
+    workbook = load_read_only(file_path, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+        sheet.reset_dimensions()  # Dimensions written by some tools are wrong; read every row
+
+        columns = None
+        batch = []
+        pending_blank_rows = 0
+        for row in sheet.rows:
+            converted_row = [convert_cell(cell) for cell in row]
+            while converted_row and converted_row[-1] == "":
+                converted_row.pop()  # Trim trailing empty cells
+
+            if not converted_row:
+                # Blank rows are only kept when more data follows them, like pandas
+                pending_blank_rows += 1
+                continue
+
+            batch.extend([[]] * pending_blank_rows)
+            pending_blank_rows = 0
+            batch.append(converted_row)
+
+            # The first batch also carries the header row
+            if len(batch) >= batch_rows + (columns is None):
+                frame = emit_batch(batch, columns)
+                columns = list(frame.columns)
+                batch = []
+                yield frame
+
+        if batch:
+            yield emit_batch(batch, columns)
+    finally:
+        workbook.close()
+
+def emit_batch(batch, columns):
+    """Pad a batch of rows to the sheet width and parse it."""
+    width = len(columns) if columns is not None else max(len(row) for row in batch)
+    return parse_rows([(row + [""] * (width - len(row)))[:width] for row in batch], columns)
+
+def iter_csv_batches(file_path, batch_rows=DEFAULT_BATCH_ROWS):
+    """Yield the rows of a CSV file as DataFrames of at most `batch_rows` rows."""
+    for chunk in pd.read_csv(file_path, chunksize=batch_rows):
+        chunk.reset_index(drop=True, inplace=True)
+        yield chunk
+
+def iter_batches(file_path, batch_rows=DEFAULT_BATCH_ROWS, sheet_name=None):
+    """Yield a CSV, Excel, Parquet or Arrow IPC file as DataFrame batches."""
+    if file_path.endswith('.csv'):
+        return iter_csv_batches(file_path, batch_rows)
+    elif file_path.endswith('.xlsx'):
+        return iter_excel_batches(file_path, batch_rows, sheet_name)
+    elif arrow_io.is_arrow_file(file_path):
+        return arrow_io.iter_frames(file_path, batch_rows)
+    else:
+        raise ValueError("Unsupported file format for streaming. Please use .xlsx, .csv, .parquet or .feather files.")
+
+def count_rows(file_path, sheet_name=None):
+    """Count the data rows of a CSV file or Excel sheet without building DataFrames of its contents."""
+    if file_path.endswith('.csv'):
+        return sum(len(chunk) for chunk in pd.read_csv(file_path, usecols=[0], chunksize=DEFAULT_BATCH_ROWS))
+    if arrow_io.is_arrow_file(file_path):
+        return arrow_io.count_rows(file_path)
+
+    workbook = load_read_only(file_path, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+        sheet.reset_dimensions()
+        last_row_with_data = 0
+        for row_number, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+            if any(value is not None for value in row):
+                last_row_with_data = row_number
+        return max(last_row_with_data - 1, 0)  # Trailing blank rows and the header are not data
+    finally:
+        workbook.close()
+
+def sheet_dimensions(file_path, sheet_name=None):
+    """Return the (rows, columns) an Excel sheet declares, without reading its cells.
+
+    Returns (0, 0) when the workbook does not record its dimensions.
+    """
+    workbook = load_read_only(file_path)
+    try:
+        sheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+        return sheet.max_row or 0, sheet.max_column or 0
+    finally:
+        workbook.close()
+
+def excel_rows(frame):
+    """Convert a DataFrame batch into plain Python rows openpyxl can write, with empty cells for NA."""
+    values = frame.astype(object).where(frame.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+@instrumentation.instrumented("write", measure=lambda rows, batches, output_file_path, *args, **kwargs: (rows, instrumentation.file_size(output_file_path)))
+def write_batches(batches, output_file_path, sheet_name="Sheet1"):
+    """Write DataFrame batches to a CSV or Excel file as they arrive and return the number of rows written.
+
+    Excel output uses openpyxl's write-only mode, so memory does not grow with the sheet. When the
+    batches are streamed from a reader, the recorded write stage includes producing them.
+    """
+    file_extension = os.path.splitext(output_file_path)[1].lower()
+
+    if file_extension == '.csv':
+        rows_written = 0
+        with open(output_file_path, 'w', newline='', encoding='utf-8') as handle:
+            header = True
+            for batch in batches:
+                arrow_io.csv_ready(batch).to_csv(handle, index=False, header=header)
+                header = False
+                rows_written += len(batch)
+            if header:
+                raise ValueError("Nothing to write.")
+        return rows_written
+
+    elif file_extension == '.xlsx':
+        return write_sheets([(sheet_name, batches)], output_file_path)[sheet_name]
+
+    elif file_extension == '.parquet':
+        return write_parquet(batches, output_file_path)
+
+    elif file_extension in arrow_io.IPC_FORMATS:
+        return write_ipc(batches, output_file_path)
+
+    else:
+        raise ValueError("Unsupported file format. Please use .xlsx, .csv, .parquet or .feather extensions.")
+
+def write_sheets(sheets, output_file_path):
+    """Write several sheets, each given as (name, batches), to one write-only workbook.
+
+    Returns the number of rows written per sheet.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    rows_written = {}
+    for sheet_name, batches in sheets:
+        sheet = workbook.create_sheet(sheet_name)
+        rows_written[sheet_name] = 0
+        header = True
+        for batch in batches:
+            if header:
+                sheet.append(list(batch.columns))
+                header = False
+            for row in excel_rows(batch):
+                sheet.append(row)
+            rows_written[sheet_name] += len(batch)
+        if header:
+            raise ValueError(f"Nothing to write for sheet '{sheet_name}'.")
+    workbook.save(output_file_path)
+    return rows_written
+
+def write_parquet(batches, output_file_path):
+    """Write DataFrame batches to a Parquet file, one row group per batch, and return the number of rows written.
+
+    Every batch is stored with the schema of the first one.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Writing Parquet files requires pyarrow (pip install pyarrow).")
+
+    writer = None
+    rows_written = 0
+    try:
+        for batch in batches:
+            if writer is None:
+                table = pa.Table.from_pandas(batch, preserve_index=False)
+                writer = pq.ParquetWriter(output_file_path, table.schema)
+            else:
+                table = pa.Table.from_pandas(batch, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+            rows_written += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError("Nothing to write.")
+    return rows_written
+
+def write_ipc(batches, output_file_path):
+    """Write DataFrame batches to an uncompressed Arrow IPC (Feather) file and return the number of rows written.
+
+    Every batch is stored with the schema of the first one.
+    """
+    pa = arrow_io.require_pyarrow()
+
+    writer = schema = None
+    rows_written = 0
+    try:
+        for batch in batches:
+            # The IPC file writer does not expose its schema, so the first batch's is kept here
+            table = arrow_io.frame_to_table(batch) if writer is None else pa.Table.from_pandas(batch, schema=schema, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                writer = pa.ipc.new_file(output_file_path, schema)
+            writer.write_table(table)
+            rows_written += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError("Nothing to write.")
+    return rows_written
+
+def iter_frame_batches(dataframe, batch_rows=DEFAULT_BATCH_ROWS):
+    """Split an in-memory DataFrame into batches for write_batches."""
+    for start in range(0, max(len(dataframe), 1), batch_rows):
+        yield dataframe.iloc[start:start + batch_rows]
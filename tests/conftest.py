@@ -0,0 +1,9 @@
+#conftest.py
+
+import pytest
+import common_code_gui as common
+
+@pytest.fixture(autouse=True)
+def headless(monkeypatch):
+    """Run every test without dialogs; questions must be answered by the decisions given."""
+    monkeypatch.setattr(common, "HEADLESS", True)
@@ -0,0 +1,36 @@
+#test_arrow_io.py
+
+import pandas as pd
+import pytest
+import arrow_io
+import streaming_io
+from compare_update_gui import compare_and_update
+
+pytest.importorskip("pyarrow")
+
+DECISIONS = {"extra_columns": "keep", "new_columns": "yes", "new_rows": "yes", "missing_rows": "keep"}
+
+@pytest.mark.parametrize("extension", [".feather", ".parquet"])
+def test_update_first_file_in_place_with_mapped_columns(tmp_path, extension):
+    """The merged frame still maps the first file, which the output then replaces."""
+    file1, file2, expected = (str(tmp_path / f"{name}{extension}") for name in ("first", "second", "expected"))
+    rows = 5000
+    first = pd.DataFrame({"id": range(rows), "amount": [i * 0.5 for i in range(rows)], "note": [f"n{i}" for i in range(rows)]})
+    second = first.iloc[100:].assign(amount=lambda frame: frame["amount"] + 1)
+    for frame, path in ((first, file1), (second, file2)):
+        arrow_io.write_table(arrow_io.frame_to_table(frame), path)
+
+    read_options = {"dtype_backend": "pyarrow"}
+    compare_and_update(file1, file2, "id", expected, DECISIONS, read_options)
+    compare_and_update(file1, file2, "id", file1, DECISIONS, read_options)
+
+    assert arrow_io.read_table(file1).equals(arrow_io.read_table(expected))
+    assert not list(tmp_path.glob("*.tmp"))
+
+@pytest.mark.parametrize("extension", [".feather", ".arrow", ".parquet"])
+def test_streamed_batches_are_written_with_the_first_schema(tmp_path, extension):
+    output = str(tmp_path / f"streamed{extension}")
+    frame = pd.DataFrame({"id": range(10), "amount": [i * 1.5 for i in range(10)], "note": [f"n{i}" for i in range(10)]})
+
+    assert streaming_io.write_batches(streaming_io.iter_frame_batches(frame, batch_rows=4), output) == 10
+    assert arrow_io.read_table(output).to_pandas().equals(frame)
@@ -0,0 +1,62 @@
+#test_batch_conversion.py
+
+import os
+import pandas as pd
+import pytest
+from batch_conversion import convert_batch
+
+def write_workbook(path, sheets):
+    with pd.ExcelWriter(path) as writer:
+        for name, frame in sheets.items():
+            frame.to_excel(writer, sheet_name=name, index=False)
+
+@pytest.fixture
+def source_dir(tmp_path):
+    """A directory with a two-sheet workbook, a CSV file and a workbook in a subdirectory."""
+    source = tmp_path / "source"
+    (source / "sub").mkdir(parents=True)
+    write_workbook(source / "sales.xlsx", {
+        "Q1": pd.DataFrame({"id": [1, 2], "amount": [1.5, 2.5]}),
+        "Q2": pd.DataFrame({"id": [3], "amount": [3.5]}),
+    })
+    pd.DataFrame({"id": [1, 2, 3], "name": ["a", "b", "c"]}).to_csv(source / "names.csv", index=False)
+    write_workbook(source / "sub" / "sales.xlsx", {"Q1": pd.DataFrame({"id": [9], "amount": [9.5]})})
+    return source
+
+def test_every_sheet_becomes_a_csv_file_and_unchanged_files_are_skipped(source_dir, tmp_path):
+    output_dir = tmp_path / "out"
+    manifest = convert_batch(str(source_dir), str(output_dir), "csv", workers=2, recursive=True)
+
+    assert manifest["totals"] == {"converted": 2, "skipped": 1, "failed": 0, "error": 0}
+    assert pd.read_csv(output_dir / "sales_Q2.csv").to_dict("list") == {"id": [3], "amount": [3.5]}
+    assert pd.read_csv(output_dir / "sub" / "sales_Q1.csv").to_dict("list") == {"id": [9], "amount": [9.5]}
+    assert os.path.exists(manifest["manifest"])
+
+    again = convert_batch(str(source_dir), str(output_dir), "csv", workers=2, recursive=True)
+    assert again["totals"]["skipped"] == 3
+
+def test_csv_and_workbooks_become_one_workbook_each(source_dir, tmp_path):
+    output_dir = tmp_path / "out"
+    manifest = convert_batch(str(source_dir), str(output_dir), "xlsx", workers=1)
+
+    assert manifest["totals"]["converted"] == 2
+    assert list(pd.read_excel(output_dir / "sales.xlsx", sheet_name=None)) == ["Q1", "Q2"]
+    assert pd.read_excel(output_dir / "names.xlsx")["name"].tolist() == ["a", "b", "c"]
+
+@pytest.mark.parametrize("files, output_format", [
+    ({"a b.xlsx": {"Sheet1": [1]}, "a_b.xlsx": {"Sheet1": [2]}}, "csv"),
+    ({"a.xlsx": {"Q1 sales": [1], "Q1_sales": [2]}}, "csv"),
+    ({"a.csv": None, "a.xlsx": {"Sheet1": [2]}}, "xlsx"),
+])
+def test_outputs_written_twice_fail_before_converting(tmp_path, files, output_format):
+    source, output_dir = tmp_path / "source", tmp_path / "out"
+    source.mkdir()
+    for name, sheets in files.items():
+        if sheets is None:
+            pd.DataFrame({"id": [1]}).to_csv(source / name, index=False)
+        else:
+            write_workbook(source / name, {sheet: pd.DataFrame({"id": ids}) for sheet, ids in sheets.items()})
+
+    with pytest.raises(ValueError, match="would both be written to"):
+        convert_batch(str(source), str(output_dir), output_format, workers=1)
+    assert not output_dir.exists()
@@ -0,0 +1,51 @@
+#test_chunked_compare.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from chunked_compare import compare_and_update_chunked, plan_partitions
+from compare_update_gui import compare_and_update
+
+# Small enough to split the files below into many buckets and several chunks each
+MEMORY_BUDGET = 256 * 1024
+
+@pytest.fixture
+def large_files(tmp_path):
+    """Two versions of a shuffled table: changed cells, rows only in either file and a column only in each."""
+    rng = np.random.default_rng(7)
+    rows = 6000
+    first = pd.DataFrame({
+        "id": rng.permutation(rows),
+        "amount": rng.integers(0, 1000, rows) / 4,
+        "status": rng.choice(["open", "closed", "pending"], rows),
+        "legacy": rng.integers(0, 10, rows),
+    })
+    second = first.drop(columns="legacy").sample(frac=0.9, random_state=7)
+    changed = second.sample(frac=0.1, random_state=8).index
+    second.loc[changed, "amount"] += 1
+    second["region"] = rng.choice(["north", "south"], len(second))
+    new_rows = pd.DataFrame({"id": range(rows, rows + 500), "amount": 1.0, "status": "new", "region": "east"})
+    second = pd.concat([second, new_rows]).sample(frac=1, random_state=9)
+
+    file1, file2 = tmp_path / "first.csv", tmp_path / "second.csv"
+    first.to_csv(file1, index=False)
+    second.to_csv(file2, index=False)
+    return str(file1), str(file2)
+
+@pytest.mark.parametrize("decisions", [
+    {"extra_columns": "keep", "new_columns": "yes", "new_rows": "yes", "missing_rows": "keep"},
+    {"extra_columns": "remove", "new_columns": "no", "new_rows": "no", "missing_rows": "set"},
+])
+def test_chunked_compare_matches_in_memory_compare(large_files, tmp_path, decisions):
+    file1, file2 = large_files
+    num_buckets, chunk_rows = plan_partitions(file1, file2, MEMORY_BUDGET)
+    assert num_buckets > 1 and chunk_rows < 6000
+
+    expected, output = str(tmp_path / "expected.csv"), str(tmp_path / "chunked.csv")
+    expected_summary = compare_and_update(file1, file2, "id", expected, decisions)
+    summary = compare_and_update_chunked(file1, file2, "id", output, decisions, memory_budget=MEMORY_BUDGET, spill_dir=str(tmp_path))
+
+    assert summary == expected_summary
+    with open(expected, encoding="utf-8") as expected_file, open(output, encoding="utf-8") as output_file:
+        assert output_file.read() == expected_file.read()
+    assert not list(tmp_path.glob("tmp*"))  # The spill directory is removed
@@ -0,0 +1,37 @@
+#test_compact_dtypes.py
+
+import pandas as pd
+import pytest
+from compare_update_gui import compare_and_update
+
+DECISIONS = {"extra_columns": "keep", "new_columns": "yes", "new_rows": "yes", "missing_rows": "keep"}
+
+@pytest.fixture
+def files_with_missing_cells(tmp_path):
+    """Two versions of a table where the second fills, changes and blanks cells the first has missing or set."""
+    file1, file2 = tmp_path / "first.csv", tmp_path / "second.csv"
+    pd.DataFrame({
+        "id": [1, 2, 3, 4, 5, 6],
+        "note": [None, "alpha", "bravo", None, "delta", "echo"],          # Unique text: Arrow strings
+        "status": ["open", None, "open", "closed", "open", "closed"],      # Repeated text: categorical
+        "amount": [1.5, None, 3.0, 4.0, None, 6.25],
+    }).to_csv(file1, index=False)
+    pd.DataFrame({
+        "id": [1, 2, 3, 4, 5, 7],
+        "note": ["filled", "alpha", None, "added", "changed", "new"],
+        "status": ["open", "closed", None, "closed", "open", "open"],
+        "amount": [1.5, 2.0, None, 4.5, 5.0, 7.0],
+    }).to_csv(file2, index=False)
+    return str(file1), str(file2)
+
+def test_compact_compare_matches_plain_compare_on_missing_cells(files_with_missing_cells, tmp_path):
+    file1, file2 = files_with_missing_cells
+    outputs = {}
+    for compact in (False, True):
+        output, change_set = str(tmp_path / f"merged_{compact}.csv"), str(tmp_path / f"changes_{compact}.csv")
+        summary = compare_and_update(file1, file2, "id", output, DECISIONS, change_set_path=change_set, compact=compact)
+        with open(output, encoding="utf-8") as merged, open(change_set, encoding="utf-8") as changes:
+            outputs[compact] = (summary["changes"], summary["rows_added"], merged.read(), changes.read())
+
+    assert outputs[False][0] == {"note": 3, "status": 1, "amount": 3}
+    assert outputs[True] == outputs[False]
@@ -0,0 +1,33 @@
+#test_compare_update.py
+
+import warnings
+import pandas as pd
+from compare_update_gui import compare_and_update
+
+DECISIONS = {"extra_columns": "keep", "new_columns": "yes", "new_rows": "yes", "missing_rows": "keep"}
+
+def test_int_column_updated_from_float_column_stays_int(tmp_path):
+    """A blank cell makes the second file's column float; whole values still update the first file's ints as ints."""
+    file1, file2, output = (str(tmp_path / name) for name in ("first.csv", "second.csv", "merged.csv"))
+    pd.DataFrame({"id": [1, 2, 3], "quantity": [10, 20, 30], "price": [1.5, 2.5, 3.5]}).to_csv(file1, index=False)
+    pd.DataFrame({"id": [1, 2, 3], "quantity": [10, 25, None], "price": [1.5, 2.0, 3.5]}).to_csv(file2, index=False)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FutureWarning)
+        summary = compare_and_update(file1, file2, "id", output, DECISIONS)
+
+    merged = pd.read_csv(output)
+    assert summary["changes"] == {"quantity": 1, "price": 1}
+    assert merged["quantity"].tolist() == [10, 25, 30]
+    assert merged["quantity"].dtype == "int64"
+
+def test_int_column_takes_fractional_values_as_float(tmp_path):
+    file1, file2, output = (str(tmp_path / name) for name in ("first.csv", "second.csv", "merged.csv"))
+    pd.DataFrame({"id": [1, 2], "quantity": [10, 20]}).to_csv(file1, index=False)
+    pd.DataFrame({"id": [1, 2], "quantity": [10, 20.5]}).to_csv(file2, index=False)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FutureWarning)
+        compare_and_update(file1, file2, "id", output, DECISIONS)
+
+    assert pd.read_csv(output)["quantity"].tolist() == [10.0, 20.5]
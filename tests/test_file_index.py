@@ -0,0 +1,57 @@
+#test_file_index.py
+
+import os
+import pytest
+import file_index
+
+@pytest.fixture
+def tree(tmp_path):
+    """A small directory tree of reports, with the index kept next to it."""
+    root = tmp_path / "tree"
+    for path in ("report.xlsx", "notes.txt", "2023/report.xlsx", "2023/q1/sales_report.csv", "archive/old/report.xlsx"):
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text("x")
+    return str(root), str(tmp_path / "index.sqlite")
+
+def relative(paths, root):
+    return sorted(os.path.relpath(path, root) for path in paths)
+
+def test_match_modes_exclusions_and_depth(tree):
+    root, index_path = tree
+    assert relative(file_index.search("report.xlsx", [root], index_path=index_path), root) == [
+        "2023/report.xlsx", "archive/old/report.xlsx", "report.xlsx"]
+    assert relative(file_index.search("*.csv", [root], "glob", index_path=index_path), root) == ["2023/q1/sales_report.csv"]
+    assert relative(file_index.search("REPORT", [root], "substring", index_path=index_path), root) == [
+        "2023/q1/sales_report.csv", "2023/report.xlsx", "archive/old/report.xlsx", "report.xlsx"]
+    assert relative(file_index.search("report.xlsx", [root], index_path=index_path, exclude=["archive"]), root) == [
+        "2023/report.xlsx", "report.xlsx"]
+    assert relative(file_index.search("report.xlsx", [root], index_path=index_path, max_depth=1), root) == [
+        "2023/report.xlsx", "report.xlsx"]
+    assert relative(file_index.search("report.xlsx", [os.path.join(root, "2023")], index_path=index_path), root) == ["2023/report.xlsx"]
+
+def test_recent_index_answers_without_walking_and_rescans_only_changed_directories(tree):
+    root, index_path = tree
+    file_index.search("report.xlsx", [root], index_path=index_path)
+    os.remove(os.path.join(root, "2023", "report.xlsx"))
+    open(os.path.join(root, "2023", "q1", "report.xlsx"), "w").close()
+
+    # Within the maximum age the index is trusted as it is
+    assert relative(file_index.search("report.xlsx", [root], index_path=index_path), root) == [
+        "2023/report.xlsx", "archive/old/report.xlsx", "report.xlsx"]
+
+    connection = file_index.connect(index_path)
+    try:
+        stats = file_index.scan(connection, root)
+    finally:
+        connection.close()
+    assert stats["directories"] == 5 and stats["listed"] == 2  # Only 2023 and 2023/q1 changed
+
+    assert relative(file_index.search("report.xlsx", [root], index_path=index_path), root) == [
+        "2023/q1/report.xlsx", "archive/old/report.xlsx", "report.xlsx"]
+    assert relative(file_index.search("report.xlsx", [root], index_path=index_path, max_age=0), root) == [
+        "2023/q1/report.xlsx", "archive/old/report.xlsx", "report.xlsx"]
+
+def test_unknown_match_mode_is_rejected(tree):
+    root, index_path = tree
+    with pytest.raises(ValueError, match="Unknown match mode"):
+        file_index.search("report", [root], "regex", index_path=index_path)
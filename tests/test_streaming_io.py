@@ -0,0 +1,18 @@
+#test_streaming_io.py
+
+import pandas as pd
+import streaming_io
+
+def test_read_only_load_restores_openpyxl_dimension_parser(tmp_path):
+    """Only load_read_only skips the sheet scan; other openpyxl reads keep openpyxl's own parser."""
+    from openpyxl.worksheet._reader import WorkSheetParser
+
+    output = str(tmp_path / "written.xlsx")
+    frame = pd.DataFrame({"id": range(5), "name": list("abcde")})
+    streaming_io.write_batches(streaming_io.iter_frame_batches(frame, batch_rows=2), output)
+    original = WorkSheetParser.parse_dimensions
+
+    assert streaming_io.count_rows(output) == 5
+    assert streaming_io.sheet_dimensions(output) == (0, 0)  # Write-only sheets declare no dimension
+    assert WorkSheetParser.parse_dimensions is original
+    assert pd.read_excel(output).equals(frame)
@@ -0,0 +1,74 @@
+#test_workbook_cache.py
+
+import os
+import pandas as pd
+import pytest
+import workbook_cache as cache
+
+@pytest.fixture(params=["feather", "pickle"])
+def cache_dir(request, tmp_path, monkeypatch):
+    """An empty cache in its own directory, in each storage format."""
+    if request.param == "feather":
+        pytest.importorskip("pyarrow")
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(cache, "cache_format", lambda: request.param)
+    monkeypatch.setattr(cache, "cache_stats", dict.fromkeys(cache.cache_stats, 0))
+    return tmp_path / "cache"
+
+def counting_loader(calls):
+    def loader(file_path):
+        calls.append(file_path)
+        return pd.read_excel(file_path)
+    return loader
+
+def test_second_read_is_a_hit_until_the_file_changes(cache_dir, tmp_path):
+    workbook = str(tmp_path / "data.xlsx")
+    pd.DataFrame({"id": [1, 2], "name": ["a", "b"]}).to_excel(workbook, index=False)
+    calls = []
+
+    first = cache.cached_read(workbook, counting_loader(calls))
+    second = cache.cached_read(workbook, counting_loader(calls))
+    assert len(calls) == 1 and cache.cache_stats["hits"] == 1
+    pd.testing.assert_frame_equal(second, first, check_dtype=False)
+
+    # Another way of parsing the same file is cached on its own
+    cache.cached_read(workbook, counting_loader(calls), variant="sheet=1")
+    assert len(calls) == 2
+
+    pd.DataFrame({"id": [1, 2, 3], "name": ["a", "b", "c"]}).to_excel(workbook, index=False)
+    changed = cache.cached_read(workbook, counting_loader(calls))
+    assert len(calls) == 3 and changed["id"].tolist() == [1, 2, 3]
+
+def test_files_of_other_formats_are_not_cached(cache_dir, tmp_path):
+    csv_file = str(tmp_path / "data.csv")
+    pd.DataFrame({"id": [1]}).to_csv(csv_file, index=False)
+    calls = []
+    for _ in range(2):
+        cache.cached_read(csv_file, lambda path: calls.append(path) or pd.read_csv(path))
+    assert len(calls) == 2 and not cache_dir.exists()
+
+def test_least_recently_used_entries_are_evicted_first(cache_dir, tmp_path):
+    files = []
+    for i in range(3):
+        files.append(str(tmp_path / f"data_{i}.csv"))
+        pd.DataFrame({"id": range(100), "value": [f"row {i}"] * 100}).to_csv(files[-1], index=False)
+        cache.cached_read(files[-1], pd.read_csv, extensions=None)
+    assert len(list(cache_dir.iterdir())) == 3
+
+    # Age the entries in the order they were stored, then use the oldest one again
+    for age, file_path in enumerate(files):
+        entry = cache.cache_path(cache.file_fingerprint(file_path), cache.cache_format())
+        os.utime(entry, (1000 + age, 1000 + age))
+    cache.cached_read(files[0], pd.read_csv, extensions=None)
+
+    sizes = {entry.name: entry.stat().st_size for entry in cache_dir.iterdir()}
+    cache.evict(size_limit=sum(sizes.values()) - 1)
+    assert cache.cache_stats["evictions"] == 1
+    calls = []
+    cache.cached_read(files[0], lambda path: calls.append(path) or pd.read_csv(path), extensions=None)
+    cache.cached_read(files[1], lambda path: calls.append(path) or pd.read_csv(path), extensions=None)
+    assert calls == [files[1]]  # data_1 was the least recently used entry
+
+    cache.clear_cache()
+    assert not list(cache_dir.iterdir())
@@ -0,0 +1,52 @@
+#test_workbook_compare.py
+
+import pandas as pd
+import pytest
+from workbook_compare import compare_workbooks
+
+DECISIONS = {"extra_columns": "keep", "new_columns": "yes", "new_rows": "yes", "missing_rows": "keep"}
+
+def write_workbook(path, sheets):
+    with pd.ExcelWriter(path) as writer:
+        for name, frame in sheets.items():
+            frame.to_excel(writer, sheet_name=name, index=False)
+
+@pytest.fixture
+def workbooks(tmp_path):
+    """Two versions of a workbook with two keyed sheets, a sheet only in the first and one only in the second."""
+    file1, file2 = str(tmp_path / "first.xlsx"), str(tmp_path / "second.xlsx")
+    write_workbook(file1, {
+        "Orders": pd.DataFrame({"id": [1, 2, 3], "amount": [1.5, 2.5, 3.5], "status": ["open", "open", "closed"]}),
+        "Items": pd.DataFrame({"order": [1, 1, 2], "line": [1, 2, 1], "qty": [5, 6, 7]}),
+        "Notes": pd.DataFrame({"text": ["kept as is"]}),
+    })
+    write_workbook(file2, {
+        "Orders": pd.DataFrame({"id": [2, 3, 4], "amount": [2.5, 4.0, 5.5], "status": ["closed", "closed", "open"]}),
+        "Items": pd.DataFrame({"order": [1, 2, 2], "line": [2, 1, 2], "qty": [60, 7, 8]}),
+        "Extra": pd.DataFrame({"x": [1]}),
+    })
+    return file1, file2
+
+def test_one_worker_and_several_workers_give_the_same_workbook(workbooks, tmp_path):
+    file1, file2 = workbooks
+    sheet_keys = {"Orders": "id", "Items": ["order", "line"]}
+    results = {}
+    for workers in (1, 2):
+        output = str(tmp_path / f"merged_{workers}.xlsx")
+        summary = compare_workbooks(file1, file2, output, DECISIONS, sheet_keys=sheet_keys, workers=workers)
+        results[workers] = (pd.read_excel(output, sheet_name=None), [(sheet["sheet"], sheet.get("changes"), sheet["rows"]) for sheet in summary["sheets"]])
+
+    merged, sheets = results[1]
+    assert sheets == [("Orders", {"amount": 1, "status": 1}, 4), ("Items", {"qty": 1}, 4), ("Notes", None, 1)]
+    assert merged["Orders"]["amount"].tolist() == [1.5, 2.5, 4.0, 5.5]
+    assert merged["Notes"]["text"].tolist() == ["kept as is"]
+    for sheet, frame in results[2][0].items():
+        pd.testing.assert_frame_equal(frame, merged[sheet])
+    assert results[2][1] == sheets
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_a_failing_sheet_is_named_in_the_error(workbooks, tmp_path, workers):
+    file1, file2 = workbooks
+    # 'order' alone repeats in the second workbook's Items sheet
+    with pytest.raises(ValueError, match="^Sheet 'Items': .*not unique"):
+        compare_workbooks(file1, file2, str(tmp_path / "merged.xlsx"), DECISIONS, sheet_keys={"Orders": "id", "Items": "order"}, workers=workers)
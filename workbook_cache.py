@@ -0,0 +1,143 @@
+#workbook_cache.py
+
+import pandas as pd
+import common_code_gui as common
+import hashlib
+import os
+import threading
+import time
+
+# Cache location, size cap and switch; all can be overridden through the environment
+CACHE_DIR = os.environ.get("EXCELWIZARD_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "excelwizard"))
+CACHE_SIZE_LIMIT = int(os.environ.get("EXCELWIZARD_CACHE_SIZE_MB", "2048")) * 1024 * 1024
+CACHE_ENABLED = os.environ.get("EXCELWIZARD_CACHE", "1") != "0"
+
+# Only formats that are expensive to parse are worth caching
+CACHED_EXTENSIONS = ('.xls', '.xlsx')
+
+# Hit/miss counters for this process
+cache_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_lock = threading.Lock()
+
+def cache_format():
+    """Use Feather (Arrow IPC) when pyarrow is installed, otherwise fall back to pickle."""
+    try:
+        import pyarrow  # noqa: F401
+        return "feather"
+    except ImportError:
+        return "pickle"
+
+def arrow_backed():
+    """With the pyarrow dtype backend, entries are stored uncompressed and memory-mapped when read."""
+    return cache_format() == "feather" and common.resolve_dtype_backend() == 'pyarrow'
+
+def read_entry(path, fmt):
+    """Load a cached DataFrame; Arrow-backed entries map the file instead of copying it into memory."""
+    if arrow_backed():
+        import arrow_io
+        return arrow_io.read_frame(path, dtype_backend='pyarrow')
+    return pd.read_feather(path) if fmt == "feather" else pd.read_pickle(path, compression=None)
+
+def file_fingerprint(file_path, variant=""):
+    """Build a cache key from the path, size, modification time and content hash of a file.
+
+    `variant` distinguishes different ways of parsing the same file (sheet, columns, engine...).
+    """
+    stat = os.stat(file_path)
+    content_hash = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b''):
+            content_hash.update(block)
+
+    fingerprint = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{content_hash.hexdigest()}|{variant}"
+    return hashlib.blake2b(fingerprint.encode(), digest_size=16).hexdigest()
+
+def cache_path(key, fmt):
+    """Location of a cached DataFrame."""
+    return os.path.join(CACHE_DIR, f"{key}.{fmt}")
+
+def log_stats(event, file_path):
+    """Log a cache event together with the running counters."""
+    common.log_message(
+        f"Workbook cache {event} for '{file_path}' (hits: {cache_stats['hits']}, misses: {cache_stats['misses']}, "
+        f"stores: {cache_stats['stores']}, evictions: {cache_stats['evictions']})",
+        level='info'
+    )
+
+def evict(size_limit=None):
+    """Remove the least recently used cache entries until the cache fits under the size limit."""
+    size_limit = CACHE_SIZE_LIMIT if size_limit is None else size_limit
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.is_file() and entry.name.endswith(('.feather', '.pickle')):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= size_limit:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            cache_stats["evictions"] += 1
+        except OSError:
+            pass  # Already removed by another process
+
+def store(key, dataframe):
+    """Write a parsed DataFrame to the cache and enforce the size cap."""
+    fmt = cache_format()
+    path = cache_path(key, fmt)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    try:
+        if fmt == "feather":
+            dataframe.to_feather(temp_path, compression="uncompressed" if arrow_backed() else None)
+        else:
+            dataframe.to_pickle(temp_path, compression=None)
+        os.replace(temp_path, path)  # Readers never see a partially written entry
+    except Exception as e:
+        # Frames Arrow cannot represent (mixed-type columns, non-string headers) are simply not cached
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        common.log_message(f"Could not cache parsed data: {e}", level='warning')
+        return
+
+    cache_stats["stores"] += 1
+    evict()
+
+def cached_read(file_path, loader, variant="", extensions=CACHED_EXTENSIONS):
+    """Return `loader(file_path)`, served from the on-disk cache when the file has been parsed before.
+
+    Only files with one of `extensions` are cached; None caches every file.
+    """
+    if not CACHE_ENABLED or (extensions and not file_path.lower().endswith(extensions)):
+        return loader(file_path)
+
+    key = file_fingerprint(file_path, variant)
+    fmt = cache_format()
+    path = cache_path(key, fmt)
+
+    with _lock:
+        if os.path.exists(path):
+            try:
+                dataframe = read_entry(path, fmt)
+                os.utime(path, (time.time(), time.time()))  # Mark as recently used
+                cache_stats["hits"] += 1
+                log_stats("hit", file_path)
+                return dataframe
+            except Exception as e:
+                common.log_message(f"Ignoring unreadable cache entry '{path}': {e}", level='warning')
+
+        cache_stats["misses"] += 1
+
+    dataframe = loader(file_path)
+    with _lock:
+        store(key, dataframe)
+        log_stats("miss", file_path)
+    return dataframe
+
+def clear_cache():
+    """Remove every cached DataFrame."""
+    if os.path.isdir(CACHE_DIR):
+        evict(size_limit=0)
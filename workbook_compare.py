@@ -0,0 +1,168 @@
+#workbook_compare.py
+
+import common_code_gui as common
+import compare_update_gui as compare
+import instrumentation
+import schema_probe
+import streaming_io
+from chunked_compare import spill_frame, load_spill
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import functools
+import os
+import tempfile
+import time
+
+# Workbooks whose sheets can be compared; the output is always one .xlsx workbook
+WORKBOOK_FORMATS = ('.xls', '.xlsx')
+
+def match_sheets(file1_path, file2_path):
+    """Pair the sheets of two workbooks by name; returns the shared sheets in the first workbook's order and the sheets only in the second."""
+    sheets1, sheets2 = common.sheet_names(file1_path), common.sheet_names(file2_path)
+    return [sheet for sheet in sheets1 if sheet in sheets2], [sheet for sheet in sheets2 if sheet not in sheets1]
+
+def resolve_sheet_keys(shared_sheets, key_column=None, sheet_keys=None):
+    """Key columns of every shared sheet: its entry in `sheet_keys`, else `key_column`; None keeps the sheet unchanged."""
+    sheet_keys = sheet_keys or {}
+    unknown = [sheet for sheet in sheet_keys if sheet not in shared_sheets]
+    if unknown:
+        raise ValueError(f"Sheet(s) {', '.join(repr(sheet) for sheet in unknown)} not found in both workbooks.")
+    keys = {}
+    for sheet in shared_sheets:
+        key = sheet_keys.get(sheet) or key_column
+        keys[sheet] = compare.key_columns_list(key) if key else None
+    return keys
+
+def init_sheet_worker():
+    """Worker processes have no window to show dialogs on; the parent keeps its own setting."""
+    common.HEADLESS = True
+
+def compare_sheet(file1_path, file2_path, sheet_name, key_columns, decisions, read_options, spill_stem):
+    """Update one sheet of the first workbook with the same sheet of the second, in a worker process.
+
+    The merged sheet is spilled to disk instead of being sent back, so the parent maps or loads it
+    only when writing it. Returns the change summary with the spill path, row count and timing.
+    """
+    start = time.perf_counter()
+    with instrumentation.run("compare_sheet") as run:
+        first_stage = len(run["stages"])
+        df1 = common.read_data(file1_path, sheet_name=sheet_name, **read_options)
+        df2 = common.read_data(file2_path, sheet_name=sheet_name, **read_options)
+        compare.check_key_columns(df1, df2, key_columns)
+        merged_df, summary = compare.merge_dataframes(
+            df1, df2, key_columns, decisions,
+            file_names=(f"{os.path.basename(file1_path)} [{sheet_name}]", f"{os.path.basename(file2_path)} [{sheet_name}]")
+        )
+        summary["spill"] = spill_frame(merged_df, spill_stem)
+        summary["rows"] = len(merged_df)
+        stages = run["stages"][first_stage:]
+    summary["seconds"] = round(time.perf_counter() - start, 6)
+    summary["stages"] = instrumentation.summarize_stages(stages)
+    return summary
+
+def sheet_batches(load_frame):
+    """Batches of a sheet for write_sheets, loaded only when the writer reaches the sheet."""
+    yield from streaming_io.iter_frame_batches(load_frame())
+
+def format_sheets(sheets):
+    """One line per sheet with its key, changes and time, for the success dialog."""
+    lines = []
+    for sheet in sheets:
+        if sheet["key"] is None:
+            lines.append(f"{sheet['sheet']}: kept unchanged")
+            continue
+        lines.append(
+            f"{sheet['sheet']} (key {', '.join(sheet['key'])}): {sum(sheet['changes'].values())} cell(s) updated, "
+            f"{sheet['rows_added']} row(s) added, {sheet['seconds']:.3f}s"
+        )
+    return "\n".join(lines)
+
+def compare_workbooks(file1_path, file2_path, output_file_path, decisions, key_column=None, sheet_keys=None, workers=None, read_options=None,
+                      spill_dir=None):
+    """Update every sheet of the first workbook with the sheet of the same name in the second and save one workbook.
+
+    `sheet_keys` maps sheet names to their key column(s); other shared sheets use `key_column`, and
+    without one are kept unchanged, like the sheets only in the first workbook. Sheets only in the
+    second workbook are reported but not added. Sheet pairs are reconciled concurrently across a
+    process pool, so all decisions must be given up front; they apply to every sheet. Returns the
+    summary of every sheet in the first workbook's order, with its changes and timing.
+    """
+    try:
+        compare.validate_decisions(decisions, required=True)
+        for file_path in (file1_path, file2_path):
+            if not file_path.lower().endswith(WORKBOOK_FORMATS):
+                raise ValueError("Workbook compare only supports .xls and .xlsx files.")
+        if not output_file_path.lower().endswith('.xlsx'):
+            raise ValueError("The output of a workbook compare must be an .xlsx file.")
+        read_options = read_options or {}
+
+        shared_sheets, new_sheets = match_sheets(file1_path, file2_path)
+        if not shared_sheets:
+            raise ValueError(f"'{os.path.basename(file1_path)}' and '{os.path.basename(file2_path)}' have no sheet names in common.")
+        keys = resolve_sheet_keys(shared_sheets, key_column, sheet_keys)
+        compared = [sheet for sheet in shared_sheets if keys[sheet]]
+        if not compared:
+            raise ValueError("No key column given for any sheet.")
+        # A mistyped key fails on the header rows, not after the workers have read every sheet
+        for sheet in compared:
+            schema_probe.check_file_keys((file1_path, file2_path), keys[sheet], sheet)
+        if new_sheets:
+            common.log_message(f"Sheet(s) only in '{os.path.basename(file2_path)}' are not added: {', '.join(new_sheets)}", level='warning')
+        common.log_message(f"Starting workbook update of '{file1_path}' based on '{file2_path}' for {len(compared)} sheet(s)")
+
+        start = time.perf_counter()
+        with instrumentation.run("compare_workbooks") as run, tempfile.TemporaryDirectory(dir=spill_dir) as work_dir:
+            first_stage = len(run["stages"])
+            tasks = {sheet: (file1_path, file2_path, sheet, keys[sheet], decisions, read_options, os.path.join(work_dir, f"sheet_{i}"))
+                     for i, sheet in enumerate(compared)}
+            summaries = {}
+            workers = min(workers or os.cpu_count(), len(tasks))
+            # Only errors of a sheet task name the sheet; starting the pool fails for the workbook as a whole
+            if workers == 1:
+                for sheet, task in tasks.items():
+                    try:
+                        summaries[sheet] = compare_sheet(*task)
+                    except Exception as e:
+                        raise ValueError(f"Sheet '{sheet}': {e}") from e
+            else:
+                with ProcessPoolExecutor(max_workers=workers, initializer=init_sheet_worker) as executor:
+                    futures = {executor.submit(compare_sheet, *task): sheet for sheet, task in tasks.items()}
+                    for future in as_completed(futures):
+                        sheet = futures[future]
+                        try:
+                            summaries[sheet] = future.result()
+                        except Exception as e:
+                            for pending in futures:
+                                pending.cancel()
+                            raise ValueError(f"Sheet '{sheet}': {e}") from e
+                        common.log_message(f"Compared sheet '{sheet}' in {summaries[sheet]['seconds']}s", level='info')
+
+            # Every sheet of the first workbook in its order; each is read or mapped only when it is written
+            sheets = []
+            for sheet in common.sheet_names(file1_path):
+                if sheet in summaries:
+                    sheets.append((sheet, sheet_batches(functools.partial(load_spill, summaries[sheet].pop("spill")))))
+                else:
+                    sheets.append((sheet, sheet_batches(functools.partial(common.read_data, file1_path, sheet_name=sheet, **read_options))))
+            with instrumentation.stage("write") as record:
+                rows_written = streaming_io.write_sheets(sheets, output_file_path)
+                record["rows"], record["bytes"] = sum(rows_written.values()), instrumentation.file_size(output_file_path)
+            stages = run["stages"][first_stage:]
+
+        summary = {
+            "output": output_file_path,
+            "sheets": [dict({"sheet": sheet, "key": keys.get(sheet), "rows": rows_written[sheet]}, **summaries.get(sheet, {}))
+                       for sheet in rows_written],
+            "sheets_only_in_second": new_sheets,
+            "seconds": round(time.perf_counter() - start, 6),
+        }
+        common.log_message(f"Updated workbook saved as '{output_file_path}'", level='info')
+        not_added = f"\n\nSheets only in '{os.path.basename(file2_path)}' (not added): {', '.join(new_sheets)}" if new_sheets else ""
+        common.display_message(
+            f"Updated workbook saved as '{output_file_path}'.\n\nSheets:\n{format_sheets(summary['sheets'])}{not_added}"
+            f"\n\nTime per stage:\n{instrumentation.format_stages(stages)}",
+            status="success"
+        )
+        return summary
+
+    except Exception as e:
+        raise e